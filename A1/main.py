@@ -3,12 +3,12 @@ import os
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, os.pardir))
 
-for path in [project_root, os.path.join(project_root, "external")]:
+for path in [project_root, os.path.join(project_root, "external"), os.path.join(project_root, "A3")]:
     if path not in sys.path:
         sys.path.append(path)   
 
 import ifcopenshell
-from external.BIManalyst_g_48.rules import SpaceRequirement
+from external.BIManalyst_g_48.A1 import SpaceRequirement, RequirementsCheck
 from external.BIManalyst_g_46 import main
 
 
@@ -16,6 +16,19 @@ def check_space(model):
     name = input("Enter space name: ----Caps sensitive---- ")
     num = int(input("Enter required number: "))
     result = SpaceRequirement.check_space_requirement(model, name, num)
+
+
+def check_requirements_file(model):
+    file_path = input("Enter requirements file path (.json or .csv): ").strip()
+    try:
+        requirements = RequirementsCheck.load_requirements(file_path)
+    except (OSError, ValueError) as e:
+        print("Error reading requirements:", e)
+        return
+    # All requirements are checked against one index of the spaces
+    report = RequirementsCheck.check_requirements(model, requirements)
+    for line in RequirementsCheck.format_report(report):
+        print(line)
     
 
 def list_column_types(model):
@@ -33,6 +46,7 @@ def main_menu():
     functions = {
         "1": ("Check space requirement", check_space),
         "2": ("List column types", list_column_types),
+        "3": ("Check requirements file", check_requirements_file),
         "q": ("Quit", None)
     }
 
@@ -0,0 +1,370 @@
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import ifcopenshell
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from pipeline import CostPipeline, DEFAULT_CONFIG_DIR, OUTPUT_FORMATS, write_outputs
+from rules import columnar, history, price_catalog
+from rules.cache import hash_file, hash_json, make_key
+from rules.profiling import Profiler
+
+
+CHECKPOINT_FILE = "checkpoint.json"
+SUMMARY_FILE = "portfolio_summary.json"
+
+# One pipeline (with its cached config, classifier and geometry cache) per worker process
+_PIPELINES: Dict[Tuple[str, str | None, bool, str | None], CostPipeline] = {}
+
+
+# =======================================================
+# INPUT DISCOVERY
+# =======================================================
+
+def find_ifc_files(inputs: List[str]) -> List[Path]:
+    """Expand directories (recursively) and glob patterns into a sorted list of IFC files."""
+    found = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            found.update(p for p in path.rglob("*") if p.suffix.lower() == ".ifc")
+        elif path.is_file():
+            found.add(path)
+        else:
+            found.update(Path(p) for p in glob.glob(item, recursive=True) if p.lower().endswith(".ifc"))
+    return sorted(p.resolve() for p in found)
+
+
+def model_key(ifc_path: Path) -> str:
+    """Stable output folder name for a model: file stem + short hash of its full path."""
+    digest = hashlib.sha1(str(ifc_path).encode("utf-8")).hexdigest()[:8]
+    return f"{ifc_path.stem}_{digest}"
+
+
+def _file_signature(ifc_path: Path) -> Dict[str, float]:
+    stat = ifc_path.stat()
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+# =======================================================
+# PER-MODEL WORKER
+# =======================================================
+
+def _get_pipeline(
+    config_dir: str,
+    weights_override_path: str | None,
+    geometry_fallback: bool = True,
+    price_files: str | None = None,
+) -> CostPipeline:
+    key = (config_dir, weights_override_path, geometry_fallback, price_files)
+    if key not in _PIPELINES:
+        # Tessellation runs single threaded here, the batch already uses one process per core
+        _PIPELINES[key] = CostPipeline(config_dir, weights_override_path, geometry_fallback=geometry_fallback,
+                                       geometry_threads=1, price_files=price_files)
+    return _PIPELINES[key]
+
+
+def process_model(
+    ifc_path: str,
+    output_dir: str,
+    config_dir: str,
+    weights_override_path: str | None = None,
+    quiet: bool = True,
+    profile: bool = False,
+    formats: Sequence[str] = ("json",),
+    geometry_fallback: bool = True,
+    price_files: str | None = None,
+    history_db: str | None = None,
+) -> Dict:
+    """
+    Run area extraction and cost allocation for one IFC file.
+
+    Writes <output_dir>/<model key>/A3_Tool and .../cost (and/or the
+    columnar output, see formats) and returns a checkpoint entry. Never
+    raises: failures are returned with status "failed" so the batch can
+    continue. With profile=True the stage report is embedded in the cost
+    output and the entry.
+
+    With the columnar format, the per-room-type table is not copied into
+    the entry; the portfolio summary reads it from the columnar files.
+    With history_db the result is also recorded in that run history.
+    """
+    ifc_path = Path(ifc_path)
+    model_dir = Path(output_dir) / model_key(ifc_path)
+    entry = {"file": str(ifc_path), "key": model_key(ifc_path), **_file_signature(ifc_path)}
+
+    profiler = Profiler(enabled=profile)
+    pipeline = _get_pipeline(config_dir, weights_override_path, geometry_fallback, price_files)
+    pipeline.profiler = profiler
+
+    stdout = io.StringIO() if quiet else sys.stdout
+    try:
+        with contextlib.redirect_stdout(stdout), profiler:
+            with profiler.stage("ifc_open"):
+                model = ifcopenshell.open(str(ifc_path))
+            result = pipeline.run(model)
+            write_outputs(result, model_dir, profiler, formats)
+            summary = result["summary"]
+            if history_db is not None:
+                entry["run_id"] = history.RunHistory(history_db).record_run(
+                    summary, hash_file(ifc_path), pipeline.load_config(), model_name=ifc_path.name, source="batch",
+                    options=pipeline.run_options(),
+                )
+    except Exception as e:
+        entry.update({"status": "failed", "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()})
+        return entry
+
+    entry.update({
+        "status": "ok",
+        "total_area": summary["Total summed area"],
+        "total_cost": summary["calculated_total_cost"],
+        "unit_price": summary["calculated_unit_price"],
+        "unclassified_area": sum(summary["unclassified_spaces"].values()),
+    })
+    if "columnar" in formats:
+        entry["columnar"] = str(model_dir / columnar.COLUMNAR_DIR)
+    else:
+        entry["per_room_type"] = summary["per_room_type"]
+    if profile:
+        entry["profiling"] = profiler.report()
+    return entry
+
+
+# =======================================================
+# CHECKPOINT AND SUMMARY
+# =======================================================
+
+def load_checkpoint(output_dir: Path) -> Dict[str, Dict]:
+    """Load the checkpoint (file path -> entry) of an earlier run, if any."""
+    path = output_dir / CHECKPOINT_FILE
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(output_dir: Path, checkpoint: Dict[str, Dict]) -> None:
+    """Write the checkpoint atomically, so an interrupted run never leaves it half written."""
+    path = output_dir / CHECKPOINT_FILE
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def settings_key(config: Dict, formats: Sequence[str], geometry_fallback: bool) -> str:
+    """Hash of everything besides the IFC file that changes a model's checkpoint entry."""
+    return make_key(history.config_hashes(config)["config_hash"], hash_json(sorted(formats)), geometry_fallback)
+
+
+def is_done(entry: Dict | None, ifc_path: Path, settings: str | None = None) -> bool:
+    """True if the checkpoint has a successful result for the unchanged file, made with the same settings."""
+    if not entry or entry.get("status") != "ok" or entry.get("settings") != settings:
+        return False
+    signature = _file_signature(ifc_path)
+    return entry.get("size") == signature["size"] and entry.get("mtime") == signature["mtime"]
+
+
+def _per_room_type(entry: Dict) -> Dict[str, Dict[str, float]]:
+    # From the entry itself, or memory-mapped from the model's columnar output
+    if "per_room_type" in entry:
+        return entry["per_room_type"]
+    stored = columnar.load_columnar(entry["columnar"])
+    table = stored.table("per_room_type")
+    return {
+        rt: {field: float(table[field][r]) for field in ("area", "allocated_cost", "unit_price")}
+        for r, rt in enumerate(stored.room_types)
+    }
+
+
+def build_portfolio_summary(entries: List[Dict]) -> Dict:
+    """
+    Consolidate per-model results.
+
+    Returns dict with:
+      - models: per-model totals and per-room-type unit prices
+      - failed: file -> error
+      - per_room_type: portfolio area, cost and unit price per room type
+      - totals: portfolio area, cost and unit price
+    """
+    models: Dict[str, Dict] = {}
+    failed: Dict[str, str] = {}
+    per_room_type: Dict[str, Dict[str, float]] = {}
+    total_area = 0.0
+    total_cost = 0.0
+
+    for entry in entries:
+        if entry.get("status") != "ok":
+            failed[entry["file"]] = entry.get("error", "unknown error")
+            continue
+        entry_per_room_type = _per_room_type(entry)
+        models[entry["key"]] = {
+            "file": entry["file"],
+            "total_area": entry["total_area"],
+            "total_cost": entry["total_cost"],
+            "unit_price": entry["unit_price"],
+            "unclassified_area": entry["unclassified_area"],
+            "unit_price_per_room_type": {rt: v["unit_price"] for rt, v in entry_per_room_type.items()},
+        }
+        total_area += entry["total_area"]
+        total_cost += entry["total_cost"]
+        for rt, v in entry_per_room_type.items():
+            acc = per_room_type.setdefault(rt, {"area": 0.0, "allocated_cost": 0.0})
+            acc["area"] += v["area"]
+            acc["allocated_cost"] += v["allocated_cost"]
+
+    for acc in per_room_type.values():
+        acc["unit_price"] = acc["allocated_cost"] / acc["area"] if acc["area"] > 0 else 0.0
+
+    return {
+        "models": models,
+        "failed": failed,
+        "per_room_type": per_room_type,
+        "totals": {
+            "models_ok": len(models),
+            "models_failed": len(failed),
+            "total_area": total_area,
+            "total_cost": total_cost,
+            "unit_price": total_cost / total_area if total_area > 0 else 0.0,
+        },
+    }
+
+
+# =======================================================
+# BATCH RUN
+# =======================================================
+
+def run_batch(
+    inputs: List[str],
+    output_dir: str | Path,
+    config_dir: str | Path = DEFAULT_CONFIG_DIR,
+    weights_override_path: str | None = None,
+    workers: int | None = None,
+    resume: bool = True,
+    quiet: bool = True,
+    profile: bool = False,
+    formats: Sequence[str] = ("json",),
+    geometry_fallback: bool = True,
+    price_files: str | Path | None = None,
+    history_db: str | Path | None = history.DEFAULT_DB,
+) -> Dict:
+    """
+    Cost a portfolio of IFC files in a process pool.
+
+    Per-file failures are recorded and the run continues. The checkpoint
+    is updated after every finished model; with resume=True models that
+    already succeeded (and did not change on disk) with the same config,
+    weights, price source and options are skipped. Every costed model is
+    recorded in the run history at history_db (None: not recorded).
+
+    Returns the portfolio summary (also written to portfolio_summary.json).
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    files = find_ifc_files(inputs)
+    checkpoint = load_checkpoint(output_dir) if resume else {}
+
+    if price_files is not None:
+        # Compile the catalog once here, the workers then load the cached store
+        price_catalog.load_catalog(price_files)
+        price_files = str(price_files)
+    if history_db is not None:
+        # Create the database once here, the workers only insert
+        history_db = str(history.RunHistory(history_db).db_path)
+
+    # Entries made with another config, weights, price source or options are redone
+    stdout = io.StringIO() if quiet else sys.stdout
+    with contextlib.redirect_stdout(stdout):
+        config = _get_pipeline(str(config_dir), weights_override_path, geometry_fallback, price_files).load_config()
+    settings = settings_key(config, formats, geometry_fallback)
+
+    todo = [p for p in files if not is_done(checkpoint.get(str(p)), p, settings)]
+    print(f"{len(files)} IFC files found, {len(files) - len(todo)} already done, {len(todo)} to process")
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(process_model, str(p), str(output_dir), str(config_dir), weights_override_path, quiet, profile, tuple(formats), geometry_fallback, price_files, history_db): p
+                for p in todo
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                ifc_path = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    # e.g. a worker process crashed while parsing the file
+                    entry = {"file": str(ifc_path), "key": model_key(ifc_path), "status": "failed",
+                             "error": f"{type(e).__name__}: {e}"}
+                entry["settings"] = settings
+                checkpoint[str(ifc_path)] = entry
+                save_checkpoint(output_dir, checkpoint)
+                print(f"[{done}/{len(todo)}] {entry['status']}: {ifc_path.name}")
+
+    entries = [checkpoint[str(p)] for p in files if str(p) in checkpoint]
+    summary = build_portfolio_summary(entries)
+    with open(output_dir / SUMMARY_FILE, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=4, ensure_ascii=False)
+    print(f"Portfolio summary saved to {output_dir / SUMMARY_FILE}")
+    return summary
+
+
+# =======================================================
+# CLI ENTRY POINT
+# =======================================================
+
+def _parse_args() -> argparse.Namespace:
+    """Parse command-line arguments for CLI use."""
+    parser = argparse.ArgumentParser(
+        description="Extract areas and allocate costs for a portfolio of IFC files."
+    )
+    parser.add_argument("inputs", nargs="+", help="IFC files, directories or glob patterns.")
+    parser.add_argument("--output-dir", default="Output/portfolio", help="Directory for per-model results and the summary.")
+    parser.add_argument("--config-dir", default=str(DEFAULT_CONFIG_DIR), help="Directory with config JSON files.")
+    parser.add_argument("--weights", default=None, help="Optional custom weights JSON filename (inside config-dir).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore the checkpoint and process every file again.")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the extraction and cost scripts.")
+    parser.add_argument("--profile", action="store_true", help="Record stage timings, property set lookups and peak memory per model.")
+    parser.add_argument("--format", nargs="+", choices=OUTPUT_FORMATS, default=["json"], dest="formats",
+                        help="Per-model output formats: json (A3_Tool/cost files) and/or columnar (.npy + manifest).")
+    parser.add_argument("--no-geometry", action="store_true",
+                        help="Do not compute missing space/wall/column areas from the geometry.")
+    parser.add_argument("--price-rates", default=None, metavar="CSV_OR_DIR",
+                        help="Derive the cost rates from these price CSVs instead of cost_rates.json.")
+    parser.add_argument("--history", default=str(history.DEFAULT_DB), help="Run history database the results are recorded in.")
+    parser.add_argument("--no-history", action="store_true", help="Do not record the results in the run history.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """CLI entry: read args, run run_batch."""
+    args = _parse_args()
+    run_batch(
+        inputs=args.inputs,
+        output_dir=args.output_dir,
+        config_dir=args.config_dir,
+        weights_override_path=args.weights,
+        workers=args.workers,
+        resume=not args.no_resume,
+        quiet=not args.verbose,
+        profile=args.profile,
+        formats=args.formats,
+        geometry_fallback=not args.no_geometry,
+        price_files=args.price_rates,
+        history_db=None if args.no_history else args.history,
+    )
+
+
+if __name__ == "__main__":
+    main()
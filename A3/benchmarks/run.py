@@ -0,0 +1,362 @@
+import argparse
+import contextlib
+import inspect
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import ifcopenshell
+
+A3_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(A3_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from external.BIManalyst_g_48.A3 import A3_Tool        # submodule for area extraction
+from external.BIManalyst_g_49 import roomtype_cost as rtc  # submodule of cost estimation
+import incremental
+from pipeline import CostPipeline
+from rules import tools
+from synthetic_model import get_or_create_model
+
+
+DEFAULT_SCALES = [100, 1000, 10000]
+SCENARIOS = 1000  # Monte Carlo variants for the evaluate_scenarios cases
+CONFIG_DIR = A3_DIR / "data"
+
+
+# =======================================================
+# MEASUREMENT
+# =======================================================
+
+def measure(func: Callable[[], object], repeats: int = 3) -> Dict:
+    """
+    Time func() `repeats` times and measure its peak Python heap once.
+
+    Peak memory comes from tracemalloc, so it covers Python allocations
+    only (not memory held inside the ifcopenshell C++ core).
+    """
+    times = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "wall_time_s": statistics.median(times),
+        "min_time_s": min(times),
+        "repeats": repeats,
+        "peak_memory_bytes": peak,
+    }
+
+
+# =======================================================
+# BENCHMARK CASES
+# =======================================================
+
+def a3_tool_cases(model, workdir: Path) -> Dict[str, Callable[[], object]]:
+    """
+    One case per public function in A3_Tool.
+
+    Arguments are bound by parameter name, so new public functions are
+    picked up automatically as long as their parameters are known here.
+    """
+    quantities = A3_Tool.extract_quantities(model)
+    csv_files = sorted(str(p) for p in workdir.glob("*.csv"))
+    known = {
+        "model": model,
+        "file_path": str(workdir),
+        "src_folder": str(workdir),
+        "output_filename": "bench_output",
+        "csv_files": csv_files,
+    }
+
+    cases: Dict[str, Callable[[], object]] = {}
+    for name, func in inspect.getmembers(A3_Tool, inspect.isfunction):
+        if name.startswith("_") or func.__module__ != A3_Tool.__name__:
+            continue
+        kwargs = {}
+        supported = True
+        for param in inspect.signature(func).parameters.values():
+            if param.name in known:
+                kwargs[param.name] = known[param.name]
+            elif param.default is inspect.Parameter.empty:
+                supported = False
+                break
+        if supported:
+            cases[f"A3_Tool.{name}"] = lambda func=func, kwargs=kwargs: func(**kwargs)
+        # The same function again with a prebuilt quantity table, where supported
+        if supported and "quantities" in inspect.signature(func).parameters:
+            cases[f"A3_Tool.{name}[quantities]"] = (
+                lambda func=func, kwargs=kwargs: func(**kwargs, quantities=quantities)
+            )
+    return cases
+
+
+def roomtype_cost_cases(model, workdir: Path) -> Dict[str, Callable[[], object]]:
+    """Cases for roomtype_cost.process_json, allocate_costs, classify_all_spaces and evaluate_scenarios."""
+    area_data = A3_Tool.summarize_areas(model)
+    area_path = workdir / "A3_Tool"
+    with open(area_path, "w", encoding="utf-8") as f:
+        json.dump(area_data, f, indent=4)
+
+    config = rtc.load_config(CONFIG_DIR)
+    area_by_roomtype, _ = rtc.classify_all_spaces(
+        area_data["Area of spaces"], config["room_types"], config["space_keywords"]
+    )
+
+    cases = {
+        "roomtype_cost.process_json": lambda: rtc.process_json(area_path, workdir / "cost", config_dir=CONFIG_DIR),
+        "roomtype_cost.classify_all_spaces": lambda: rtc.classify_all_spaces(
+            area_data["Area of spaces"], config["room_types"], config["space_keywords"]
+        ),
+        "roomtype_cost.allocate_costs": lambda: rtc.allocate_costs(
+            area_by_roomtype=area_by_roomtype,
+            total_area=area_data["Total summed area"],
+            room_types=config["room_types"],
+            cost_rates=config["cost_rates"],
+            weights=config["weights"],
+        ),
+    }
+
+    # Scenario evaluation with every combination of fixed ([G], [R, G]) and varying ([N, G], [N, R, G]) inputs
+    _, weight_matrix, rates, cost_groups = rtc.build_allocation_arrays(
+        area_by_roomtype, config["room_types"], config["cost_rates"], config["weights"]
+    )
+    scenario_rates, scenario_weights = rtc.perturb_scenarios(
+        config["cost_rates"], config["weights"], config["room_types"], SCENARIOS, rate_sd=0.1, weight_sd=0.1, seed=0
+    )
+    for rates_label, case_rates in (("fixed", rates), ("varying", scenario_rates)):
+        for weights_label, case_weights in (("fixed", weight_matrix), ("varying", scenario_weights)):
+            cases[f"roomtype_cost.evaluate_scenarios[{rates_label} rates, {weights_label} weights]"] = (
+                lambda case_rates=case_rates, case_weights=case_weights: rtc.evaluate_scenarios(
+                    area_by_roomtype, area_data["Total summed area"], config["room_types"], cost_groups,
+                    case_rates, case_weights,
+                )
+            )
+    return cases
+
+
+def tools_cases(model, workdir: Path) -> Dict[str, Callable[[], object]]:
+    """Cases for the public functions in A3/rules/tools.py."""
+    cases: Dict[str, Callable[[], object]] = {}
+    for name, func in inspect.getmembers(tools, inspect.isfunction):
+        if name.startswith("_") or func.__module__ != tools.__name__:
+            continue
+        params = inspect.signature(func).parameters
+        kwargs = {}
+        if "output_path" in params:
+            kwargs["output_path"] = str(workdir / f"{name}.json")
+        cases[f"tools.{name}"] = lambda func=func, kwargs=kwargs: func(model, **kwargs)
+    return cases
+
+
+def incremental_cases(model_path: Path, workdir: Path) -> Dict[str, Callable[[], object]]:
+    """
+    A full pipeline run against incremental.run_incremental, both from the
+    IFC file to the written outputs.
+
+    "unchanged" re-runs on the snapshot of the same model, "revision" on a
+    copy of the model with every 100th space renamed, "first run" without
+    a snapshot.
+    """
+    snapshot_path = workdir / "snapshot.json"
+    base_snapshot_path = workdir / "snapshot_base.json"
+    revision_path = workdir / "revision.ifc"
+
+    def full_run():
+        return CostPipeline(CONFIG_DIR).run(ifcopenshell.open(str(model_path)), workdir / "full")
+
+    def incremental_run(path):
+        return incremental.run_incremental(path, snapshot_path, workdir / "incremental", CONFIG_DIR, history_db=None)
+
+    def first_run():
+        snapshot_path.unlink(missing_ok=True)
+        return incremental_run(model_path)
+
+    def revision_run():
+        shutil.copy2(base_snapshot_path, snapshot_path)
+        return incremental_run(revision_path)
+
+    first_run()
+    shutil.copy2(snapshot_path, base_snapshot_path)
+    revision = ifcopenshell.open(str(model_path))
+    for space in revision.by_type("IfcSpace")[::100]:
+        space.LongName = f"{space.LongName} (revised)"
+    revision.write(str(revision_path))
+
+    return {
+        "pipeline.CostPipeline.run[from file]": full_run,
+        "incremental.run_incremental[first run]": first_run,
+        "incremental.run_incremental[unchanged]": lambda: incremental_run(model_path),
+        "incremental.run_incremental[revision]": revision_run,
+    }
+
+
+# =======================================================
+# RUN AND COMPARE
+# =======================================================
+
+def run_benchmarks(
+    scales: List[int],
+    repeats: int = 3,
+    models_dir: str | Path = "Output/benchmarks/models",
+    seed: int = 0,
+    only: str | None = None,
+    label: str | None = None,
+) -> Dict:
+    """
+    Generate (or reuse) one synthetic model per scale and time every case on it.
+
+    only:
+      optional substring filter on case names.
+
+    Returns the result dict that is stored as JSON.
+    """
+    results: Dict = {
+        "meta": {
+            "label": label,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "ifcopenshell": ifcopenshell.version,
+            "platform": platform.platform(),
+            "repeats": repeats,
+            "seed": seed,
+        },
+        "scales": {},
+    }
+
+    for n_spaces in scales:
+        start = time.perf_counter()
+        model_path = get_or_create_model(n_spaces, models_dir, seed=seed)
+        generate_s = time.perf_counter() - start
+
+        open_stats = measure(lambda: ifcopenshell.open(str(model_path)), repeats=1)
+        model = ifcopenshell.open(str(model_path))
+        scale_result = {
+            "model": {
+                "path": str(model_path),
+                "file_size_bytes": model_path.stat().st_size,
+                "generate_or_load_s": generate_s,
+                "counts": {cls: len(model.by_type(cls)) for cls in ["IfcSpace", "IfcWall", "IfcCurtainWall", "IfcColumn"]},
+            },
+            "functions": {"ifcopenshell.open": open_stats},
+        }
+
+        workdir = Path(tempfile.mkdtemp(prefix="a3_bench_"))
+        try:
+            shutil.copy2(A3_DIR / "ny_pricedata.csv", workdir / "ny_pricedata.csv")
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                cases = {}
+                cases.update(a3_tool_cases(model, workdir))
+                cases.update(roomtype_cost_cases(model, workdir))
+                cases.update(tools_cases(model, workdir))
+                cases.update(incremental_cases(model_path, workdir))
+
+            for name, case in sorted(cases.items()):
+                if only and only not in name:
+                    continue
+                try:
+                    scale_result["functions"][name] = measure(case, repeats)
+                except Exception as e:
+                    scale_result["functions"][name] = {"error": f"{type(e).__name__}: {e}"}
+                stats = scale_result["functions"][name]
+                print(f"{n_spaces:>7} spaces  {name:<55} "
+                      + (f"{stats['wall_time_s']:9.4f} s  {stats['peak_memory_bytes'] / 1024 ** 2:8.1f} MiB"
+                         if "error" not in stats else stats["error"]))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        results["scales"][str(n_spaces)] = scale_result
+
+    return results
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = 1.2) -> List[Dict]:
+    """
+    Compare two result files case by case.
+
+    Returns one row per case present in both, with the time ratio
+    current/baseline and a 'regression' flag when it exceeds threshold.
+    """
+    rows = []
+    for scale, current_scale in current["scales"].items():
+        baseline_scale = baseline.get("scales", {}).get(scale)
+        if not baseline_scale:
+            continue
+        for name, stats in current_scale["functions"].items():
+            old = baseline_scale["functions"].get(name)
+            if not old or "error" in old or "error" in stats or old["wall_time_s"] <= 0:
+                continue
+            ratio = stats["wall_time_s"] / old["wall_time_s"]
+            rows.append({
+                "scale": int(scale),
+                "case": name,
+                "baseline_s": old["wall_time_s"],
+                "current_s": stats["wall_time_s"],
+                "ratio": ratio,
+                "memory_ratio": (stats["peak_memory_bytes"] / old["peak_memory_bytes"]) if old["peak_memory_bytes"] else None,
+                "regression": ratio > threshold,
+            })
+    return rows
+
+
+# =======================================================
+# CLI ENTRY POINT
+# =======================================================
+
+def _parse_args() -> argparse.Namespace:
+    """Parse command-line arguments for CLI use."""
+    parser = argparse.ArgumentParser(description="Benchmark the A3 tools on synthetic IFC models.")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="Numbers of IfcSpaces (e.g. 100 1000 100000).")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per case (median is reported).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the model generator.")
+    parser.add_argument("--models-dir", default="Output/benchmarks/models", help="Where generated models are kept.")
+    parser.add_argument("--output", default=None, help="Result JSON path (default: Output/benchmarks/<timestamp>.json).")
+    parser.add_argument("--label", default=None, help="Free text label stored with the results, e.g. a git commit.")
+    parser.add_argument("--only", default=None, help="Only run cases whose name contains this text.")
+    parser.add_argument("--compare", default=None, help="Baseline result JSON to compare against.")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Time ratio above which a case counts as a regression.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """CLI entry: run benchmarks, store JSON, optionally compare with a baseline."""
+    args = _parse_args()
+    results = run_benchmarks(args.scales, args.repeats, args.models_dir, args.seed, args.only, args.label)
+
+    output = Path(args.output or f"Output/benchmarks/{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Benchmark results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, results, args.threshold)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"{row['scale']:>7}  {row['case']:<55} {row['baseline_s']:9.4f} s -> {row['current_s']:9.4f} s  x{row['ratio']:.2f} {flag}")
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import json
+import random
+from pathlib import Path
+from typing import Dict, List
+
+import ifcopenshell
+import ifcopenshell.guid
+
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+# =======================================================
+# NAMES
+# =======================================================
+
+def space_long_names(n_names: int, seed: int = 0) -> List[str]:
+    """
+    Build n_names distinct space LongNames.
+
+    Names are made from the keywords in space_keywords.json (so they can be
+    classified), a few unclassifiable names and numbered variants.
+    """
+    with open(DATA_DIR / "space_keywords.json", "r", encoding="utf-8") as f:
+        keywords = [kw for kws in json.load(f).values() for kw in kws]
+    base = [kw.capitalize() for kw in keywords] + ["Room", "Void", "Shaft", "Lab"]
+    rng = random.Random(seed)
+    rng.shuffle(base)
+
+    names = base[:n_names]
+    i = 0
+    while len(names) < n_names:
+        names.append(f"{base[i % len(base)]} {i // len(base) + 1}")
+        i += 1
+    return names
+
+
+# =======================================================
+# MODEL GENERATOR
+# =======================================================
+
+class _Builder:
+    """Small helper that creates IFC4 entities without going through ifcopenshell.api (much faster at scale)."""
+
+    def __init__(self) -> None:
+        self.f = ifcopenshell.file(schema="IFC4")
+
+    def root(self, ifc_class: str, **attributes):
+        return self.f.create_entity(ifc_class, GlobalId=ifcopenshell.guid.new(), **attributes)
+
+    def aggregate(self, parent, children) -> None:
+        self.root("IfcRelAggregates", RelatingObject=parent, RelatedObjects=list(children))
+
+    def contain(self, structure, elements) -> None:
+        if elements:
+            self.root("IfcRelContainedInSpatialStructure", RelatingStructure=structure, RelatedElements=list(elements))
+
+    def qto(self, element, name: str, quantities: Dict[str, tuple]) -> None:
+        # quantities: name -> (IfcQuantity class, value attribute, value)
+        items = [
+            self.f.create_entity(cls, Name=q_name, **{attr: value})
+            for q_name, (cls, attr, value) in quantities.items()
+        ]
+        qto = self.root("IfcElementQuantity", Name=name, Quantities=items)
+        self.root("IfcRelDefinesByProperties", RelatedObjects=[element], RelatingPropertyDefinition=qto)
+
+    def pset(self, element, name: str, values: Dict[str, float]) -> None:
+        props = [
+            self.f.create_entity("IfcPropertySingleValue", Name=p_name, NominalValue=self.f.create_entity("IfcLengthMeasure", value))
+            for p_name, value in values.items()
+        ]
+        pset = self.root("IfcPropertySet", Name=name, HasProperties=props)
+        self.root("IfcRelDefinesByProperties", RelatedObjects=[element], RelatingPropertyDefinition=pset)
+
+
+def generate_model(
+    n_spaces: int,
+    n_storeys: int | None = None,
+    n_space_names: int | None = None,
+    walls_per_space: float = 1.5,
+    curtain_walls_per_space: float = 0.1,
+    columns_per_space: float = 0.25,
+    missing_ratio: float = 0.0,
+    seed: int = 0,
+) -> ifcopenshell.file:
+    """
+    Generate a synthetic IFC4 model for benchmarking.
+
+    - n_spaces IfcSpaces with Qto_SpaceBaseQuantities (NetFloorArea)
+    - interior/exterior IfcWalls with Qto_WallBaseQuantities (Length in mm,
+      NetSideArea, NetVolume), IfcCurtainWalls with Qto_CurtainWallQuantities
+      and IfcColumns with a Revit style 'Dimensions' property set, in the
+      given ratios to the number of spaces
+    - missing_ratio of the elements get no quantity/property set at all
+
+    Returns the in-memory ifcopenshell file.
+    """
+    rng = random.Random(seed)
+    n_storeys = n_storeys or max(1, min(50, n_spaces // 200))
+    names = space_long_names(n_space_names or max(10, min(n_spaces // 10, 5000)), seed)
+    b = _Builder()
+
+    project = b.root("IfcProject", Name="Synthetic project")
+    units = [
+        b.f.create_entity("IfcSIUnit", UnitType="LENGTHUNIT", Prefix="MILLI", Name="METRE"),
+        b.f.create_entity("IfcSIUnit", UnitType="AREAUNIT", Name="SQUARE_METRE"),
+        b.f.create_entity("IfcSIUnit", UnitType="VOLUMEUNIT", Name="CUBIC_METRE"),
+    ]
+    project.UnitsInContext = b.f.create_entity("IfcUnitAssignment", Units=units)
+    site = b.root("IfcSite", Name="Site")
+    building = b.root("IfcBuilding", Name="Building")
+    storeys = [b.root("IfcBuildingStorey", Name=f"Level {i}", Elevation=i * 3200.0) for i in range(n_storeys)]
+    b.aggregate(project, [site])
+    b.aggregate(site, [building])
+    b.aggregate(building, storeys)
+
+    def has_data() -> bool:
+        return rng.random() >= missing_ratio
+
+    spaces_by_storey = [[] for _ in storeys]
+    elements_by_storey = [[] for _ in storeys]
+
+    for i in range(n_spaces):
+        space = b.root("IfcSpace", Name=str(i + 1), LongName=rng.choice(names))
+        spaces_by_storey[i % n_storeys].append(space)
+        if has_data():
+            b.qto(space, "Qto_SpaceBaseQuantities", {
+                "NetFloorArea": ("IfcQuantityArea", "AreaValue", round(rng.uniform(4.0, 80.0), 3)),
+            })
+
+    for i in range(int(n_spaces * walls_per_space)):
+        kind = "Interior" if rng.random() < 0.75 else "Exterior"
+        thickness = 100 if kind == "Interior" else 350
+        wall = b.root("IfcWall", Name=f"Basic Wall:{kind} - {thickness}mm", ObjectType=f"{kind} - {thickness}mm")
+        elements_by_storey[i % n_storeys].append(wall)
+        if has_data():
+            length = rng.uniform(1000.0, 9000.0)
+            height = 3.0
+            b.qto(wall, "Qto_WallBaseQuantities", {
+                "Length": ("IfcQuantityLength", "LengthValue", length),
+                "NetSideArea": ("IfcQuantityArea", "AreaValue", length / 1000 * height),
+                "NetVolume": ("IfcQuantityVolume", "VolumeValue", length / 1000 * height * thickness / 1000),
+            })
+
+    for i in range(int(n_spaces * curtain_walls_per_space)):
+        wall = b.root("IfcCurtainWall", Name="Curtain Wall:Storefront", ObjectType="Curtain Wall")
+        elements_by_storey[i % n_storeys].append(wall)
+        if has_data():
+            b.qto(wall, "Qto_CurtainWallQuantities", {
+                "Length": ("IfcQuantityLength", "LengthValue", rng.uniform(2000.0, 12000.0)),
+            })
+
+    for i in range(int(n_spaces * columns_per_space)):
+        column = b.root("IfcColumn", Name="Concrete-Rectangular-Column", ObjectType="300 x 450mm")
+        elements_by_storey[i % n_storeys].append(column)
+        if has_data():
+            b.pset(column, "Dimensions", {"Depth": 450.0, "Width": 300.0})
+
+    for storey, spaces, elements in zip(storeys, spaces_by_storey, elements_by_storey):
+        if spaces:
+            b.aggregate(storey, spaces)
+        b.contain(storey, elements)
+
+    return b.f
+
+
+def get_or_create_model(n_spaces: int, models_dir: str | Path, seed: int = 0, **kwargs) -> Path:
+    """Return the path of a generated model, generating and writing it only once per scale/seed."""
+    models_dir = Path(models_dir)
+    models_dir.mkdir(parents=True, exist_ok=True)
+    suffix = "".join(f"_{k}{v}" for k, v in sorted(kwargs.items()))
+    path = models_dir / f"synthetic_{n_spaces}_s{seed}{suffix}.ifc"
+    if not path.exists():
+        generate_model(n_spaces, seed=seed, **kwargs).write(str(path))
+    return path
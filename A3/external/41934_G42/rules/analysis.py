@@ -1 +1,209 @@
+from collections import Counter
 
+import numpy as np
+import ifcopenshell.util.unit
+
+from rules.config import WINDOW_PRICE_DB, SIZE_TOLERANCE_MM
+from rules.utils import PriceBands
+
+
+# -----------------------------
+# MATERIALS
+# -----------------------------
+def build_material_index(model):
+    """
+    Material name of every element with a material association.
+
+    One pass over IfcRelAssociatesMaterial instead of following
+    HasAssociations per window. Materials without a Name (e.g. layer set
+    usages) map to None.
+
+    Parameters:
+        model (ifcopenshell.file): Opened IFC model
+
+    Returns:
+        dict: {element id: material name}
+    """
+    materials = {}
+    for rel in model.by_type("IfcRelAssociatesMaterial"):
+        name = getattr(rel.RelatingMaterial, "Name", None)
+        for obj in rel.RelatedObjects:
+            materials[obj.id()] = name
+    return materials
+
+
+def _type_index(model):
+    # {occurrence id: type id} for windows typed through IfcRelDefinesByType
+    types = {}
+    for rel in model.by_type("IfcRelDefinesByType"):
+        for obj in rel.RelatedObjects:
+            types[obj.id()] = rel.RelatingType.id()
+    return types
+
+
+# -----------------------------
+# WINDOW EXTRACTION
+# -----------------------------
+def extract_windows(model, price_db=WINDOW_PRICE_DB):
+    """
+    Extract every IfcWindow in one pass.
+
+    Width and height are converted to mm from the model's length unit.
+    The material comes from the window itself, or from its window type
+    when the occurrence has none.
+
+    Parameters:
+        model (ifcopenshell.file): Opened IFC model
+        price_db (dict): Price database with the area bands
+
+    Returns:
+        list: One dict per window with GlobalId, name, width_mm, height_mm,
+              area (m2), material, category and price (DKK). Windows without
+              OverallWidth/OverallHeight have None for the size fields.
+    """
+    to_mm = ifcopenshell.util.unit.calculate_unit_scale(model) * 1000
+    materials = build_material_index(model)
+    types = _type_index(model) if materials else {}
+
+    windows = []
+    for w in model.by_type("IfcWindow"):
+        material = materials.get(w.id())
+        if material is None and w.id() in types:
+            material = materials.get(types[w.id()])
+        width = getattr(w, "OverallWidth", None)
+        height = getattr(w, "OverallHeight", None)
+        sized = bool(width and height)
+        windows.append({
+            "GlobalId": w.GlobalId,
+            "name": w.Name,
+            "width_mm": width * to_mm if sized else None,
+            "height_mm": height * to_mm if sized else None,
+            "area": None,
+            "material": material,
+            "category": None,
+            "price": None,
+        })
+
+    # Areas, bands and prices for all sized windows at once
+    sized = [i for i, w in enumerate(windows) if w["width_mm"] is not None]
+    if sized:
+        bands = PriceBands(price_db)
+        widths = np.array([windows[i]["width_mm"] for i in sized])
+        heights = np.array([windows[i]["height_mm"] for i in sized])
+        areas = (widths / 1000) * (heights / 1000)
+        band_idx = bands.indices(areas)
+        prices = bands.prices_for(areas)
+        for i, area, b, price in zip(sized, areas.tolist(), band_idx.tolist(), prices.tolist()):
+            windows[i]["area"] = area
+            windows[i]["category"] = bands.categories[b] if b >= 0 else "unknown"
+            windows[i]["price"] = price
+    return windows
+
+
+# -----------------------------
+# CLAIM MATCHING
+# -----------------------------
+class SizeIndex:
+    """
+    Distinct window sizes sorted by width, with the number of windows per size.
+
+    A claim only looks at the width range [w - tol, w + tol] (two binary
+    searches) and checks the heights inside it, so matching does not scan
+    all windows for every claim. Models repeat a few window types many
+    times, so the index is usually far smaller than the window list.
+    """
+
+    def __init__(self, widths, heights):
+        if len(widths):
+            sizes, counts = np.unique(np.column_stack([widths, heights]), axis=0, return_counts=True)
+        else:
+            sizes, counts = np.empty((0, 2)), np.empty(0, dtype=int)
+        # np.unique sorts rows lexicographically, i.e. by width first
+        self.widths = sizes[:, 0]
+        self.heights = sizes[:, 1]
+        self.counts = counts
+
+    def count(self, width, height, tol):
+        """Number of windows within tol of width and height."""
+        lo = np.searchsorted(self.widths, width - tol, side="left")
+        hi = np.searchsorted(self.widths, width + tol, side="right")
+        if lo >= hi:
+            return 0
+        mask = np.abs(self.heights[lo:hi] - height) <= tol
+        return int(self.counts[lo:hi][mask].sum())
+
+
+def match_claims(windows, claimed_windows, tol=SIZE_TOLERANCE_MM):
+    """
+    Count IFC windows matching each claimed window.
+
+    The claimed width is multiplied by units_per_window (horizontal
+    assembly). Only windows with width and height take part, as in the
+    area totals. Sizes are indexed once overall and once per material, so
+    the cost per claim is two binary searches plus the few sizes in range.
+
+    Parameters:
+        windows (list): Output of extract_windows
+        claimed_windows (list): List of claimed window dicts
+        tol (float): Allowed size difference in mm
+
+    Returns:
+        list: One dict per claim with window, size_match, material_match
+              and both_match
+    """
+    sized = [w for w in windows if w["width_mm"] is not None]
+    widths = np.array([w["width_mm"] for w in sized], dtype=float)
+    heights = np.array([w["height_mm"] for w in sized], dtype=float)
+    materials = [w["material"] for w in sized]
+
+    all_sizes = SizeIndex(widths, heights)
+    material_counts = Counter(materials)
+    by_material = {}
+    for i, material in enumerate(materials):
+        by_material.setdefault(material, []).append(i)
+    material_sizes = {
+        material: SizeIndex(widths[rows], heights[rows])
+        for material, rows in ((m, np.array(r)) for m, r in by_material.items())
+    }
+
+    match_results = []
+    for cw in claimed_windows:
+        width = cw["width_mm"] * cw.get("units_per_window", 1)
+        height = cw["height_mm"]
+        same_material = material_sizes.get(cw["material"])
+        match_results.append({
+            "window": cw,
+            "size_match": all_sizes.count(width, height, tol),
+            "material_match": material_counts.get(cw["material"], 0),
+            "both_match": same_material.count(width, height, tol) if same_material else 0,
+        })
+    return match_results
+
+
+# -----------------------------
+# ANALYSIS
+# -----------------------------
+def analyze_ifc(model, claimed_windows, price_db=WINDOW_PRICE_DB, tol=SIZE_TOLERANCE_MM):
+    """
+    Window analysis of an IFC model against a claim.
+
+    Parameters:
+        model (ifcopenshell.file): Opened IFC model
+        claimed_windows (list): List of claimed window dicts
+        price_db (dict): Price database with the area bands
+        tol (float): Allowed size difference in mm for claim matching
+
+    Returns:
+        tuple: (windows, type_counts, total_area, total_estimated_cost, match_results)
+            - windows: one dict per IfcWindow (see extract_windows)
+            - type_counts: Counter of windows per area band
+            - total_area: summed area (m2) of windows with width and height
+            - total_estimated_cost: summed estimated price (DKK)
+            - match_results: one dict per claim (see match_claims)
+    """
+    windows = extract_windows(model, price_db)
+    type_counts = Counter(w["category"] for w in windows if w["category"] is not None)
+    total_area = sum(w["area"] for w in windows if w["area"] is not None)
+    total_estimated_cost = sum(w["price"] for w in windows if w["price"] is not None)
+    match_results = match_claims(windows, claimed_windows, tol)
+    return windows, type_counts, total_area, total_estimated_cost, match_results
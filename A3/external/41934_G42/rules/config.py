@@ -0,0 +1,19 @@
+# -----------------------------
+# WINDOW PRICE DATABASE BY AREA
+# -----------------------------
+# Type names simplified, price pr. m2 is based on average derived from molio database.
+# A window belongs to a band when min_area < area <= max_area.
+WINDOW_PRICE_DB = {
+    "small": {"min_area": 0, "max_area": 1.5, "price_per_m2": 4000},
+    "medium": {"min_area": 1.5, "max_area": 3.0, "price_per_m2": 6100},
+    "large": {"min_area": 3.0, "max_area": float("inf"), "price_per_m2": 9000},
+}
+
+# Price pr. m2 for windows outside every band
+FALLBACK_PRICE_PER_M2 = 18000
+
+# -----------------------------
+# CLAIM MATCHING
+# -----------------------------
+# Allowed difference (mm) between IFC and claimed width/height
+SIZE_TOLERANCE_MM = 10
@@ -0,0 +1,105 @@
+from bisect import bisect_left
+
+import numpy as np
+
+from rules.config import WINDOW_PRICE_DB, FALLBACK_PRICE_PER_M2
+
+
+# -----------------------------
+# PRICE BANDS
+# -----------------------------
+class PriceBands:
+    """
+    Area bands of a window price database, sorted by upper bound.
+
+    A window belongs to a band when min_area < area <= max_area, so the
+    band is found by bisecting the sorted upper bounds and checking the
+    lower bound of that one band, instead of scanning all bands.
+
+    Parameters:
+        price_db (dict): {category: {"min_area", "max_area", "price_per_m2"}}
+    """
+
+    def __init__(self, price_db):
+        bands = sorted(price_db.items(), key=lambda item: item[1]["max_area"])
+        self.categories = [category for category, _ in bands]
+        self.min_areas = np.array([data["min_area"] for _, data in bands], dtype=float)
+        self.max_areas = np.array([data["max_area"] for _, data in bands], dtype=float)
+        self.prices = np.array([data["price_per_m2"] for _, data in bands], dtype=float)
+        self._max_list = self.max_areas.tolist()
+
+    def index(self, area):
+        """Band index of one area, or -1 if it is outside every band."""
+        i = bisect_left(self._max_list, area)
+        if i < len(self._max_list) and area > self.min_areas[i]:
+            return i
+        return -1
+
+    def indices(self, areas):
+        """Band index of every area in an array (-1 = outside every band)."""
+        areas = np.asarray(areas, dtype=float)
+        idx = np.searchsorted(self.max_areas, areas, side="left")
+        inside = idx < len(self.max_areas)
+        inside[inside] &= areas[inside] > self.min_areas[idx[inside]]
+        return np.where(inside, idx, -1)
+
+    def prices_for(self, areas, fallback=FALLBACK_PRICE_PER_M2):
+        """Estimated price of every area in an array."""
+        areas = np.asarray(areas, dtype=float)
+        idx = self.indices(areas)
+        rates = np.where(idx >= 0, self.prices[np.maximum(idx, 0)], fallback)
+        return areas * rates
+
+
+_DEFAULT_BANDS = PriceBands(WINDOW_PRICE_DB)
+
+
+def _bands(price_db):
+    return _DEFAULT_BANDS if price_db is None or price_db is WINDOW_PRICE_DB else PriceBands(price_db)
+
+
+# -----------------------------
+# WINDOW HELPERS
+# -----------------------------
+def categorize_window(area, price_db=None):
+    """
+    Area band of a window.
+
+    Parameters:
+        area (float): Window area in m2
+        price_db (dict): Price database (default WINDOW_PRICE_DB)
+
+    Returns:
+        str: Band name, or "unknown" if the area is outside every band
+    """
+    bands = _bands(price_db)
+    i = bands.index(area)
+    return bands.categories[i] if i >= 0 else "unknown"
+
+
+def lookup_price(area, price_db=None):
+    """
+    Estimated price of a window from its area band.
+
+    Parameters:
+        area (float): Window area in m2
+        price_db (dict): Price database (default WINDOW_PRICE_DB)
+
+    Returns:
+        float: Price in DKK (FALLBACK_PRICE_PER_M2 pr. m2 outside every band)
+    """
+    bands = _bands(price_db)
+    i = bands.index(area)
+    return area * (bands.prices[i] if i >= 0 else FALLBACK_PRICE_PER_M2)
+
+
+def window_type_label(category):
+    """Readable label of an area band, e.g. for the summary output."""
+    if category == "small":
+        return "Small (≤ 1.5 m²)"
+    elif category == "medium":
+        return "Medium (1.5 > 3.0 m²)"
+    elif category == "large":
+        return "Large (≥ 3.0 m²)"
+    else:
+        return category.capitalize()
@@ -1,4 +1,6 @@
+import sys
 import ifcopenshell
+from rules.config import WINDOW_PRICE_DB
 from rules.utils import window_type_label, categorize_window
 from rules.analysis import analyze_ifc
 from collections import Counter
@@ -20,15 +22,6 @@ CLAIMED_WINDOWS_DB = [
     # Add more claimed windows here if needed
 ]
 
-# -----------------------------
-# WINDOW PRICE DATABASE BY AREA
-# -----------------------------
-WINDOW_PRICE_DB = {
-    "small": {"min_area": 0, "max_area": 1.5, "price_per_m2": 4000},
-    "medium": {"min_area": 1.5, "max_area": 3.0, "price_per_m2": 6100},
-    "large": {"min_area": 3.0, "max_area": float("inf"), "price_per_m2": 9000},
-}
-
 # -----------------------------
 # HELPER FUNCTION
 # -----------------------------
@@ -55,12 +48,14 @@ def main():
     # -----------------------------
     # OPEN IFC MODEL
     # -----------------------------
-    model = ifcopenshell.open(r"C:\Users\MGS\Downloads\25-16-D-ARCH.ifc")
+    # Model path as first argument, e.g. python run_analysis.py 25-16-D-ARCH.ifc
+    model_path = sys.argv[1] if len(sys.argv) > 1 else r"C:\Users\MGS\Downloads\25-16-D-ARCH.ifc"
+    model = ifcopenshell.open(model_path)
 
     # -----------------------------
     # ANALYZE WINDOWS
     # -----------------------------
-    windows, type_counts, total_area, total_estimated_cost, match_results = analyze_ifc(model, CLAIMED_WINDOWS_DB)
+    windows, type_counts, total_area, total_estimated_cost, match_results = analyze_ifc(model, CLAIMED_WINDOWS_DB, WINDOW_PRICE_DB)
 
     # -----------------------------
     # COMPUTE CLAIMED TOTALS
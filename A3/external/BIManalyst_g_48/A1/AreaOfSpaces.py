@@ -3,23 +3,39 @@ import ifcopenshell.util.element
 import numpy as np
 
 # Function
-def get_area_of_spaces(model):
+def get_area_of_spaces(model, space_index=None, pset_index=None, geometry_areas=None):
+    # If a grouped space index (A3_Tool.group_spaces_by_type) is given, the areas are looked up directly
+    if space_index is not None:
+        group = space_index.get('Meeting room', {"spaces": {}})
+        return [int(sqrm) for sqrm in group["spaces"].values() if sqrm is not None]
+
     spaces = model.by_type("IfcSpace")
     meeting_room = []
     areas = []
 
     for space in spaces:
         if space.LongName == 'Meeting room':
-            meeting_room.append(int(space.Name))
-            qtos = ifcopenshell.util.element.get_psets(space, qtos_only=True)
-            sqrm = qtos['Qto_SpaceBaseQuantities']['NetFloorArea']
+            meeting_room.append(space.Name)
+            # A model-level PsetIndex (A3_Tool.build_pset_index) can be used instead of get_psets
+            if pset_index is not None:
+                qtos = pset_index.get_psets(space, qtos_only=True)
+            else:
+                qtos = ifcopenshell.util.element.get_psets(space, qtos_only=True)
+            if 'Qto_SpaceBaseQuantities' in qtos:
+                sqrm = qtos['Qto_SpaceBaseQuantities']['NetFloorArea']
+            elif geometry_areas is not None and space.GlobalId in geometry_areas:
+                # Floor area from the geometry (A3_Tool.compute_footprints), GlobalId -> area
+                sqrm = geometry_areas[space.GlobalId]
+            else:
+                print('Qto_SpaceBaseQuantities is missing for space:', space)
+                continue
             areas.append(int(sqrm))
         else:
             continue
     return areas
 
-def check_area_in_intervals(model, req_1, req_2):
-    areas = get_area_of_spaces(model)
+def check_area_in_intervals(model, req_1, req_2, space_index=None, pset_index=None, geometry_areas=None):
+    areas = get_area_of_spaces(model, space_index, pset_index, geometry_areas)
     #print(areas)
 
     list_1 = []
@@ -42,8 +58,8 @@ def check_area_in_intervals(model, req_1, req_2):
 
 
 # requirements is list with lists [[num_rooms, num_peep],[num_rooms,num_peep],...,...]
-def check_area(model, requirements):  
-    areas = get_area_of_spaces(model)
+def check_area(model, requirements, space_index=None, pset_index=None, geometry_areas=None):  
+    areas = get_area_of_spaces(model, space_index, pset_index, geometry_areas)
 
     area_requirements = []
     list_dict = {}
@@ -0,0 +1,296 @@
+import argparse
+import bisect
+import csv
+import heapq
+import json
+import math
+from pathlib import Path
+
+import ifcopenshell
+import ifcopenshell.util.element
+
+# Floor area per person for occupancy-derived minimum areas (as in AreaOfSpaces.check_area: people x 2 m2)
+AREA_PER_PERSON = 2.0
+
+# Columns of a requirements CSV (one requirement per row, empty cells = no requirement)
+REQUIREMENT_FIELDS = ("LongName", "count", "min_area", "max_area", "occupants")
+
+
+# Requirements file
+
+def _number(value, line, field, whole=False):
+    # Empty cells and missing keys give None; "12,5" is read as 12.5
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip().replace(",", ".")
+        if not value:
+            return None
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"Requirement {line}: {field} {value!r} is not a number")
+    if whole:
+        # Counts of rooms and people are never truncated
+        if not number.is_integer():
+            raise ValueError(f"Requirement {line}: {field} {value!r} is not a whole number")
+        # A negative count would always be reported as fulfilled
+        if number < 0:
+            raise ValueError(f"Requirement {line}: {field} {value!r} is negative")
+        return int(number)
+    return number
+
+def _requirement(row, area_per_person, line):
+    name = (row.get("LongName") or "").strip()
+    if not name:
+        raise ValueError(f"Requirement {line}: LongName is missing")
+
+    count = _number(row.get("count"), line, "count", whole=True)
+    min_area = _number(row.get("min_area"), line, "min_area")
+    max_area = _number(row.get("max_area"), line, "max_area")
+    occupants = _number(row.get("occupants"), line, "occupants", whole=True)
+
+    # The required minimum is the larger of the stated minimum area and the area for the occupants
+    required_min = max(min_area or 0.0, (occupants or 0) * area_per_person)
+    required_max = max_area if max_area is not None else math.inf
+    if required_min >= required_max:
+        raise ValueError(f"Requirement {line} ({name}): no area fits {required_min} <= area < {required_max}")
+
+    return {
+        "LongName": name,
+        "count": count,
+        "min_area": min_area,
+        "max_area": max_area,
+        "occupants": occupants,
+        "required_min": required_min,
+        "required_max": required_max,
+    }
+
+def load_requirements(file_path, area_per_person=None):
+    file_path = Path(file_path)
+
+    if file_path.suffix.lower() == ".csv":
+        with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+            header = f.readline()
+            f.seek(0)
+            rows = list(csv.DictReader(f, delimiter=";" if ";" in header else ","))
+        file_area_per_person = None
+    else:
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # Either a list of requirements or {"area_per_person": ..., "requirements": [...]}
+        if isinstance(data, dict):
+            rows = data.get("requirements", [])
+            file_area_per_person = data.get("area_per_person")
+        else:
+            rows = data
+            file_area_per_person = None
+
+    if area_per_person is None:
+        area_per_person = file_area_per_person if file_area_per_person is not None else AREA_PER_PERSON
+
+    # Returns one value:
+    # 1) A list with one requirement per row: LongName, count, min_area, max_area, occupants
+    #    and the resulting interval required_min <= area < required_max
+    return [_requirement(row, area_per_person, line) for line, row in enumerate(rows, start=1)]
+
+
+# Space index
+
+def index_spaces(model, space_index=None, pset_index=None, geometry_areas=None):
+    index = {}
+
+    def add(name, sqrm):
+        entry = index.get(name)
+        if entry is None:
+            entry = {"count": 0, "areas": [], "without_area": 0}
+            index[name] = entry
+        entry["count"] += 1
+        if sqrm is None:
+            entry["without_area"] += 1
+        else:
+            entry["areas"].append(sqrm)
+
+    if space_index is not None:
+        # A grouped space index (A3_Tool.group_spaces_by_type) already holds the area of every space
+        for name, group in space_index.items():
+            for sqrm in group["spaces"].values():
+                add(name, sqrm)
+    else:
+        # One pass over all spaces; names are never parsed, so non-numeric space numbers are fine
+        for space in model.by_type("IfcSpace"):
+            # A model-level PsetIndex (A3_Tool.build_pset_index) can be used instead of get_psets
+            if pset_index is not None:
+                qtos = pset_index.get_psets(space, qtos_only=True)
+            else:
+                qtos = ifcopenshell.util.element.get_psets(space, qtos_only=True)
+            sqrm = qtos.get("Qto_SpaceBaseQuantities", {}).get("NetFloorArea")
+            if sqrm is None and geometry_areas is not None:
+                # Floor area from the geometry (A3_Tool.compute_footprints), GlobalId -> area
+                sqrm = geometry_areas.get(space.GlobalId)
+            add(space.LongName, sqrm)
+
+    for entry in index.values():
+        entry["areas"].sort()
+
+    # Returns one value:
+    # 1) A dictionary with each type of space (LongName) and its number of spaces, the sorted
+    #    areas of the spaces with an area and the number of spaces without one
+    return index
+
+
+# Matching
+
+def _assign(areas, counted):
+    # counted: (requirement number, required_min, required_max, count) of one space type
+    # The spaces are visited from small to large, and each goes to the open requirement with the
+    # smallest upper bound. This fills as many of the required rooms as any assignment could.
+    by_min = sorted(counted, key=lambda r: r[1])
+    assigned = {i: 0 for i, *_ in counted}
+    open_reqs = []
+    j = 0
+    for sqrm in areas:
+        while j < len(by_min) and by_min[j][1] <= sqrm:
+            i, _, required_max, count = by_min[j]
+            heapq.heappush(open_reqs, (required_max, i, count))
+            j += 1
+        # Drop requirements the space is too large for (areas only grow) and full requirements
+        while open_reqs and (open_reqs[0][0] <= sqrm or assigned[open_reqs[0][1]] >= open_reqs[0][2]):
+            heapq.heappop(open_reqs)
+        if open_reqs:
+            assigned[open_reqs[0][1]] += 1
+    return assigned
+
+def check_requirements(model, requirements, space_index=None, pset_index=None, geometry_areas=None, spaces=None):
+    # The spaces are indexed once (or an existing index_spaces result is reused) for all requirements
+    if spaces is None:
+        spaces = index_spaces(model, space_index, pset_index, geometry_areas)
+
+    by_type = {}
+    for i, req in enumerate(requirements):
+        by_type.setdefault(req["LongName"], []).append(i)
+
+    results = [None] * len(requirements)
+    space_types = {}
+    for name, numbers in by_type.items():
+        entry = spaces.get(name, {"count": 0, "areas": [], "without_area": 0})
+        areas = entry["areas"]
+
+        # Requirements with a count share the spaces of their type, each space is used once
+        counted = [
+            (i, requirements[i]["required_min"], requirements[i]["required_max"], requirements[i]["count"])
+            for i in numbers if requirements[i]["count"] is not None
+        ]
+        assigned = _assign(areas, counted) if counted else {}
+
+        for i in numbers:
+            req = requirements[i]
+            # Sorted areas: the spaces below, inside and above the interval are found by bisection
+            below = bisect.bisect_left(areas, req["required_min"])
+            above = len(areas) - bisect.bisect_left(areas, req["required_max"])
+            in_interval = len(areas) - below - above
+
+            if req["count"] is not None:
+                missing = max(req["count"] - assigned[i], 0)
+            else:
+                # Without a count every space of the type has to meet the area requirement
+                missing = entry["count"] - in_interval
+            if entry["count"] == 0:
+                status = "missing_type"
+            else:
+                status = "fulfilled" if missing == 0 else "not_fulfilled"
+
+            results[i] = {
+                **{key: req[key] for key in REQUIREMENT_FIELDS},
+                # The interval that was checked (None: no upper bound)
+                "required_min": req["required_min"],
+                "required_max": None if math.isinf(req["required_max"]) else req["required_max"],
+                "spaces": entry["count"],
+                "below": below,
+                "in_interval": in_interval,
+                "above": above,
+                "without_area": entry["without_area"],
+                "assigned": assigned.get(i),
+                "missing": missing,
+                "status": status,
+            }
+
+        required = sum(count for *_, count in counted)
+        space_types[name] = {
+            "count": entry["count"],
+            "without_area": entry["without_area"],
+            "min": areas[0] if areas else None,
+            "max": areas[-1] if areas else None,
+            "required": required if counted else None,
+            "assigned": sum(assigned.values()) if counted else None,
+            # Same comparison as SpaceRequirement.check_space_requirement, over all requirements of the type
+            "count_status": None if not counted else (
+                "equal" if entry["count"] == required else "more" if entry["count"] > required else "less"
+            ),
+        }
+
+    fulfilled = sum(result["status"] == "fulfilled" for result in results)
+
+    # Returns one value:
+    # 1) A dictionary with "ok" (all requirements fulfilled), a "summary" with the number of
+    #    requirements, fulfilled and not fulfilled, one result per requirement (in file order),
+    #    the matched space types and the space types in the model without any requirement
+    return {
+        "ok": fulfilled == len(results),
+        "summary": {
+            "requirements": len(results),
+            "fulfilled": fulfilled,
+            "not_fulfilled": len(results) - fulfilled,
+        },
+        "requirements": results,
+        "space_types": space_types,
+        "unrequired_types": sorted(str(name) for name in spaces if name not in by_type),
+    }
+
+def format_report(report):
+    lines = []
+    for result in report["requirements"]:
+        interval = f"{result['required_min']:g} m2 <= area"
+        if result["required_max"] is not None:
+            interval += f" < {result['required_max']:g} m2"
+        if result["status"] == "missing_type":
+            lines.append(f"{result['LongName']}: there are no spaces of this type in the model")
+        elif result["count"] is not None:
+            lines.append(
+                f"{result['LongName']} ({interval}): {result['assigned']} of the required {result['count']} found"
+                + ("" if result["missing"] == 0 else f", {result['missing']} missing")
+            )
+        else:
+            lines.append(
+                f"{result['LongName']} ({interval}): {result['in_interval']} of {result['spaces']} spaces meet the requirement"
+            )
+    summary = report["summary"]
+    lines.append(f"{summary['fulfilled']} of {summary['requirements']} requirements are fulfilled")
+
+    # Returns one value:
+    # 1) A list of lines, one per requirement plus the summary
+    return lines
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Check an IFC model against a file of room program requirements.")
+    parser.add_argument("ifc", help="IFC file to check.")
+    parser.add_argument("requirements", help="Requirements JSON or CSV (LongName, count, min_area, max_area, occupants).")
+    parser.add_argument("--area-per-person", type=float, default=None,
+                        help=f"Floor area per occupant in m2 (default: from the file, else {AREA_PER_PERSON:g}).")
+    parser.add_argument("--output", default=None, help="Write the report as JSON here.")
+    return parser.parse_args()
+
+def main():
+    args = _parse_args()
+    requirements = load_requirements(args.requirements, args.area_per_person)
+    report = check_requirements(ifcopenshell.open(args.ifc), requirements)
+    for line in format_report(report):
+        print(line)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
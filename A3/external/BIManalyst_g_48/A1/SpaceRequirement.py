@@ -1,19 +1,23 @@
 import ifcopenshell
 
-def check_space_requirement(model, requirement_nam, requirement_num):
-    spaces = model.by_type("IfcSpace")
-    meeting_room = []
+def check_space_requirement(model, requirement_nam, requirement_num, space_index=None):
+    # If a grouped space index (A3_Tool.group_spaces_by_type) is given, the count is looked up directly
+    if space_index is not None:
+        meeting_room = list(space_index.get(requirement_nam, {}).get("spaces", {}))
+    else:
+        spaces = model.by_type("IfcSpace")
+        meeting_room = []
 
-    for space in spaces:
-        # Go through all spaces and pick out the ones of the desired type
-        if space.LongName == requirement_nam:
-            # Take all spaces of required kind and put into a list to see how many of the space type there is
-            meeting_room.append(int(space.Name))
-        else:
-            continue
+        for space in spaces:
+            # Go through all spaces and pick out the ones of the desired type
+            if space.LongName == requirement_nam:
+                # Take all spaces of required kind and put into a list to see how many of the space type there is
+                meeting_room.append(space.Name)
+            else:
+                continue
     if len(meeting_room) == requirement_num:
         print(f'The requirement of {requirement_nam} = {requirement_num} is fulfilled')
     elif len(meeting_room) > requirement_num:
         print(f'There are {len(meeting_room)} {requirement_nam} in the model which is more than the required {requirement_num}')
     elif len(meeting_room) < requirement_num:
-        print(f'There are {len(meeting_room)} {requirement_nam} in the model which is less than the required {requirement_num}')
\ No newline at end of file
+        print(f'There are {len(meeting_room)} {requirement_nam} in the model which is less than the required {requirement_num}')
@@ -1,191 +1,538 @@
 import ifcopenshell
+import ifcopenshell.geom
 import ifcopenshell.util.element
+import numpy as np
+import multiprocessing
+import hashlib
 import json
 import os
 import csv
-import shutil
 
-def total_area_and_number(model):
-    # Extract all spaces from the IFC model
-    spaces = model.by_type("IfcSpace") 
-    Area_sum = []
+class PsetIndex:
+    # Model-level property/quantity set index, built with one sweep over IfcRelDefinesByProperties
+    # and IfcRelDefinesByType instead of following IsDefinedBy for every element.
+    # Property definitions are only resolved (and then memoized) the first time they are asked for,
+    # so definitions shared between many elements are resolved once.
+    # get_psets() returns the same result as ifcopenshell.util.element.get_psets (with type inheritance),
+    # so an index can be passed to every extraction function below as a drop-in through 'pset_index'.
+
+    def __init__(self, model):
+        self.model = model
+        self._occurrence_defs = {}   # element id -> [definition, ...] in relationship order
+        self._element_type = {}      # element id -> type id
+        self._resolved = {}          # definition id -> (name, kind, values)
+
+        for rel in model.by_type("IfcRelDefinesByProperties"):
+            definition = rel.RelatingPropertyDefinition
+            if definition is None:
+                continue
+            # IfcPropertySetDefinitionSet wraps a list of property set definitions
+            definitions = definition.wrappedValue if definition.is_a("IfcPropertySetDefinitionSet") else (definition,)
+            for element in rel.RelatedObjects:
+                self._occurrence_defs.setdefault(element.id(), []).extend(definitions)
+
+        for rel in model.by_type("IfcRelDefinesByType"):
+            for element in rel.RelatedObjects:
+                self._element_type.setdefault(element.id(), rel.RelatingType.id())
+
+    def _resolve(self, definition):
+        resolved = self._resolved.get(definition.id())
+        if resolved is None:
+            if definition.is_a("IfcElementQuantity"):
+                kind = "qto"
+            elif definition.is_a("IfcPropertySet") or definition.is_a("IfcPreDefinedPropertySet"):
+                kind = "pset"
+            else:
+                kind = "other"
+            values = ifcopenshell.util.element.get_property_definition(definition)
+            resolved = (definition.Name, kind, values)
+            self._resolved[definition.id()] = resolved
+        return resolved
+
+    def _collect(self, definitions, psets, psets_only, qtos_only):
+        for definition in definitions:
+            name, kind, values = self._resolve(definition)
+            if psets_only and kind != "pset":
+                continue
+            if qtos_only and kind != "qto":
+                continue
+            psets.setdefault(name, {}).update(values)
+        return psets
+
+    def _type_definitions(self, type_id):
+        return self.model.by_id(type_id).HasPropertySets or []
+
+    def get_psets(self, element, psets_only=False, qtos_only=False, should_inherit=True):
+        # Same arguments and result as ifcopenshell.util.element.get_psets
+        if element.is_a("IfcTypeObject"):
+            return self._collect(element.HasPropertySets or [], {}, psets_only, qtos_only)
+        if getattr(element, "IsDefinedBy", None) is None:
+            # Materials, profiles etc. are not indexed
+            return ifcopenshell.util.element.get_psets(element, psets_only=psets_only, qtos_only=qtos_only, should_inherit=should_inherit)
+        psets = {}
+        type_id = self._element_type.get(element.id())
+        if should_inherit and type_id is not None:
+            self._collect(self._type_definitions(type_id), psets, psets_only, qtos_only)
+        return self._collect(self._occurrence_defs.get(element.id(), []), psets, psets_only, qtos_only)
+
+    def definitions(self, element, should_inherit=True):
+        # Raw property definitions of an element (type ones first, as get_psets applies them), without resolving them
+        definitions = []
+        type_id = self._element_type.get(element.id())
+        if should_inherit and type_id is not None:
+            definitions.extend(self._type_definitions(type_id))
+        definitions.extend(self._occurrence_defs.get(element.id(), []))
+        return definitions
+
+    def by_class(self, ifc_class, pset_name, qtos_only=False):
+        # Bulk lookup: element id -> values of one property/quantity set, for every element of a class
+        result = {}
+        for element in self.model.by_type(ifc_class):
+            values = self.get_psets(element, qtos_only=qtos_only).get(pset_name)
+            if values is not None:
+                result[element.id()] = values
+        return result
+
+    def by_property(self, pset_name, prop_name, ifc_class=None):
+        # Bulk lookup: element id -> value of one property, for all indexed elements (optionally of one class)
+        if ifc_class is not None:
+            elements = self.model.by_type(ifc_class)
+        else:
+            elements = [self.model.by_id(element_id) for element_id in self._occurrence_defs.keys() | self._element_type.keys()]
+        result = {}
+        for element in elements:
+            values = self.get_psets(element).get(pset_name)
+            if values is not None and prop_name in values:
+                result[element.id()] = values[prop_name]
+        return result
+
+def build_pset_index(model):
+    # Returns one value:
+    # 1) A PsetIndex for the model that can be passed to the extraction functions as 'pset_index'
+    return PsetIndex(model)
+
+def _get_psets(element, pset_index=None, **kwargs):
+    # Resolve property sets through the index if one is given, otherwise per element
+    if pset_index is not None:
+        return pset_index.get_psets(element, **kwargs)
+    return ifcopenshell.util.element.get_psets(element, **kwargs)
+
+def _name_contains(element, keyword):
+    # Checks whether the ObjectType or Name of an element contains the keyword (case insensitive)
+    element_type = element.ObjectType
+    element_name = element.Name
+    return bool(element_type and keyword.lower() in element_type.lower() or element_name and keyword.lower() in element_name.lower())
+
+def space_quantity_row(space, pset_index=None):
+    # Resolves the quantity sets of one space
+    qtos = _get_psets(space, pset_index, qtos_only=True)
+    if 'Qto_SpaceBaseQuantities' in qtos:
+        sqrm = qtos['Qto_SpaceBaseQuantities']['NetFloorArea']
+    else:
+        sqrm = None
 
-    # Iterates through every space found in the model
-    for space in spaces:
-        # Retrieve only quantity sets for the current space
-        qtos = ifcopenshell.util.element.get_psets(space, qtos_only=True)
-        if 'Qto_SpaceBaseQuantities' in qtos:
-            sqrm = qtos['Qto_SpaceBaseQuantities']['NetFloorArea']
-            Area_sum.append(sqrm)
+    # Returns one value:
+    # 1) The row of the space (NetFloorArea is None when the quantity set is missing)
+    return {"GlobalId": space.GlobalId, "LongName": space.LongName, "NetFloorArea": sqrm}
+
+def wall_quantity_row(wall, pset_index=None):
+    # Only interior and exterior walls are used further on
+    interior = _name_contains(wall, "Interior")
+    exterior = _name_contains(wall, "Exterior")
+    if not (interior or exterior):
+        return None
+    qtos = _get_psets(wall, pset_index, qtos_only=True)
+    row = {"GlobalId": wall.GlobalId, "interior": interior, "exterior": exterior, "has_qto": False,
+           "Length": 0, "NetSideArea": 0, "NetVolume": 0}
+    if 'Qto_WallBaseQuantities' in qtos:
+        row["has_qto"] = True
+        row["Length"] = qtos['Qto_WallBaseQuantities'].get('Length',0)
+        row["NetSideArea"] = qtos['Qto_WallBaseQuantities'].get('NetSideArea',0)
+        row["NetVolume"] = qtos['Qto_WallBaseQuantities'].get('NetVolume',0)
+
+    # Returns one value:
+    # 1) The row of the wall, or None when it is neither an interior nor an exterior wall
+    return row
+
+def curtain_wall_quantity_row(wall, pset_index=None):
+    if not _name_contains(wall, "Curtain"):
+        return None
+    qtos = _get_psets(wall, pset_index, qtos_only=True)
+    row = {"GlobalId": wall.GlobalId, "has_qto": False, "Length": 0}
+    if 'Qto_CurtainWallQuantities' in qtos:
+        row["has_qto"] = True
+        row["Length"] = qtos['Qto_CurtainWallQuantities'].get('Length',0)
+
+    # Returns one value:
+    # 1) The row of the curtain wall, or None when its name does not contain 'Curtain'
+    return row
+
+def column_quantity_row(column, pset_index=None):
+    psets = _get_psets(column, pset_index, qtos_only=False)
+    row = {"GlobalId": column.GlobalId, "has_dimensions": False, "Depth": 0, "Width": 0}
+    if 'Dimensions' in psets:
+        row["has_dimensions"] = True
+        row["Depth"] = psets['Dimensions'].get('Depth',0)
+        row["Width"] = psets['Dimensions'].get('Width',0)
+
+    # Returns one value:
+    # 1) The row of the column
+    return row
+
+# Element category of the quantity table -> (IFC class, row function)
+QUANTITY_CATEGORIES = {
+    "spaces": ("IfcSpace", space_quantity_row),
+    "walls": ("IfcWall", wall_quantity_row),
+    "curtain_walls": ("IfcCurtainWall", curtain_wall_quantity_row),
+    "columns": ("IfcColumn", column_quantity_row),
+}
+
+# Element category -> (property/quantity set of its rows, check for a row without it).
+# Missing sets are reported once per category (the validation report lists the elements)
+MISSING_QUANTITIES = {
+    "spaces": ("Qto_SpaceBaseQuantities", lambda row: row["NetFloorArea"] is None),
+    "walls": ("Qto_WallBaseQuantities", lambda row: not row["has_qto"]),
+    "curtain_walls": ("Qto_CurtainWallQuantities", lambda row: not row["has_qto"]),
+    "columns": ("Dimensions", lambda row: not row["has_dimensions"]),
+}
+
+def _extract_rows(model, key, pset_index=None):
+    # Applies the row function of a category to every element of its IFC class, in model order
+    ifc_class, row_function = QUANTITY_CATEGORIES[key]
+    rows = []
+    for element in model.by_type(ifc_class):
+        row = row_function(element, pset_index)
+        if row is not None:
+            rows.append(row)
+    pset_name, is_missing = MISSING_QUANTITIES[key]
+    missing = sum(1 for row in rows if is_missing(row))
+    if missing:
+        print(f"{pset_name} is missing for {missing} of {len(rows)} {key.replace('_', ' ')}")
+    return rows
+
+def extract_space_quantities(model, pset_index=None):
+    # Returns one value:
+    # 1) A list with one row per space (NetFloorArea is None when the quantity set is missing)
+    return _extract_rows(model, "spaces", pset_index)
+
+def extract_wall_quantities(model, pset_index=None):
+    # Returns one value:
+    # 1) A list with one row per interior/exterior wall
+    return _extract_rows(model, "walls", pset_index)
+
+def extract_curtain_wall_quantities(model, pset_index=None):
+    # Returns one value:
+    # 1) A list with one row per curtain wall
+    return _extract_rows(model, "curtain_walls", pset_index)
+
+def extract_column_quantities(model, pset_index=None):
+    # Returns one value:
+    # 1) A list with one row per column
+    return _extract_rows(model, "columns", pset_index)
+
+def _geometry_signature(element):
+    # Changes whenever the shape or the placement of the element changes (STEP ids are left out)
+    parts = [element.Representation, element.ObjectPlacement]
+    info = [part.get_info(include_identifier=False, recursive=True) if part is not None else None for part in parts]
+    return hashlib.sha1(repr(info).encode("utf-8")).hexdigest()
+
+def _footprint_area(geometry):
+    # Sums the triangles facing downwards, projected on the XY plane.
+    # For a space this is its floor area, for a wall or column the floor area it covers.
+    verts = np.asarray(geometry.verts, dtype=float).reshape(-1, 3)
+    faces = np.asarray(geometry.faces, dtype=int).reshape(-1, 3)
+    if len(faces) == 0:
+        return 0.0
+    a, b, c = verts[faces[:, 0]], verts[faces[:, 1]], verts[faces[:, 2]]
+    normal_z = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+    return float(-normal_z[normal_z < 0].sum() / 2)
+
+def compute_footprints(model, elements, num_threads=None, cache=None):
+    # Tessellates the elements with ifcopenshell's geometry iterator on several CPU cores
+    # and measures their footprint in m2 (the iterator works in metres).
+    # 'cache' is a dictionary GlobalId -> {"signature", "area"} that is read and updated,
+    # so elements whose geometry did not change are not tessellated again.
+    if cache is None:
+        cache = {}
+    footprints = {}
+    signatures = {}
+    todo = []
+    for element in elements:
+        if element.Representation is None:
+            continue
+        signature = _geometry_signature(element)
+        cached = cache.get(element.GlobalId)
+        if cached is not None and cached["signature"] == signature:
+            footprints[element.GlobalId] = cached["area"]
+        else:
+            signatures[element.GlobalId] = signature
+            todo.append(element)
+
+    if todo:
+        settings = ifcopenshell.geom.settings()
+        settings.set("use-world-coords", True)
+        iterator = ifcopenshell.geom.iterator(settings, model, num_threads or multiprocessing.cpu_count(), include=todo)
+        # Elements whose geometry cannot be processed are skipped by the iterator
+        if iterator.initialize():
+            while True:
+                shape = iterator.get()
+                area = _footprint_area(shape.geometry)
+                footprints[shape.guid] = area
+                cache[shape.guid] = {"signature": signatures[shape.guid], "area": area}
+                if not iterator.next():
+                    break
+
+    # Returns one value:
+    # 1) A dictionary GlobalId -> footprint area (m2) for every element with a usable geometry
+    return footprints
+
+def row_without_quantities(key, row):
+    # Returns one value:
+    # 1) True when fill_quantities_from_geometry takes the area of this row (of category 'key') from the geometry
+    if key == "spaces":
+        return row["NetFloorArea"] is None or bool(row.get("from_geometry"))
+    if key == "walls":
+        return not row["has_qto"]
+    if key == "columns":
+        return not row["has_dimensions"]
+    return False
+
+def fill_quantities_from_geometry(model, quantities, num_threads=None, cache=None):
+    # Spaces without Qto_SpaceBaseQuantities, walls without Qto_WallBaseQuantities and columns
+    # without Dimensions get their area from the geometry instead. Such rows are marked with
+    # "from_geometry", and are recomputed (through the cache) whenever the table is filled again.
+    missing = [row for key, rows in quantities.items() for row in rows if row_without_quantities(key, row)]
+    if not missing:
+        return 0
+
+    elements = [model.by_guid(row["GlobalId"]) for row in missing]
+    footprints = compute_footprints(model, elements, num_threads, cache)
+    filled = 0
+    for row in missing:
+        area = footprints.get(row["GlobalId"])
+        if area is None:
+            continue
+        if "NetFloorArea" in row:
+            row["NetFloorArea"] = area
         else:
-            print('Qto_SpaceBaseQuantities is missing for space:', space)
+            row["Footprint"] = area
+        row["from_geometry"] = True
+        filled += 1
+    print('Areas taken from geometry for', filled, 'of', len(missing), 'elements without quantities')
+
+    # Returns one value:
+    # 1) The number of rows that got an area from the geometry
+    return filled
+
+def extract_quantities(model, pset_index=None, geometry=False, num_threads=None, geometry_cache=None):
+    # Walks spaces, walls, curtain walls and columns once and collects every quantity
+    # the area and price functions need. The result can be passed to all functions below
+    # through their 'quantities' argument, so property sets are only resolved once per element.
+    # Without a pset_index, one is built here, since all four element categories use it.
+    # With geometry=True, missing quantities are computed from the geometry (fill_quantities_from_geometry).
+    if pset_index is None:
+        pset_index = build_pset_index(model)
+    quantities = {
+        "spaces": extract_space_quantities(model, pset_index),
+        "walls": extract_wall_quantities(model, pset_index),
+        "curtain_walls": extract_curtain_wall_quantities(model, pset_index),
+        "columns": extract_column_quantities(model, pset_index),
+    }
+    if geometry:
+        fill_quantities_from_geometry(model, quantities, num_threads, geometry_cache)
+
+    # Returns one value:
+    # 1) A dictionary (quantity table) with a list of rows for each element category
+    return quantities
+
+def _get_rows(model, quantities, key, extractor):
+    # Use the rows from an existing quantity table, otherwise extract only the needed category
+    if quantities is not None and key in quantities:
+        return quantities[key]
+    return extractor(model)
+
+def total_area_and_number(model, quantities=None):
+    spaces = _get_rows(model, quantities, "spaces", extract_space_quantities)
+    Area_sum = [space["NetFloorArea"] for space in spaces if space["NetFloorArea"] is not None]
 
     # Returns two values:
     # 1) The total area
     # 2) The total number of spaces in the model
     return round(sum(Area_sum), 1), len(Area_sum)
 
-def get_area_by_space_types(model):
-    # Extract all spaces from the IFC model
-    spaces = model.by_type("IfcSpace")
-    space_list = []
-    area_by_type = {}
+def group_spaces_by_type(model, quantities=None):
+    spaces = _get_rows(model, quantities, "spaces", extract_space_quantities)
+    groups = {}
 
-    # Create a list of all spaces
+    # One pass over all spaces, grouping them by type (LongName) in the order they first appear
     for space in spaces:
-        space_list.append(space.LongName)
-    # Change the list to only contain each space type once
-    space_types = list(dict.fromkeys(space_list))
-
-    # Iterate through each type of space
-    for type in space_types:
-        # Create list to sum total area for each space type
-        area_by_type[type] = []
-        for space in spaces:
-            if space.LongName == type:
-                qtos = ifcopenshell.util.element.get_psets(space, qtos_only=True)
-                if 'Qto_SpaceBaseQuantities' in qtos:
-                    sqrm = qtos['Qto_SpaceBaseQuantities']['NetFloorArea']
-                    # Add space type with corresponding area to the dictionary initiated in the top
-                    area_by_type[type].append(sqrm)
-                else:
-                    print('Qto_SpaceBaseQuantities is missing for space:', space)
-        # sum the list for the current space type
-        area_by_type[type] = round(sum(area_by_type[type]),2)
+        group = groups.get(space["LongName"])
+        if group is None:
+            group = {"area": 0.0, "count": 0, "min": None, "max": None, "spaces": {}}
+            groups[space["LongName"]] = group
+        sqrm = space["NetFloorArea"]
+        group["count"] += 1
+        group["spaces"][space["GlobalId"]] = sqrm
+        # Spaces without Qto_SpaceBaseQuantities are counted, but do not contribute to the area
+        if sqrm is not None:
+            group["area"] += sqrm
+            group["min"] = sqrm if group["min"] is None else min(group["min"], sqrm)
+            group["max"] = sqrm if group["max"] is None else max(group["max"], sqrm)
+
+    # Returns one value:
+    # 1) A dictionary with each type of space and its summed area, number of spaces,
+    #    smallest and largest area and the area of each space keyed by GlobalId
+    return groups
+
+def get_area_by_space_types(model, quantities=None, groups=None):
+    # Reuse an existing grouped index if it was given
+    if groups is None:
+        groups = group_spaces_by_type(model, quantities)
+
+    # sum the list for each space type
+    area_by_type = {type: round(group["area"],2) for type, group in groups.items()}
 
     # Returns one value:
     # 1) A dictionary with each type of space and the corresponding summed area
     return area_by_type
 
-def interior_walls_area(model):
-    # Extract all walls from the IFC model
-    walls = model.by_type("IfcWall")
-    area_sum = 0.0
+def wall_footprint(wall):
+    # Floor area under one wall row
+    if wall["has_qto"]:
+        if wall["NetSideArea"] > 0.0:
+            width = wall["NetVolume"] / wall["NetSideArea"]
+            return width * wall["Length"] * 10**-3
+        return 0.0
+    if wall.get("Footprint") is not None:
+        # Footprint computed from the geometry (fill_quantities_from_geometry)
+        return wall["Footprint"]
 
-    # Iterate through each wall
+    # Returns one value:
+    # 1) The floor area covered by the wall (0.0 when it has neither a qto nor a footprint)
+    return 0.0
+
+def _walls_area(walls, side):
+    area_sum = 0.0
     for wall in walls:
-        wall_type = wall.ObjectType
-        wall_name = wall.Name
-        # Goes through the walls and picks out all interior walls
-        if wall_type and "Interior".lower() in wall_type.lower() or wall_name and "Interior".lower() in wall_name.lower():
-            qtos = ifcopenshell.util.element.get_psets(wall, qtos_only=True)
-            # for all spaces with the defined quantity set, get length area and volume
-            if 'Qto_WallBaseQuantities' in qtos:
-                length = qtos['Qto_WallBaseQuantities'].get('Length',0)
-                sidearea = qtos['Qto_WallBaseQuantities'].get('NetSideArea',0)
-                volume = qtos['Qto_WallBaseQuantities'].get('NetVolume',0)
-                # Calculate floor area under the wall and sum it together
-                if sidearea > 0.0:
-                    width = volume / sidearea
-                    area = width * length * 10**-3
-                    area_sum += area
-            else:
-                print('Qto_WallBaseQuantities is missing for wall:', wall_name, wall_type)
-    
+        if wall[side]:
+            # Calculate floor area under the wall and sum it together
+            area_sum += wall_footprint(wall)
+    return round(area_sum, 2)
+
+def interior_walls_area(model, quantities=None):
+    walls = _get_rows(model, quantities, "walls", extract_wall_quantities)
+
     # Returns one value:
     # 1) The summed floorarea covered by interior walls
-    return round(area_sum, 2)
+    return _walls_area(walls, "interior")
 
-def exterior_walls_area(model):
-    # Extract all walls from the IFC model
-    walls = model.by_type("IfcWall")
-    area_sum = 0.0
+def exterior_walls_area(model, quantities=None):
+    walls = _get_rows(model, quantities, "walls", extract_wall_quantities)
 
-    # Iterate through each wall
-    for wall in walls:
-        wall_type = wall.ObjectType
-        wall_name = wall.Name
-        # Goes through the walls and picks out all exterior walls
-        if wall_type and "Exterior".lower() in wall_type.lower() or wall_name and "Exterior".lower() in wall_name.lower():
-            qtos = ifcopenshell.util.element.get_psets(wall, qtos_only=True)
-            # for all spaces with the defined quantity set, get length area and volume
-            if 'Qto_WallBaseQuantities' in qtos:
-                length = qtos['Qto_WallBaseQuantities'].get('Length',0)
-                sidearea = qtos['Qto_WallBaseQuantities'].get('NetSideArea',0)
-                volume = qtos['Qto_WallBaseQuantities'].get('NetVolume',0)
-                # Calculate floor area under the wall and sum it together
-                if sidearea > 0.0:
-                    width = volume / sidearea
-                    area = width * length * 10**-3
-                    area_sum += area
-            else: 
-                print('Qto_WallBaseQuantities is missing for wall:', wall_name, wall_type)
+    # Returns one value:
+    # 1) The summed floorarea covered by exterior walls
+    return _walls_area(walls, "exterior")
+
+def curtain_wall_footprint(wall):
+    # Floor area under one curtain wall row (0.0 when it has no quantity set)
+    if wall["has_qto"]:
+        return 150 * wall["Length"] *10**-6
 
     # Returns one value:
-    # 1) The summed floorarea covered by exterior walls              
-    return round(area_sum, 2)
+    # 1) The floor area covered by the curtain wall
+    return 0.0
 
-def curtain_walls_area(model):
-    # Extract all walls from the IFC model
-    walls = model.by_type("IfcCurtainWall")
+def curtain_walls_area(model, quantities=None):
+    walls = _get_rows(model, quantities, "curtain_walls", extract_curtain_wall_quantities)
     area_sum = 0.0
 
-    # Iterate through each wall
     for wall in walls:
-        wall_type = wall.ObjectType
-        wall_name = wall.Name
-        # Goes through the walls and picks out all interior walls
-        if wall_type and "Curtain".lower() in wall_type.lower() or wall_name and "Curtain".lower() in wall_name.lower():
-            qtos = ifcopenshell.util.element.get_psets(wall, qtos_only=True)
-            # for all spaces with the defined quantity set, get length area and volume
-            if 'Qto_CurtainWallQuantities' in qtos:
-                length = qtos['Qto_CurtainWallQuantities'].get('Length',0)
-                # Calculate floor area under the wall and sum it together
-                area = 150 * length *10**-6
-                area_sum += area
-            else: 
-                print('Qto_WallBaseQuantities is missing for wall:', wall_name, wall_type)
+        # Calculate floor area under the wall and sum it together
+        area_sum += curtain_wall_footprint(wall)
 
     # Returns one value:
-    # 1) The summed floorarea covered by curtainwalls              
+    # 1) The summed floorarea covered by curtainwalls
     return round(area_sum, 2)
 
-def columns_area(model):
-    columns = model.by_type('IfcColumn')
+def column_footprint(column):
+    # Floor area under one column row
+    if column["has_dimensions"]:
+        return column["Depth"] * column["Width"] * 10**-6
+    if column.get("Footprint") is not None:
+        # Footprint computed from the geometry (fill_quantities_from_geometry)
+        return column["Footprint"]
+
+    # Returns one value:
+    # 1) The floor area covered by the column (0.0 when it has neither dimensions nor a footprint)
+    return 0.0
+
+def columns_area(model, quantities=None):
+    columns = _get_rows(model, quantities, "columns", extract_column_quantities)
     area_sum = 0.0
 
     for column in columns:
-        psets = ifcopenshell.util.element.get_psets(column, qtos_only=False)
-        if 'Dimensions' in psets:
-            length = psets['Dimensions'].get('Depth',0)
-            width = psets['Dimensions'].get('Width',0)
-            area = length * width * 10**-6
-            area_sum += area
-        else:
-            print('Dimensions is missing for column: ', column)
+        area_sum += column_footprint(column)
 
     # Returns one value:
     # 1) The summed floorarea covered by columns
     return round(area_sum, 2)
 
-def copy_csv_files_to_folder(src_folder):
-    # Name of the output folder where CSV files will be copied
+def summarize_areas(model, quantities=None):
+    # Build the quantity table once if it was not given
+    if quantities is None:
+        quantities = extract_quantities(model)
+
+    spaces_area = get_area_by_space_types(model, quantities)
+    total_area_number_of_spaces = total_area_and_number(model, quantities)
+    walls_area_int = interior_walls_area(model, quantities)
+    walls_area_ext = exterior_walls_area(model, quantities)
+    curtainwalls_area = curtain_walls_area(model, quantities)
+    columns_total_area = columns_area(model, quantities)
+    gross_floor_area = round(total_area_number_of_spaces[0] + walls_area_int + walls_area_ext + curtainwalls_area + columns_total_area, 2)
+
+    # Returns one value:
+    # 1) A dictionary with the area data written by area_output_to_json
+    return {
+        "Area of spaces": spaces_area,
+        "Total area of spaces": total_area_number_of_spaces[0],
+        "Total number of spaces": total_area_number_of_spaces[1],
+        "Area of interior walls": walls_area_int,
+        "Area of exterior walls": walls_area_ext,
+        "Area of curtain walls": curtainwalls_area,
+        "Area of columns": columns_total_area,
+        "Total summed area": gross_floor_area
+    }
+
+def get_output_folder(src_folder):
+    # Name of the output folder where the JSON files are written
     folder_name = 'Output'
-    # construct the full path to the destination folder
+    # construct the full path to the output folder
     dest_folder = os.path.join(src_folder, folder_name)
-    # Create the destination folder if it doesn't already exist
+    # Create the output folder if it doesn't already exist
     os.makedirs(dest_folder, exist_ok=True)
-    
-    # Find all CSV files in the source folder
-    csv_files = [f for f in os.listdir(src_folder) if f.endswith('.csv') and os.path.isfile(os.path.join(src_folder, f))]
-    copied_files = []
-    # Loop over each CSV file found in the source folder
-    for csv_file in csv_files:
-        # Build the full source path and destination path for the file
-        src_file = os.path.join(src_folder, csv_file)
-        dest_file = os.path.join(dest_folder, csv_file)
-        # Copy the CSV file to the destination folder
-        shutil.copy2(src_file, dest_file)
-        # Record the new file's path in the copied_files list
-        copied_files.append(dest_file)
-    
-    # Print information about the copy destination
-    print('Copied:', len(copied_files), '.csv files to folder:', dest_folder)
+
+    # Returns one value:
+    # 1) dest_folder: the path to the output folder
+    return dest_folder
+
+def find_csv_files(src_folder):
+    # Find all CSV files in the source folder. They are read where they are,
+    # nothing is copied to the output folder
+    csv_files = sorted(os.path.join(src_folder, f) for f in os.listdir(src_folder)
+                       if f.endswith('.csv') and os.path.isfile(os.path.join(src_folder, f)))
+
+    # Returns one value:
+    # 1) csv_files: a list of paths to the CSV files
+    return csv_files
+
+def copy_csv_files_to_folder(src_folder):
+    # Kept for older callers (e.g. the A4 notebook): the CSV files are no longer
+    # copied, this finds them in the source folder and creates the output folder
 
     # Returns two values:
-    # 1) copied_files: a list of paths to the copied CSV files
-    # 2) dest_folder: the path to the folder where files were copied
-    return copied_files, dest_folder
+    # 1) csv_files: a list of paths to the CSV files
+    # 2) dest_folder: the path to the output folder
+    return find_csv_files(src_folder), get_output_folder(src_folder)
 
 def aggregate_price_values(csv_files):
     # Initialize an empty list to store all price values extracted from CSV files
@@ -214,30 +561,11 @@ def aggregate_price_values(csv_files):
     # 1) The summed price pr. sqrm from csv-file 
     return total_price
 
-def area_output_to_json(model, file_path, output_filename):
+def area_output_to_json(model, file_path, output_filename, quantities=None):
     # Define all informations from other functions
-    spaces_area = get_area_by_space_types(model)
-    total_area_number_of_spaces = total_area_and_number(model)
-    walls_area_int = interior_walls_area(model)
-    walls_area_ext = exterior_walls_area(model)
-    curtainwalls_area = curtain_walls_area(model)
-    columns_total_area = columns_area(model)
-    gross_floor_area = round(total_area_number_of_spaces[0] + walls_area_int + walls_area_ext + curtainwalls_area + columns_total_area, 2) 
-
-    # File handling: Copy and read CSV files
-    csv_files, folder_path = copy_csv_files_to_folder(file_path)
+    output_data = summarize_areas(model, quantities)
 
-    # Create a dictionary with the information
-    output_data = {
-        "Area of spaces": spaces_area,
-        "Total area of spaces": total_area_number_of_spaces[0],
-        "Total number of spaces": total_area_number_of_spaces[1],
-        "Area of interior walls": walls_area_int,
-        "Area of exterior walls": walls_area_ext,
-        "Area of curtain walls": curtainwalls_area,
-        "Area of columns": columns_total_area,
-        "Total summed area": gross_floor_area
-    }
+    folder_path = get_output_folder(file_path)
 
     output_path = os.path.join(folder_path, output_filename)
     with open(output_path, "w", encoding='utf-8') as json_file:
@@ -247,22 +575,28 @@ def area_output_to_json(model, file_path, output_filename):
     # Creates one file:
     # 1) .json file with area data
 
-def price_output_to_json(model, file_path, output_filename):
+def summarize_price(model, file_path, quantities=None, price_per_sqm=None):
+    # 'price_per_sqm' is the summed price pr. sqrm when it is already known (e.g. from a
+    # compiled price catalog); otherwise it is read from the CSV files in file_path
     # Define all informations from other functions
-    spaces_area = get_area_by_space_types(model)
-    total_area_number_of_spaces = total_area_and_number(model)
-    walls_area_int = interior_walls_area(model)
-    walls_area_ext = exterior_walls_area(model)
-    curtainwalls_area = curtain_walls_area(model)
-    columns_total_area = columns_area(model)
-    gross_floor_area = round(total_area_number_of_spaces[0] + walls_area_int + walls_area_ext + curtainwalls_area + columns_total_area, 2) 
-
-    # File handling: Copy and read CSV files
-    csv_files, folder_path = copy_csv_files_to_folder(file_path)
-    price_values = aggregate_price_values(csv_files)
+    area_data = summarize_areas(model, quantities)
+
+    # File handling: read the CSV files (only when the price is not given)
+    folder_path = get_output_folder(file_path)
+    price_values = price_per_sqm if price_per_sqm is not None else aggregate_price_values(find_csv_files(file_path))
+
+    # Returns two values:
+    # 1) A dictionary with the price data written by price_output_to_json
+    # 2) The Output folder the JSON files are written to
+    return price_from_areas(area_data, price_values), folder_path
+
+def price_from_areas(area_data, price_per_sqm):
+    # The price data of summarize_price for already summarized areas, without any file handling
+    spaces_area = area_data["Area of spaces"]
+    gross_floor_area = area_data["Total summed area"]
 
     # Total price
-    total_price = gross_floor_area * price_values
+    total_price = gross_floor_area * price_per_sqm
 
     # Find how much of the GFA each type of space consumes
     percentages_by_space = {spacetype: round(area / gross_floor_area, 4) for spacetype, area in spaces_area.items()}
@@ -270,14 +604,19 @@ def price_output_to_json(model, file_path, output_filename):
     # Calculate price based on percentages
     price_pr_spacetype = {spacetype: round(total_price * percentage,4) for spacetype, percentage in percentages_by_space.items()}
 
-    # Create a dictionary with the information
-    output_data = {
+    # Returns one value:
+    # 1) A dictionary with the price data written by price_output_to_json
+    return {
         "Area of spaces": spaces_area,
         "Weight by spacetype": percentages_by_space,
         "Price calculated based on Weighted area": price_pr_spacetype,
-        "Price pr. sqrm": price_values,
+        "Price pr. sqrm": price_per_sqm,
         "Estimated price": total_price
     }
+
+def price_output_to_json(model, file_path, output_filename, quantities=None, price_per_sqm=None):
+    # Create a dictionary with the information
+    output_data, folder_path = summarize_price(model, file_path, quantities, price_per_sqm)
         
     output_path = os.path.join(folder_path, output_filename)
     with open(output_path, "w", encoding='utf-8') as json_file:
@@ -1,15 +1,41 @@
 import argparse
+import copy
 import json
+import os
 import re
 from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
 
 
 # =======================================================
 # CONFIG LOADING FUNCTIONS (WITH ERROR HANDLING)
 # =======================================================
 
+# resolved path -> ((mtime_ns, size), parsed JSON)
+_JSON_CACHE: Dict[str, Tuple[Tuple[int, int], object]] = {}
+
+
+def _read_json(file_path: str | Path):
+    """
+    Read a JSON config file, re-parsing it only when its mtime or size changed.
+
+    A copy is returned, so callers may modify the result freely.
+    """
+    key = str(Path(file_path).resolve())
+    stat = os.stat(key)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _JSON_CACHE.get(key)
+    if cached is None or cached[0] != signature:
+        with open(key, "r", encoding="utf-8") as f:
+            cached = (signature, json.load(f))
+        _JSON_CACHE[key] = cached
+    return copy.deepcopy(cached[1])
+
+
 def load_room_types(config_dir: str | Path) -> List[str]:
     """Load list of room types from room_types.json."""
     config_dir = Path(config_dir)
@@ -23,8 +49,7 @@ def load_room_types(config_dir: str | Path) -> List[str]:
         else:
             raise FileNotFoundError(f"room_types.json not found in {config_dir} or data/")
     
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _read_json(file_path)
 
 
 def load_space_keywords(config_dir: str | Path) -> Dict[str, List[str]]:
@@ -40,8 +65,7 @@ def load_space_keywords(config_dir: str | Path) -> Dict[str, List[str]]:
         else:
             raise FileNotFoundError(f"space_keywords.json not found in {config_dir} or data/")
     
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _read_json(file_path)
 
 
 def load_cost_rates(config_dir: str | Path) -> Dict[str, float]:
@@ -57,8 +81,7 @@ def load_cost_rates(config_dir: str | Path) -> Dict[str, float]:
         else:
             raise FileNotFoundError(f"cost_rates.json not found in {config_dir} or data/")
     
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _read_json(file_path)
 
 
 def load_weights_matrix(config_dir: str | Path, filename: str) -> Dict[str, Dict[str, float]]:
@@ -98,8 +121,7 @@ def load_weights_matrix(config_dir: str | Path, filename: str) -> Dict[str, Dict
             else:
                 raise FileNotFoundError(f"weights_default.json not found in {config_dir} or data/")
     
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _read_json(file_path)
 
 
 # =======================================================
@@ -153,10 +175,13 @@ def get_effective_weights_file(config_dir: Path, requested_weights_file: str = N
 # CLASSIFICATION FUNCTIONS 
 # =======================================================
 
+_NORMALIZE_RE = re.compile(r"[^a-zæøå0-9]+")
+
+
 def _normalize(text: str) -> str: # Eliminating string case and punctuation
     """Lowercase a string and remove most punctuation."""
     t = text.lower()
-    t = re.sub(r"[^a-zæøå0-9]+", " ", t)
+    t = _NORMALIZE_RE.sub(" ", t)
     return t.strip()
 
 
@@ -192,22 +217,115 @@ def classify_space_name(
     return hits[0]
 
 
+class SpaceClassifier:
+    """
+    Keyword classifier compiled once from room_types and space_keywords.
+
+    Gives the same result as classify_space_name, but all keywords are
+    matched with one compiled pattern and results are memoized per
+    normalized name.
+
+    The pattern is a lookahead alternation tried at every position of the
+    normalized name. Keywords are ordered by the priority of their room
+    type, so at each position the best room type starting there wins, and
+    the lowest priority found over all positions is the first room type
+    (in room_types order) with a keyword hit.
+    """
+
+    def __init__(
+        self,
+        room_types: List[str],
+        space_keywords: Dict[str, List[str]],
+    ) -> None:
+        self.room_types = list(room_types)
+        self._fallback = "OFFICE" if "OFFICE" in self.room_types else "UNCLASSIFIED"
+
+        # keyword -> priority of the first room type that lists it
+        self._priority: Dict[str, int] = {}
+        for priority, rt in enumerate(self.room_types):
+            for kw in space_keywords.get(rt, []):
+                self._priority.setdefault(kw, priority)
+
+        self._pattern = None
+        if self._priority:
+            ordered = sorted(self._priority, key=lambda kw: self._priority[kw])
+            alternation = "|".join(re.escape(kw) for kw in ordered)
+            self._pattern = re.compile(f"(?=({alternation}))")
+
+        self._memo: Dict[str, str] = {}
+
+    @classmethod
+    def from_config_dir(cls, config_dir: str | Path) -> "SpaceClassifier":
+        """Build a classifier from room_types.json and space_keywords.json."""
+        return cls(load_room_types(config_dir), load_space_keywords(config_dir))
+
+    def _classify_normalized(self, norm: str) -> str:
+        best = None
+        if self._pattern is not None:
+            for match in self._pattern.finditer(norm):
+                priority = self._priority[match.group(1)]
+                if best is None or priority < best:
+                    best = priority
+                    if best == 0:
+                        break
+
+        if best is None:
+            if "room" in norm or "rum" in norm:
+                # simple fallback
+                return self._fallback
+            return "UNCLASSIFIED"
+
+        return self.room_types[best]
+
+    def classify(self, name: str) -> str:
+        """Classify a single space name. Returns room type or "UNCLASSIFIED"."""
+        if not name:
+            return "UNCLASSIFIED"
+
+        norm = _normalize(name)
+        rt = self._memo.get(norm)
+        if rt is None:
+            rt = self._classify_normalized(norm)
+            self._memo[norm] = rt
+        return rt
+
+    def classify_many(self, names: Iterable[str]) -> List[str]:
+        """Classify a batch of space names, returning room types in the same order."""
+        cache: Dict[str, str] = {}
+        result: List[str] = []
+        for name in names:
+            rt = cache.get(name)
+            if rt is None:
+                rt = self.classify(name)
+                if name:
+                    cache[name] = rt
+            result.append(rt)
+        return result
+
+
 def classify_all_spaces(
     areas_spaces: Dict[str, float],
     room_types: List[str],
     space_keywords: Dict[str, List[str]],
+    classifier: SpaceClassifier | None = None,
 ) -> Tuple[Dict[str, float], Dict[str, float]]:
     """
     Classify all spaces and aggregate area per room type.
 
+    classifier:
+      optional prebuilt SpaceClassifier, reused across calls.
+
     Returns:
       (area_by_roomtype, unclassified_spaces)
     """
     area_by_roomtype: Dict[str, float] = defaultdict(float)
     unclassified: Dict[str, float] = {}
 
-    for raw_name, area in areas_spaces.items():
-        rt = classify_space_name(raw_name, room_types, space_keywords)
+    if classifier is None:
+        classifier = SpaceClassifier(room_types, space_keywords)
+    room_types_by_space = classifier.classify_many(areas_spaces.keys())
+
+    for (raw_name, area), rt in zip(areas_spaces.items(), room_types_by_space):
         if rt == "UNCLASSIFIED":
             unclassified[raw_name] = float(area)
         else:
@@ -220,6 +338,84 @@ def classify_all_spaces(
 # COST ALLOCATION FUNCTIONS 
 # =======================================================
 
+def _sequential_sum(values: np.ndarray, axis: int) -> np.ndarray:
+    """Sum along an axis strictly left to right (same rounding as a Python loop)."""
+    if values.shape[axis] == 0:
+        return values.sum(axis=axis)
+    return np.add.accumulate(values, axis=axis).take(-1, axis=axis)
+
+
+def build_allocation_arrays(
+    area_by_roomtype: Dict[str, float],
+    room_types: List[str],
+    cost_rates: Dict[str, float],
+    weights: Dict[str, Dict[str, float]],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]:
+    """
+    Convert the dict based config into arrays.
+
+    Returns:
+      (areas[R], weight_matrix[R, G], rates[G], cost_groups)
+      with R = len(room_types) and G = len(cost_rates). Missing weights are 1.0.
+    """
+    cost_groups = list(cost_rates.keys())
+    areas = np.array([float(area_by_roomtype.get(rt, 0.0)) for rt in room_types], dtype=float)
+    weight_matrix = np.array(
+        [[float(weights.get(rt, {}).get(cg, 1.0)) for cg in cost_groups] for rt in room_types],
+        dtype=float,
+    ).reshape(len(room_types), len(cost_groups))
+    rates = np.array([float(cost_rates[cg]) for cg in cost_groups], dtype=float)
+    return areas, weight_matrix, rates, cost_groups
+
+
+def allocate_costs_matrix(
+    areas: np.ndarray,
+    total_area: float,
+    rates: np.ndarray,
+    weight_matrix: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """
+    Matrix-based cost allocation: area vector x weight matrix x rate vector.
+
+    Any leading dimensions are treated as scenarios and broadcast, e.g.
+      areas[R] or [N, R], rates[G] or [N, G], weight_matrix[R, G] or [N, R, G].
+
+    Returns dict of arrays:
+      - group_total    [..., G]
+      - share          [..., R, G]
+      - allocated_cost [..., R, G]
+      - room_cost      [..., R]
+      - total_cost     [...]
+      - unit_price     [..., R]
+    """
+    areas = np.asarray(areas, dtype=float)
+    rates = np.asarray(rates, dtype=float)
+    weight_matrix = np.asarray(weight_matrix, dtype=float)
+
+    group_total = rates * float(total_area)
+    demand = areas[..., :, None] * weight_matrix
+    sum_demand = _sequential_sum(demand, axis=-2)
+    sum_demand = np.where(sum_demand == 0, 1.0, sum_demand)
+
+    share = demand / sum_demand[..., None, :]
+    allocated = group_total[..., None, :] * share
+    room_cost = _sequential_sum(allocated, axis=-1)
+    total_cost = _sequential_sum(group_total, axis=-1)
+
+    areas_b = np.broadcast_to(areas, room_cost.shape)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unit_price = np.where(areas_b > 0, room_cost / np.where(areas_b > 0, areas_b, 1.0), 0.0)
+
+    return {
+        "group_total": group_total,
+        "share": share,
+        "allocated_cost": allocated,
+        "room_cost": room_cost,
+        "total_cost": total_cost,
+        "unit_price": unit_price,
+    }
+
+
 def allocate_costs(
     area_by_roomtype: Dict[str, float],
     total_area: float,
@@ -233,56 +429,43 @@ def allocate_costs(
     total_area:
       basis for cost_rates (usually sum of all space areas).
 
+    The calculation is done by allocate_costs_matrix; this function
+    returns a dict view of the result.
+
     Returns dict with:
       - total_cost
       - total_unit_price
       - per_room_type
       - per_cost_group
     """
-    total_cost = 0.0
-    room_costs = {rt: 0.0 for rt in room_types}
-    per_group: Dict[str, Dict] = {}
-
-    for cost_group, rate in cost_rates.items():
-        group_total = float(rate) * float(total_area)
-        total_cost += group_total
-
-        # weighted demand per room
-        demand: Dict[str, float] = {}
-        for rt in room_types:
-            area = float(area_by_roomtype.get(rt, 0.0))
-            w = float(weights.get(rt, {}).get(cost_group, 1.0))
-            demand[rt] = area * w
-
-        sum_demand = sum(demand.values()) or 1.0
-
-        allocation_rt: Dict[str, Dict] = {}
-        for rt in room_types:
-            share = demand[rt] / sum_demand
-            allocated = group_total * share
-            room_costs[rt] += allocated
-            allocation_rt[rt] = {
-                "share": share,
-                "allocated_cost": allocated,
-            }
+    areas, weight_matrix, rates, cost_groups = build_allocation_arrays(
+        area_by_roomtype, room_types, cost_rates, weights
+    )
+    result = allocate_costs_matrix(areas, total_area, rates, weight_matrix)
 
+    total_cost = float(result["total_cost"])
+    per_group: Dict[str, Dict] = {}
+    for g, cost_group in enumerate(cost_groups):
         per_group[cost_group] = {
-            "rate_per_m2": rate,
-            "total_cost": group_total,
-            "allocation": allocation_rt,
+            "rate_per_m2": cost_rates[cost_group],
+            "total_cost": float(result["group_total"][g]),
+            "allocation": {
+                rt: {
+                    "share": float(result["share"][r, g]),
+                    "allocated_cost": float(result["allocated_cost"][r, g]),
+                }
+                for r, rt in enumerate(room_types)
+            },
         }
 
     total_unit_price = total_cost / total_area if total_area > 0 else 0.0
 
     per_room_type: Dict[str, Dict] = {}
-    for rt in room_types:
-        area = float(area_by_roomtype.get(rt, 0.0))
-        rcost = room_costs[rt]
-        unit = rcost / area if area > 0 else 0.0
+    for r, rt in enumerate(room_types):
         per_room_type[rt] = {
-            "area": area,
-            "allocated_cost": rcost,
-            "unit_price": unit,
+            "area": float(areas[r]),
+            "allocated_cost": float(result["room_cost"][r]),
+            "unit_price": float(result["unit_price"][r]),
         }
     print("Cost Allocation Completed")
     return {
@@ -293,26 +476,117 @@ def allocate_costs(
     }
 
 
+# =======================================================
+# SCENARIO (SENSITIVITY) EVALUATION
+# =======================================================
+
+def perturb_scenarios(
+    cost_rates: Dict[str, float],
+    weights: Dict[str, Dict[str, float]],
+    room_types: List[str],
+    n: int,
+    rate_sd: float = 0.1,
+    weight_sd: float = 0.0,
+    seed: int | None = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Draw n Monte Carlo variants of cost rates and weights.
+
+    Each value is multiplied by a lognormal factor with the given relative
+    standard deviation (0 keeps the value fixed).
+
+    Returns:
+      (rates[n, G], weight_matrix[n, R, G]) in the order of cost_rates/room_types.
+    """
+    _, weight_matrix, rates, _ = build_allocation_arrays({}, room_types, cost_rates, weights)
+    rng = np.random.default_rng(seed)
+    rate_factors = rng.lognormal(0.0, rate_sd, size=(n,) + rates.shape) if rate_sd else np.ones((n,) + rates.shape)
+    weight_factors = (
+        rng.lognormal(0.0, weight_sd, size=(n,) + weight_matrix.shape) if weight_sd else np.ones((n,) + weight_matrix.shape)
+    )
+    return rates * rate_factors, weight_matrix * weight_factors
+
+
+def evaluate_scenarios(
+    area_by_roomtype: Dict[str, float],
+    total_area: float,
+    room_types: List[str],
+    cost_groups: List[str],
+    rates: np.ndarray,
+    weight_matrix: np.ndarray,
+    percentiles: Tuple[float, ...] = (5, 50, 95),
+) -> Dict:
+    """
+    Evaluate N weights/rates scenarios at once and summarize them.
+
+    rates:
+      [N, G] (or [G] for fixed rates), columns in cost_groups order.
+    weight_matrix:
+      [N, R, G] (or [R, G] for fixed weights), rows in room_types order.
+
+    Returns dict with:
+      - n_scenarios
+      - total_cost: {"mean", "p5", "p50", ...}
+      - per_room_type: room type -> {"allocated_cost": {...}, "unit_price": {...}}
+    """
+    areas = np.array([float(area_by_roomtype.get(rt, 0.0)) for rt in room_types], dtype=float)
+    rates = np.asarray(rates, dtype=float)
+    weight_matrix = np.asarray(weight_matrix, dtype=float)
+    if rates.shape[-1] != len(cost_groups) or weight_matrix.shape[-2:] != (len(room_types), len(cost_groups)):
+        raise ValueError("rates/weight_matrix do not match room_types and cost_groups")
+    # Fixed rates or weights are repeated for every scenario (one scenario if both are fixed)
+    scenarios = np.broadcast_shapes(rates.shape[:-1], weight_matrix.shape[:-2]) or (1,)
+    rates = np.broadcast_to(rates, scenarios + rates.shape[-1:])
+    weight_matrix = np.broadcast_to(weight_matrix, scenarios + weight_matrix.shape[-2:])
+
+    result = allocate_costs_matrix(areas, total_area, rates, weight_matrix)
+    n_scenarios = int(result["total_cost"].shape[0])
+
+    def _stats(values: np.ndarray) -> Dict[str, np.ndarray]:
+        stats = {"mean": values.mean(axis=0)}
+        for p, value in zip(percentiles, np.percentile(values, percentiles, axis=0)):
+            stats[f"p{p:g}"] = value
+        return stats
+
+    room_cost_stats = _stats(result["room_cost"])
+    unit_price_stats = _stats(result["unit_price"])
+
+    per_room_type: Dict[str, Dict] = {}
+    for r, rt in enumerate(room_types):
+        per_room_type[rt] = {
+            "allocated_cost": {k: float(v[r]) for k, v in room_cost_stats.items()},
+            "unit_price": {k: float(v[r]) for k, v in unit_price_stats.items()},
+        }
+
+    return {
+        "n_scenarios": n_scenarios,
+        "total_cost": {k: float(v) for k, v in _stats(result["total_cost"]).items()},
+        "per_room_type": per_room_type,
+    }
+
+
 # =======================================================
 # HIGH-LEVEL PIPELINE 
 # =======================================================
 
-def process_json(
-    input_path: str | Path,
-    output_path: str | Path,
+def load_config(
     config_dir: str | Path = "Output",
     weights_override_path: str | None = None,
-) -> None:
+    price_catalog=None,
+) -> Dict:
     """
-    Full pipeline:
-      1) Load config (room types, keywords, cost rates, weights)
-      2) Read input JSON and get "Area of spaces"
-      3) Classify spaces and aggregate area per room type
-      4) Compute total area and allocate costs
-      5) Write summary JSON to output_path
+    Resolve the effective config directory and weights file and load all config.
+
+    price_catalog:
+      optional price catalog (A3 rules/price_catalog.PriceCatalog, or any
+      object with cost_rates(cost_groups)). When given, the cost rates are
+      derived from it for the cost groups of the weights matrix instead of
+      being read from cost_rates.json.
+
+    Returns dict with:
+      - room_types, space_keywords, cost_rates, weights
+      - weights_source, config_directory_used
     """
-    input_path = Path(input_path)
-    output_path = Path(output_path)
     config_dir = Path(config_dir)
 
     # CONFIG SELECTION
@@ -322,51 +596,108 @@ def process_json(
     print(f"Using config directory: {effective_config_dir}")
     print(f"Using weights file: {effective_weights_file}")
 
-    # 1) Load config
-    room_types = load_room_types(config_dir)
-    space_keywords = load_space_keywords(config_dir)
-    cost_rates = load_cost_rates(effective_config_dir)
     weights = load_weights_matrix(effective_config_dir, effective_weights_file)
+    if price_catalog is None:
+        cost_rates = load_cost_rates(effective_config_dir)
+    else:
+        # Cost group names (with their Nr. prefix) as used by the weights
+        cost_groups = list(dict.fromkeys(cg for row in weights.values() for cg in row))
+        cost_rates = price_catalog.cost_rates(cost_groups)
 
-    # 2) Read input JSON
-    with open(input_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    return {
+        "room_types": load_room_types(config_dir),
+        "space_keywords": load_space_keywords(config_dir),
+        "cost_rates": cost_rates,
+        "weights": weights,
+        "weights_source": effective_weights_file,
+        "config_directory_used": str(effective_config_dir),
+    }
+
+
+def build_summary(
+    data: Dict,
+    config: Dict,
+    classification: Tuple[Dict[str, float], Dict[str, float]] | None = None,
+) -> Dict:
+    """
+    Classify the spaces of an area JSON dict and allocate costs.
+
+    classification:
+      optional precomputed result of classify_all_spaces, so only the
+      allocation is rerun when only cost rates or weights changed.
 
+    Returns the summary dict written by process_json.
+    """
     areas_spaces: Dict[str, float] = data.get("Area of spaces", {})
 
-    # 3) Classify spaces
-    area_by_roomtype, unclassified = classify_all_spaces(
-        areas_spaces,
-        room_types,
-        space_keywords,
-    )
+    # Classify spaces
+    if classification is None:
+        classification = classify_all_spaces(
+            areas_spaces,
+            config["room_types"],
+            config["space_keywords"],
+        )
+    area_by_roomtype, unclassified = classification
 
-    # 4) Compute total area, allocate costs
+    # Compute total area, allocate costs
     total_area = data["Total summed area"]
     allocation = allocate_costs(
         area_by_roomtype=area_by_roomtype,
         total_area=total_area,
-        room_types=room_types,
-        cost_rates=cost_rates,
-        weights=weights,
+        room_types=config["room_types"],
+        cost_rates=config["cost_rates"],
+        weights=config["weights"],
     )
 
-    summary = {
+    return {
         "Total summed area": total_area,
         "calculated_total_cost": allocation["total_cost"],
         "calculated_unit_price": allocation["total_unit_price"],
         "per_room_type": allocation["per_room_type"],
         "per_cost_group": allocation["per_cost_group"],
         "unclassified_spaces": unclassified,
-        "weights_source": effective_weights_file,
-        "config_directory_used": str(effective_config_dir),
+        "weights_source": config["weights_source"],
+        "config_directory_used": config["config_directory_used"],
     }
 
-    # 5) Write output
-    with open(output_path, "w", encoding="utf-8") as f:
+
+def write_summary(summary: Dict, output_path: str | Path) -> None:
+    """Write a summary dict as JSON to output_path."""
+    with open(Path(output_path), "w", encoding="utf-8") as f:
         json.dump(summary, f, indent=4, ensure_ascii=False)
 
 
+def process_json(
+    input_path: str | Path,
+    output_path: str | Path,
+    config_dir: str | Path = "Output",
+    weights_override_path: str | None = None,
+) -> None:
+    """
+    Full pipeline:
+      1) Load config (room types, keywords, cost rates, weights)
+      2) Read input JSON and get "Area of spaces"
+      3) Classify spaces and aggregate area per room type
+      4) Compute total area and allocate costs
+      5) Write summary JSON to output_path
+    """
+    input_path = Path(input_path)
+    output_path = Path(output_path)
+
+    # 1) Load config
+    config = load_config(config_dir, weights_override_path)
+
+    # 2) Read input JSON
+    with open(input_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    # 3) + 4) Classify spaces, compute total area and allocate costs
+    summary = build_summary(data, config)
+
+    # 5) Write output
+    write_summary(summary, output_path)
+
+
 # =======================================================
 # CLI ENTRY POINT
 # =======================================================
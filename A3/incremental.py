@@ -0,0 +1,526 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import ifcopenshell
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from external.BIManalyst_g_48.A3 import A3_Tool        # submodule for area extraction
+from pipeline import CostPipeline, DEFAULT_CONFIG_DIR, write_outputs
+from rules import history
+from rules.cache import hash_file
+from rules.profiling import Profiler
+
+
+SNAPSHOT_VERSION = 2
+DELTA_FILE = "cost_delta"
+
+# One entity of the DATA section, written on one line
+_STEP_ENTITY = re.compile(rb"^#(\d+)\s*=\s*(.*);[ \t\r]*$", re.MULTILINE)
+_STEP_REFERENCE = re.compile(rb"#(\d+)")
+
+
+# =======================================================
+# FINGERPRINTS
+# =======================================================
+
+def read_step_lines(ifc_path: str | Path) -> Dict[int, bytes]:
+    """
+    STEP id -> the entity's own attributes as written in the file (references
+    stay "#id"). Entities written over several lines are left out.
+    """
+    with open(ifc_path, "rb") as f:
+        return {int(step_id): line for step_id, line in _STEP_ENTITY.findall(f.read())}
+
+
+def _definition_fingerprint(step_id: int, step_lines: Dict[int, bytes], memo: Dict[int, str | None]) -> str | None:
+    """
+    Hash of a property/quantity set's own attributes and of the properties
+    or quantities it references directly (memoized, definitions are often
+    shared). None if one of these entities is not in step_lines.
+    """
+    if step_id in memo:
+        return memo[step_id]
+    line = step_lines.get(step_id)
+    fingerprint = None
+    if line is not None:
+        digest = hashlib.sha1(line)
+        for reference in _STEP_REFERENCE.findall(line):
+            referenced = step_lines.get(int(reference))
+            if referenced is None:
+                break
+            digest.update(b"|" + referenced)
+        else:
+            fingerprint = digest.hexdigest()
+    memo[step_id] = fingerprint
+    return fingerprint
+
+
+def element_fingerprint(
+    element, pset_index: A3_Tool.PsetIndex, step_lines: Dict[int, bytes], memo: Dict[int, str | None] | None = None
+) -> str | None:
+    """
+    Hash of everything the A3_Tool row functions read from an element: its
+    own attributes and the STEP ids and content of its own and inherited
+    property/quantity sets. Nothing is resolved recursively, so this is much
+    cheaper than the row itself. STEP ids are part of the hash, so after a
+    re-export that renumbers the file every element counts as modified.
+
+    step_lines has to come from the file the model was opened from
+    (read_step_lines). None (always re-extracted) if an entity is missing there.
+    """
+    if memo is None:
+        memo = {}
+    line = step_lines.get(element.id())
+    if line is None:
+        return None
+    digest = hashlib.sha1(line)
+    for definition in pset_index.definitions(element):
+        step_id = definition.id()
+        fingerprint = _definition_fingerprint(step_id, step_lines, memo)
+        if fingerprint is None:
+            return None
+        digest.update(b"|%d:%s" % (step_id, fingerprint.encode("ascii")))
+    return digest.hexdigest()
+
+
+# =======================================================
+# INCREMENTAL QUANTITY TABLE
+# =======================================================
+
+def diff_quantities(
+    model,
+    step_lines: Dict[int, bytes],
+    previous: Dict | None = None,
+    pset_index: A3_Tool.PsetIndex | None = None,
+    geometry_fallback: bool = False,
+) -> Tuple[Dict, Dict, Dict, Dict]:
+    """
+    Build the A3_Tool quantity table of model, reusing the rows of the
+    previous snapshot for every element whose fingerprint did not change.
+
+    Only added and modified elements go through the A3_Tool row functions.
+    Rows are kept in model order, so the table is the same as a full
+    extract_quantities run. With geometry_fallback, unchanged rows that take their area from the
+    geometry are passed on as copies as well, since the fingerprint does not
+    cover the geometry (their footprints come from the geometry cache).
+
+    Returns:
+      (quantities, elements, changes, changed_rows)
+      - elements: category -> GlobalId -> {"fingerprint", "row"} (next snapshot)
+      - changes: category -> {"added", "modified", "removed": [GlobalId], "unchanged": n}
+      - changed_rows: category -> {"old": [row], "new": [row]}, the rows that
+        left and entered the table (see update_aggregates)
+    """
+    if pset_index is None:
+        pset_index = A3_Tool.build_pset_index(model)
+    previous = previous or {}
+    memo: Dict[int, str | None] = {}
+    quantities: Dict[str, List[Dict]] = {}
+    elements: Dict[str, Dict[str, Dict]] = {}
+    changes: Dict[str, Dict] = {}
+    changed_rows: Dict[str, Dict[str, List[Dict]]] = {}
+
+    for key, (ifc_class, row_function) in A3_Tool.QUANTITY_CATEGORIES.items():
+        old_entries = previous.get(key, {})
+        entries: Dict[str, Dict] = {}
+        rows: List[Dict] = []
+        change = {"added": [], "modified": [], "removed": [], "unchanged": 0}
+        old_rows: List[Dict] = []
+        new_rows: List[Dict] = []
+
+        for element in model.by_type(ifc_class):
+            gid = element.GlobalId
+            fingerprint = element_fingerprint(element, pset_index, step_lines, memo)
+            old = old_entries.get(gid)
+            if old is not None and fingerprint is not None and old["fingerprint"] == fingerprint:
+                row = old["row"]
+                change["unchanged"] += 1
+                if geometry_fallback and row is not None and A3_Tool.row_without_quantities(key, row):
+                    row = dict(row)
+                    old_rows.append(old["row"])
+                    new_rows.append(row)
+            else:
+                row = row_function(element, pset_index)
+                change["added" if old is None else "modified"].append(gid)
+                if old is not None and old["row"] is not None:
+                    old_rows.append(old["row"])
+                if row is not None:
+                    new_rows.append(row)
+            entries[gid] = {"fingerprint": fingerprint, "row": row}
+            if row is not None:
+                rows.append(row)
+
+        for gid, old in old_entries.items():
+            if gid not in entries:
+                change["removed"].append(gid)
+                if old["row"] is not None:
+                    old_rows.append(old["row"])
+        quantities[key] = rows
+        elements[key] = entries
+        changes[key] = change
+        changed_rows[key] = {"old": old_rows, "new": new_rows}
+
+    return quantities, elements, changes, changed_rows
+
+
+# =======================================================
+# INCREMENTAL AREA AGGREGATES
+# =======================================================
+
+def empty_aggregates() -> Dict:
+    """Aggregates of an empty quantity table."""
+    return {
+        "spaces": {},
+        "spaces_total": [0.0, 0],
+        "interior_walls": 0.0,
+        "exterior_walls": 0.0,
+        "curtain_walls": 0.0,
+        "columns": 0.0,
+    }
+
+
+def update_aggregates(aggregates: Dict, quantities: Dict, changed_rows: Dict) -> Dict:
+    """
+    Re-aggregate what the changed rows of diff_quantities (after filling them
+    from the geometry, if enabled) belong to: the space types they leave or
+    enter, the space totals, and the wall, curtain wall or column area of
+    their category. Everything else keeps its value from the snapshot.
+
+    Touched groups are summed again in model order rather than updated by
+    differences, so the rounded areas are exactly those of a full
+    A3_Tool.summarize_areas. Updated in place and returned.
+
+    Space types are kept as LongName -> [area, spaces, spaces with an area].
+    """
+    changed = {key: rows["old"] + rows["new"] for key, rows in changed_rows.items()}
+    if changed["spaces"]:
+        touched = {row["LongName"] for row in changed["spaces"]}
+        groups: Dict = {}
+        total, number = 0.0, 0
+        for row in quantities["spaces"]:
+            sqrm = row["NetFloorArea"]
+            if sqrm is not None:
+                total += sqrm
+                number += 1
+            name = row["LongName"]
+            if name not in touched:
+                if name not in groups:
+                    groups[name] = aggregates["spaces"][name]
+                continue
+            group = groups.get(name)
+            if group is None:
+                group = groups[name] = [0.0, 0, 0]
+            group[1] += 1
+            if sqrm is not None:
+                group[0] += sqrm
+                group[2] += 1
+        aggregates["spaces"] = groups
+        aggregates["spaces_total"] = [total, number]
+    if changed["walls"]:
+        aggregates["interior_walls"] = A3_Tool.interior_walls_area(None, quantities)
+        aggregates["exterior_walls"] = A3_Tool.exterior_walls_area(None, quantities)
+    if changed["curtain_walls"]:
+        aggregates["curtain_walls"] = A3_Tool.curtain_walls_area(None, quantities)
+    if changed["columns"]:
+        aggregates["columns"] = A3_Tool.columns_area(None, quantities)
+    return aggregates
+
+
+def summarize_aggregates(aggregates: Dict) -> Dict:
+    """Area data from the aggregates (same content as A3_Tool.summarize_areas)."""
+    total, number = aggregates["spaces_total"]
+    total_spaces = round(total, 1)
+    walls_int = aggregates["interior_walls"]
+    walls_ext = aggregates["exterior_walls"]
+    curtain_walls = aggregates["curtain_walls"]
+    columns = aggregates["columns"]
+    return {
+        "Area of spaces": {name: round(area, 2) for name, (area, _, _) in aggregates["spaces"].items()},
+        "Total area of spaces": total_spaces,
+        "Total number of spaces": number,
+        "Area of interior walls": walls_int,
+        "Area of exterior walls": walls_ext,
+        "Area of curtain walls": curtain_walls,
+        "Area of columns": columns,
+        "Total summed area": round(total_spaces + walls_int + walls_ext + curtain_walls + columns, 2),
+    }
+
+
+# =======================================================
+# SNAPSHOT AND DELTA REPORT
+# =======================================================
+
+def space_costs(quantities: Dict, summary: Dict, pipeline: CostPipeline) -> Dict[str, Dict]:
+    """
+    Cost share of every space: its area times the unit price of its room type.
+
+    Returns GlobalId -> {"LongName", "room_type", "area", "cost"}. Spaces
+    without NetFloorArea count with area 0, unclassified spaces with cost 0.
+    """
+    per_room_type = summary["per_room_type"]
+    spaces = quantities["spaces"]
+    room_types = pipeline.classifier.classify_many(row["LongName"] for row in spaces)
+    result = {}
+    for row, rt in zip(spaces, room_types):
+        area = row["NetFloorArea"] or 0.0
+        unit_price = per_room_type.get(rt, {}).get("unit_price", 0.0)
+        result[row["GlobalId"]] = {"LongName": row["LongName"], "room_type": rt, "area": area, "cost": area * unit_price}
+    return result
+
+
+def build_snapshot(
+    model_path: str | Path,
+    elements: Dict,
+    aggregates: Dict,
+    spaces: Dict[str, Dict],
+    summary: Dict,
+    geometry_fallback: bool,
+) -> Dict:
+    """Everything the next incremental run (and its delta report) needs from this one."""
+    return {
+        "version": SNAPSHOT_VERSION,
+        "model": str(model_path),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        # The rows only fit runs with the same setting
+        "geometry_fallback": geometry_fallback,
+        "elements": elements,
+        # Space types as a list, LongName can be None (not a JSON key)
+        "aggregates": {**aggregates, "spaces": [[name, *group] for name, group in aggregates["spaces"].items()]},
+        "spaces": spaces,
+        "total_cost": summary["calculated_total_cost"],
+        "total_area": summary["Total summed area"],
+        "per_room_type": {rt: {"area": v["area"], "allocated_cost": v["allocated_cost"]} for rt, v in summary["per_room_type"].items()},
+    }
+
+
+def load_snapshot(path: str | Path) -> Dict | None:
+    """Load a snapshot, or None if it does not exist or was written by another version."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    aggregates = snapshot["aggregates"]
+    aggregates["spaces"] = {name: group for name, *group in aggregates["spaces"]}
+    return snapshot
+
+
+def save_snapshot(path: str | Path, snapshot: Dict) -> None:
+    """Write the snapshot atomically, so an interrupted run keeps the previous one."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        # json.dumps encodes in C, json.dump to a file does not
+        f.write(json.dumps(snapshot, ensure_ascii=False))
+    os.replace(tmp_path, path)
+
+
+def build_delta_report(previous: Dict | None, current: Dict, changes: Dict) -> Dict:
+    """
+    Compare two snapshots.
+
+    Returns dict with:
+      - previous_model / model
+      - totals: previous and new total cost and area, and the differences
+      - per_room_type: previous/new area and allocated cost per room type
+      - moved_spaces: spaces whose room type changed, with the cost they moved
+      - added_spaces / removed_spaces / resized_spaces (same room type, new area)
+      - element_changes: added/modified/removed/unchanged counts per category
+    """
+    previous = previous or {"model": None, "spaces": {}, "total_cost": 0.0, "total_area": 0.0, "per_room_type": {}}
+    old_spaces, new_spaces = previous["spaces"], current["spaces"]
+
+    moved, added, removed, resized = [], [], [], []
+    for gid, new in new_spaces.items():
+        old = old_spaces.get(gid)
+        if old is None:
+            added.append({"GlobalId": gid, **new})
+        elif old["room_type"] != new["room_type"]:
+            moved.append({
+                "GlobalId": gid,
+                "LongName": new["LongName"],
+                "previous_LongName": old["LongName"],
+                "from_room_type": old["room_type"],
+                "to_room_type": new["room_type"],
+                "previous_area": old["area"],
+                "area": new["area"],
+                "previous_cost": old["cost"],
+                "cost": new["cost"],
+                "cost_change": new["cost"] - old["cost"],
+            })
+        elif old["area"] != new["area"]:
+            resized.append({
+                "GlobalId": gid,
+                "LongName": new["LongName"],
+                "room_type": new["room_type"],
+                "previous_area": old["area"],
+                "area": new["area"],
+                "cost_change": new["cost"] - old["cost"],
+            })
+    for gid, old in old_spaces.items():
+        if gid not in new_spaces:
+            removed.append({"GlobalId": gid, **old})
+
+    per_room_type = {}
+    for rt in list(previous["per_room_type"]) + [rt for rt in current["per_room_type"] if rt not in previous["per_room_type"]]:
+        old = previous["per_room_type"].get(rt, {"area": 0.0, "allocated_cost": 0.0})
+        new = current["per_room_type"].get(rt, {"area": 0.0, "allocated_cost": 0.0})
+        per_room_type[rt] = {
+            "previous_area": old["area"],
+            "area": new["area"],
+            "area_change": new["area"] - old["area"],
+            "previous_cost": old["allocated_cost"],
+            "cost": new["allocated_cost"],
+            "cost_change": new["allocated_cost"] - old["allocated_cost"],
+        }
+
+    return {
+        "previous_model": previous["model"],
+        "model": current["model"],
+        "totals": {
+            "previous_total_cost": previous["total_cost"],
+            "total_cost": current["total_cost"],
+            "cost_change": current["total_cost"] - previous["total_cost"],
+            "previous_total_area": previous["total_area"],
+            "total_area": current["total_area"],
+            "area_change": current["total_area"] - previous["total_area"],
+        },
+        "per_room_type": per_room_type,
+        "moved_spaces": moved,
+        "added_spaces": added,
+        "removed_spaces": removed,
+        "resized_spaces": resized,
+        "element_changes": {
+            key: {"added": len(c["added"]), "modified": len(c["modified"]), "removed": len(c["removed"]), "unchanged": c["unchanged"]}
+            for key, c in changes.items()
+        },
+    }
+
+
+# =======================================================
+# INCREMENTAL RUN
+# =======================================================
+
+def run_incremental(
+    ifc_path: str | Path,
+    snapshot_path: str | Path,
+    output_dir: str | Path = "Output",
+    config_dir: str | Path = DEFAULT_CONFIG_DIR,
+    weights_override_path: str | None = None,
+    quiet: bool = True,
+    profile: bool = False,
+    history_db: str | Path | None = history.DEFAULT_DB,
+) -> Dict:
+    """
+    Re-analyse a new revision of a model against the snapshot of the previous run.
+
+    Only the rows of changed elements are extracted, and only the area
+    aggregates they belong to are summed again; classification and
+    allocation run on the aggregated areas.
+    Writes the normal A3_Tool and cost files plus the cost_delta report to
+    output_dir and replaces the snapshot. Without a snapshot (first run)
+    every element counts as added. The new revision is also recorded in
+    the run history at history_db (None: not recorded).
+
+    Returns the delta report.
+    """
+    profiler = Profiler(enabled=profile)
+    pipeline = CostPipeline(config_dir, weights_override_path, profiler)
+    previous = load_snapshot(snapshot_path)
+    # Rows and aggregates are only reused from a run with the same geometry setting
+    reusable = previous is not None and previous["geometry_fallback"] == pipeline.geometry_fallback
+
+    stdout = io.StringIO() if quiet else sys.stdout
+    with contextlib.redirect_stdout(stdout), profiler:
+        with profiler.stage("ifc_open"):
+            model = ifcopenshell.open(str(ifc_path))
+            step_lines = read_step_lines(ifc_path)
+        with profiler.stage("pset_index"):
+            pset_index = A3_Tool.build_pset_index(model)
+        with profiler.stage("diff_quantities") as stage:
+            quantities, elements, changes, changed_rows = diff_quantities(
+                model, step_lines, previous["elements"] if reusable else None, pset_index, pipeline.geometry_fallback
+            )
+            stage["elements"] = sum(len(rows["new"]) for rows in changed_rows.values())
+        if pipeline.geometry_fallback:
+            # Only the changed rows; footprints of unchanged geometry come from the per-GlobalId cache
+            pipeline.fill_from_geometry(model, {key: rows["new"] for key, rows in changed_rows.items()})
+        with profiler.stage("summarize_areas"):
+            aggregates = update_aggregates(previous["aggregates"] if reusable else empty_aggregates(), quantities, changed_rows)
+            area_data = summarize_aggregates(aggregates)
+        result = pipeline.run_areas(area_data)
+        with profiler.stage("delta_report"):
+            spaces = space_costs(quantities, result["summary"], pipeline)
+            snapshot = build_snapshot(ifc_path, elements, aggregates, spaces, result["summary"], pipeline.geometry_fallback)
+            report = build_delta_report(previous, snapshot, changes)
+        write_outputs(result, output_dir, profiler)
+
+    if profile:
+        report["profiling"] = profiler.report()
+    with open(Path(output_dir) / DELTA_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    save_snapshot(snapshot_path, snapshot)
+    if history_db is not None:
+        history.RunHistory(history_db).record_run(
+            result["summary"], hash_file(ifc_path), pipeline.load_config(), model_name=Path(ifc_path).name, source="incremental",
+            options=pipeline.run_options(),
+        )
+    return report
+
+
+# =======================================================
+# CLI ENTRY POINT
+# =======================================================
+
+def _parse_args() -> argparse.Namespace:
+    """Parse command-line arguments for CLI use."""
+    parser = argparse.ArgumentParser(
+        description="Re-analyse a new IFC revision incrementally and report the cost changes."
+    )
+    parser.add_argument("ifc", help="IFC file of the new revision.")
+    parser.add_argument("--snapshot", default="Output/snapshot.json", help="Snapshot of the previous run (replaced after the run).")
+    parser.add_argument("--output-dir", default="Output", help="Directory for A3_Tool, cost and cost_delta.")
+    parser.add_argument("--config-dir", default=str(DEFAULT_CONFIG_DIR), help="Directory with config JSON files.")
+    parser.add_argument("--weights", default=None, help="Optional custom weights JSON filename (inside config-dir).")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the extraction scripts.")
+    parser.add_argument("--profile", action="store_true", help="Embed stage timings in the cost and cost_delta files.")
+    parser.add_argument("--history", default=str(history.DEFAULT_DB), help="Run history database the revision is recorded in.")
+    parser.add_argument("--no-history", action="store_true", help="Do not record the revision in the run history.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """CLI entry: read args, run run_incremental and print the totals."""
+    args = _parse_args()
+    report = run_incremental(
+        ifc_path=args.ifc,
+        snapshot_path=args.snapshot,
+        output_dir=args.output_dir,
+        config_dir=args.config_dir,
+        weights_override_path=args.weights,
+        quiet=not args.verbose,
+        profile=args.profile,
+        history_db=None if args.no_history else args.history,
+    )
+    totals = report["totals"]
+    print(f"Total cost: {totals['previous_total_cost']:.2f} -> {totals['total_cost']:.2f} ({totals['cost_change']:+.2f})")
+    print(f"{len(report['moved_spaces'])} spaces changed room type, {len(report['added_spaces'])} added, "
+          f"{len(report['removed_spaces'])} removed, {len(report['resized_spaces'])} resized")
+    print(f"Delta report saved to {Path(args.output_dir) / DELTA_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import ifcopenshell
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from external.BIManalyst_g_48.A3 import A3_Tool        # submodule for area extraction
+from pipeline import CostPipeline
+from rules import price_catalog
+from rules.profiling import Profiler
+from rules.validation import validate_model
+
+
+PROGRESS_FILE = "progress.json"
+
+# Steps reported by run_job, in order
+JOB_STEPS = [
+    "Opening IFC model",
+    "Validating model",
+    "Extracting quantities",
+    "Summarizing areas and prices",
+    "Classifying spaces",
+    "Allocating costs",
+]
+
+# One pipeline (with its cached config and classifier) per worker process
+_PIPELINES: Dict[Tuple[str, str | None], CostPipeline] = {}
+
+
+# =======================================================
+# WORKER SIDE
+# =======================================================
+
+def _get_pipeline(config_dir: str, weights_override_path: str | None) -> CostPipeline:
+    key = (config_dir, weights_override_path)
+    if key not in _PIPELINES:
+        # Tessellation runs single threaded here, the pool already uses one process per job
+        _PIPELINES[key] = CostPipeline(config_dir, weights_override_path, geometry_threads=1)
+    return _PIPELINES[key]
+
+
+def _report_progress(job_dir: Path, step: int, message: str) -> None:
+    """Write the current step atomically, so the app never reads a half written file."""
+    path = job_dir / PROGRESS_FILE
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"step": step, "total": len(JOB_STEPS), "message": message, "time": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+def run_job(
+    job_dir: str,
+    ifc_path: str,
+    config_dir: str,
+    weights_override_path: str | None = None,
+    profile: bool = False,
+    area_outputs: Dict | None = None,
+    classification: List | None = None,
+    validation: Dict | None = None,
+    thresholds: Dict | None = None,
+) -> Dict:
+    """
+    Pre-flight validation, extraction and cost allocation for one upload,
+    run in a worker process.
+
+    Progress is written to <job_dir>/progress.json after every step. Given
+    validation, area_outputs (and classification) from the result cache,
+    those steps are skipped; the model is only opened when one of the
+    first two is missing. The model is validated (rules/validation.py,
+    with thresholds) before anything expensive runs, and a rejected model
+    is not extracted at all. The price per m2 comes from the compiled
+    price catalog of the CSVs in the working directory
+    (rules/price_catalog.py), so the CSVs are neither copied nor re-parsed.
+
+    Returns dict with:
+      - status: "ok", "no_spaces" when the model has no IfcSpace, or
+        "rejected" when another validation threshold failed
+      - space_count: number of IfcSpaces (None when the model was not opened)
+      - validation: the pre-flight report
+      - area_outputs: {"A3_Tool": ..., "A3_Tool_price": ...}
+      - classification, summary
+      - profiling: stage report (only when profile is True)
+    """
+    job_dir = Path(job_dir)
+    profiler = Profiler(enabled=profile)
+    pipeline = _get_pipeline(config_dir, weights_override_path)
+    pipeline.profiler = profiler
+
+    space_count = None
+    with profiler:
+        if validation is None or area_outputs is None:
+            _report_progress(job_dir, 0, JOB_STEPS[0])
+            with profiler.stage("ifc_open"):
+                model = ifcopenshell.open(ifc_path)
+            # Shared by the validation and the extraction
+            with profiler.stage("pset_index"):
+                pset_index = A3_Tool.build_pset_index(model)
+            space_count = len(model.by_type("IfcSpace"))
+
+        if validation is None:
+            _report_progress(job_dir, 1, JOB_STEPS[1])
+            with profiler.stage("validation") as stage:
+                validation = validate_model(model, pipeline.classifier, thresholds, pset_index=pset_index)
+                stage["elements"] = space_count
+            if not validation["ok"]:
+                status = "no_spaces" if space_count == 0 else "rejected"
+                return {"status": status, "space_count": space_count, "validation": validation}
+
+        if area_outputs is None:
+            _report_progress(job_dir, 2, JOB_STEPS[2])
+            quantities = pipeline.extract_quantities(model, pset_index)
+
+            _report_progress(job_dir, 3, JOB_STEPS[3])
+            catalog = price_catalog.load_catalog(Path.cwd())
+            area_data = pipeline.extract_areas(model, quantities)
+            area_outputs = {
+                "A3_Tool": area_data,
+                "A3_Tool_price": A3_Tool.price_from_areas(area_data, catalog.price_per_sqm()),
+            }
+        area_data = area_outputs["A3_Tool"]
+
+        config = pipeline.load_config()
+        if classification is None:
+            _report_progress(job_dir, 4, JOB_STEPS[4])
+            classification = pipeline.classify(area_data, config)
+
+        _report_progress(job_dir, 5, JOB_STEPS[5])
+        summary = pipeline.allocate(area_data, classification, config)
+
+    result = {
+        "status": "ok",
+        "space_count": space_count,
+        "validation": validation,
+        "area_outputs": area_outputs,
+        "classification": list(classification),
+        "summary": summary,
+    }
+    if profile:
+        result["profiling"] = profiler.report()
+    return result
+
+
+# =======================================================
+# APP SIDE
+# =======================================================
+
+class JobQueue:
+    """
+    Background job queue shared by all Streamlit sessions.
+
+    Jobs run run_job in a process pool, so several uploads are processed
+    in parallel and the Streamlit script thread only submits and polls.
+    Each job gets its own directory (under the submitting session's work
+    directory) for its progress file.
+
+    The pool uses the "spawn" start method: forking the multi-threaded
+    Streamlit server is unsafe. If a worker dies (e.g. on a malformed
+    file), the pool is recreated for the next submission.
+    """
+
+    def __init__(self, max_workers: int | None = None) -> None:
+        self.max_workers = max_workers
+        self._pool: ProcessPoolExecutor | None = None
+        self._jobs: Dict[str, Tuple[Future, Path]] = {}
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def submit(self, work_dir: str | Path, on_done: Callable[[], None] | None = None, **job_kwargs) -> str:
+        """
+        Queue run_job(**job_kwargs) and return the job id.
+
+        on_done is called once the job has finished, failed or was cancelled
+        (e.g. to unpin its upload in the result cache), also when no session
+        polls it anymore.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = Path(work_dir) / "jobs" / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            try:
+                future = self._get_pool().submit(run_job, str(job_dir), **job_kwargs)
+            except BrokenProcessPool:
+                self._pool = None
+                future = self._get_pool().submit(run_job, str(job_dir), **job_kwargs)
+            self._jobs[job_id] = (future, job_dir)
+        if on_done is not None:
+            future.add_done_callback(lambda _: on_done())
+        return job_id
+
+    def status(self, job_id: str) -> Dict:
+        """
+        Current state of a job.
+
+        Returns dict with "state" ("queued", "running", "done", "failed" or
+        "unknown"), "step"/"total"/"message" while running, "result" when
+        done and "error" when failed.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return {"state": "unknown"}
+        future, job_dir = job
+
+        if future.done():
+            try:
+                return {"state": "done", "result": future.result()}
+            except Exception as e:
+                return {"state": "failed", "error": f"{type(e).__name__}: {e}",
+                        "traceback": "".join(traceback.format_exception(e))}
+
+        try:
+            with open(job_dir / PROGRESS_FILE, "r", encoding="utf-8") as f:
+                progress = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {"state": "queued", "step": 0, "total": len(JOB_STEPS), "message": "Waiting for a free worker"}
+        return {"state": "running", **progress}
+
+    def forget(self, job_id: str) -> None:
+        """Drop a finished (or abandoned) job and its directory."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            future, job_dir = job
+            future.cancel()
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def cleanup_sessions(sessions_dir: str | Path, max_age_s: float = 24 * 3600) -> int:
+    """Remove session work directories not modified for max_age_s. Returns the number removed."""
+    sessions_dir = Path(sessions_dir)
+    if not sessions_dir.exists():
+        return 0
+    removed = 0
+    cutoff = time.time() - max_age_s
+    for path in sessions_dir.iterdir():
+        if path.is_dir() and path.stat().st_mtime < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
@@ -1,40 +1,72 @@
 import json
 from pathlib import Path
-import tempfile
-import ifcopenshell
 import streamlit as st
 import pandas as pd
 import altair as alt
 import os
+import shutil
+import uuid
 
 # Import your submodules
-from external.BIManalyst_g_48.A3 import A3_Tool        # submodule for area extraction 
 from external.BIManalyst_g_49 import roomtype_cost as rtc  # submodule of cost estimation
+from rules import cache                                      # content-hash keyed result cache
+from rules import columnar                                   # optional .npy + manifest output, read memory-mapped
+from rules import price_catalog                              # compiled, mtime-invalidated price CSV catalog
+from pipeline import CostPipeline                            # in-memory extraction -> classification -> allocation
+from rules import validation                                 # one-pass pre-flight model validation
+from rules import history                                    # SQLite run history (trends, diffs, comparisons)
+from jobs import JobQueue, cleanup_sessions                  # background process pool for extraction + allocation
 
 
+# Large-model rendering: above LARGE_MODEL_ROWS table rows the tabs only send the TOP_N
+# rows (plus one "Other" bucket) to the charts and PAGE_SIZE rows per table page
+LARGE_MODEL_ROWS = 200
+TOP_N = 20
+PAGE_SIZE = 100
+OTHER_LABEL = "Other"
+RENDER_MODES = ["Auto", "Full", "Aggregated (top N + other)"]
 
+# Pre-flight validation thresholds (see rules/validation.py); by default only models without spaces are rejected
+VALIDATION_THRESHOLDS = validation.DEFAULT_THRESHOLDS
 
-# Mini IDS
 
-def check_spaces_exist(model):
-    """Mini IDS: Check if model has spaces"""
-    spaces = model.by_type("IfcSpace")
-    return len(spaces) > 0, len(spaces)
+# Pre-flight validation (replaces the mini IDS check)
 
-def mini_ids_check(model):
-    """Run basic space existence check"""
-    has_spaces, space_count = check_spaces_exist(model)
-    
+def preflight_check(report):
+    """Show the pre-flight validation report (computed by the background job). Returns report["ok"]"""
     st.subheader("🔍 Quick Model Check")
-    
-    if has_spaces:
-        st.success(f"✅ Model OK: {space_count} spaces found")
-        return True
+
+    if not report["ok"]:
+        for failure in report["failures"]:
+            st.error(f"❌ {failure}")
+        if report["spaces"] == 0:
+            st.info("Spaces are required for area calculations")
+        else:
+            st.info("The model was rejected before extraction. Fix the model or relax the thresholds.")
     else:
-        st.error("❌ No spaces found - cost allocation won't work")
-        st.info("Spaces are required for area calculations")
-        return False
+        st.success(f"✅ Model OK: {report['spaces']} spaces found")
 
+    names = report.get("names") or {}
+    if names.get("empty_long_name"):
+        st.warning(f"⚠️ {names['empty_long_name']} spaces have no LongName")
+    if names.get("unclassified"):
+        st.warning(f"⚠️ {names['unclassified']} spaces have a LongName that matches no keyword in space_keywords.json")
+
+    if report["coverage"]:
+        df_coverage = pd.DataFrame([
+            {
+                "Category": key,
+                "Required set": category["required"]["set"],
+                "Used elements": category["used"],
+                "Complete": category["complete"],
+                "Coverage": category["coverage"],
+            }
+            for key, category in report["coverage"].items()
+        ]).set_index("Category")
+        st.dataframe(df_coverage.style.format({"Coverage": "{:.0%}"}))
+        if report.get("aborted"):
+            st.caption("Validation stopped at the first failed threshold; counts are partial.")
+    return report["ok"]
 
 
 
@@ -47,13 +79,147 @@ def mini_ids_check(model):
 st.set_page_config(page_title="OpenBIM 🧰", layout="wide")
 
 
+# Result cache shared across reruns (keyed by IFC content hash + config hashes)
+@st.cache_resource
+def get_result_cache():
+    return cache.ResultCache(cache.DEFAULT_CACHE_DIR)
+
+
+# One pipeline per config selection; config files are re-read only when they change on disk
+@st.cache_resource
+def get_pipeline(config_dir, weights_file):
+    return CostPipeline(config_dir, weights_file)
+
+
+# Run history shared by all sessions (and by batch/incremental runs writing the same database)
+@st.cache_resource
+def get_run_history():
+    return history.RunHistory(history.DEFAULT_DB)
+
+
+SESSIONS_DIR = Path("Output/sessions")
+
+
+# One process pool shared by all sessions; stale session directories are removed on startup
+@st.cache_resource
+def get_job_queue():
+    cleanup_sessions(SESSIONS_DIR)
+    return JobQueue()
+
+
+def get_session_dir():
+    """Work directory of the current browser session, so concurrent users never share files"""
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
+    session_dir = SESSIONS_DIR / st.session_state["session_id"]
+    session_dir.mkdir(parents=True, exist_ok=True)
+    os.utime(session_dir)  # keeps an active session from being cleaned up
+    return session_dir
+
+
+@st.fragment(run_every=0.5)
+def show_job_progress(job_queue, job_id):
+    """Poll a background job without blocking the rest of the page; rerun the app once it finished"""
+    status = job_queue.status(job_id)
+    if status["state"] not in ("queued", "running"):
+        st.rerun()
+    st.progress(
+        status["step"] / status["total"],
+        text=f"⏳ {status['message']} (step {status['step'] + 1} of {status['total']})",
+    )
+
+
+def show_profiling(report):
+    """Show a profiling report as a table in the debug panel (None: served from the cache)"""
+    st.write("**Stage profiling:**")
+    if report is None or not report["stages"]:
+        st.info("All stages were served from the result cache.")
+        return
+    df_stages = pd.DataFrame.from_dict(report["stages"], orient="index")
+    df_stages.index.name = "Stage"
+    if "peak_memory_bytes" in df_stages:
+        df_stages["peak_memory_MiB"] = df_stages.pop("peak_memory_bytes") / 1024 ** 2
+    st.dataframe(df_stages)
+    st.caption(
+        f"Total {report['total_wall_time_s']:.3f} s, {report['total_get_psets_calls']} property set lookups, "
+        f"{report.get('total_pset_resolutions', 0)} property definitions resolved. "
+        "Stages not listed were served from the result cache; memory is the Python heap peak."
+    )
+
+
+def use_large_mode(render_mode, n_rows):
+    """Aggregate server-side when asked to, or automatically above LARGE_MODEL_ROWS rows"""
+    if render_mode == RENDER_MODES[1]:
+        return False
+    if render_mode == RENDER_MODES[2]:
+        return True
+    return n_rows > LARGE_MODEL_ROWS
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def top_n_chart_data(df, label, value, top_n=TOP_N, other=True):
+    """Top-N rows by value plus (for additive values) one "Other" row with the rest, computed once per table"""
+    if len(df) <= top_n:
+        return df[[label, value]].reset_index(drop=True)
+    top = df.nlargest(top_n, value)[[label, value]].reset_index(drop=True)
+    if not other:
+        return top
+    other = pd.DataFrame({
+        label: [f"{OTHER_LABEL} ({len(df) - top_n:,} more)"],
+        value: [df[value].sum() - top[value].sum()],
+    })
+    return pd.concat([top, other], ignore_index=True)
+
+
+def show_table(df, formats, key, large):
+    """The whole table, or in large-model mode one page of it (only that page is styled and sent)"""
+    if not large:
+        st.dataframe(df.style.format(formats))
+        return
+    pages = max(1, -(-len(df) // PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1, step=1, key=key)
+    start = (int(page) - 1) * PAGE_SIZE
+    st.dataframe(df.iloc[start:start + PAGE_SIZE].style.format(formats))
+    st.caption(f"Rows {start + 1:,}–{min(start + PAGE_SIZE, len(df)):,} of {len(df):,}")
+
+
+def pie_chart(df, label, value, value_format, extra_tooltips=()):
+    """Altair pie chart with one colour per label"""
+    return (
+        alt.Chart(df)
+        .mark_arc()
+        .encode(
+            theta=alt.Theta(field=value, type="quantitative"),
+            color=alt.Color(field=label, type="nominal"),
+            tooltip=[
+                alt.Tooltip(f"{label}:N"),
+                alt.Tooltip(f"{value}:Q", format=value_format),
+                *extra_tooltips,
+            ],
+        )
+    )
+
+
+def write_output_json(data, filename, output_dir):
+    """Optional file sink: write a result to the session's work directory"""
+    with open(Path(output_dir) / filename, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+
+
 
 
 
 # Define paths
 DATA_DIR = Path("A3/data")
-CUSTOM_DATA_DIR = DATA_DIR / "custom_data"
-CUSTOM_DATA_DIR.mkdir(exist_ok=True)
+SESSION_DIR = get_session_dir()
+CUSTOM_DATA_DIR = SESSION_DIR / "custom_data"
+if not CUSTOM_DATA_DIR.exists():
+    # A new session starts from the shared custom_data folder
+    shutil.copytree(DATA_DIR / "custom_data", CUSTOM_DATA_DIR)
+for config_file in ["room_types.json", "space_keywords.json"]:
+    # Room types and keywords cannot be uploaded, the session copy must still be complete
+    if not (CUSTOM_DATA_DIR / config_file).exists():
+        shutil.copy2(DATA_DIR / config_file, CUSTOM_DATA_DIR / config_file)
 
 # --- Upload Widget ---
 st.header("Upload config files to override defaults")
@@ -95,7 +261,7 @@ if custom_files:
         for file in custom_files:
             file.unlink()
         st.success("Custom files cleared!")
-        st.experimental_rerun()
+        st.rerun()
 else:
     st.info("No custom configuration files uploaded.")
 
@@ -108,21 +274,41 @@ uploaded_ifc = st.file_uploader(
     help="Select an IFC model to continue.",
 )
 
+profile_run = st.checkbox(
+    "⏱️ Profile pipeline stages",
+    value=False,
+    help="Record wall time, element counts, get_psets calls and peak memory per stage (shown in the debug info and stored in the cost output).",
+)
+
+write_columnar = st.checkbox(
+    "📦 Also write columnar output (.npy + manifest)",
+    value=False,
+    help="Stores the area table, classification and allocation matrix as NumPy columns next to the JSON files. The tabs then load them memory-mapped instead of parsing the JSON.",
+)
+
+render_mode = st.selectbox(
+    "📊 Chart and table rendering",
+    RENDER_MODES,
+    index=0,
+    help=f"Auto switches to the aggregated mode above {LARGE_MODEL_ROWS} rows: charts show the top {TOP_N} "
+         f"plus an 'Other' bucket and tables are paged ({PAGE_SIZE} rows per page), so large models stay responsive.",
+)
+
+# In-memory results of the current run, used by the tabs (fall back to the Output files)
+area_data = None
+cost_data = None
+
 # --- Condition that triggers ONLY when the user uploads a file ---
 if uploaded_ifc is not None:
     
-    # Save IFC file
-    ifc_path = Path("Output/uploaded.ifc")
-    ifc_path.parent.mkdir(exist_ok=True)
-    with open(ifc_path, "wb") as f:
-        f.write(uploaded_ifc.getbuffer())
-
-    model = ifcopenshell.open(ifc_path)
-        # === MINI IDS CHECK === 
-    if not mini_ids_check(model):
-        st.stop()  # Stop if no spaces
-    
-    st.success("IFC file successfully uploaded. - running background scripts.")
+    # Uploads are stored once on disk by content hash; the model itself is only parsed by a background worker
+    result_cache = get_result_cache()
+    job_queue = get_job_queue()
+    # Hashed once per upload, not on every rerun of the script
+    if st.session_state.get("ifc_hash_of") != uploaded_ifc.file_id:
+        st.session_state["ifc_hash"] = cache.hash_bytes(uploaded_ifc.getvalue())
+        st.session_state["ifc_hash_of"] = uploaded_ifc.file_id
+    ifc_hash = st.session_state["ifc_hash"]
 
     # Determine which config to use based on actual file presence
     custom_weights_exist = (CUSTOM_DATA_DIR / "custom_weights.json").exists()
@@ -158,8 +344,106 @@ if uploaded_ifc is not None:
 
 
 
-    A3_Tool.area_output_to_json(model,os.getcwd(),"A3_Tool")
-    A3_Tool.price_output_to_json(model,os.getcwd(),"A3_Tool_price")
+    pipeline = get_pipeline(str(config_dir_to_use), weights_file_to_use)
+    try:
+        config = pipeline.load_config()
+    except Exception as e:
+        st.error(f"❌ Error during cost allocation: {str(e)}")
+        st.info("Check that all required configuration files exist in the selected directory.")
+        st.stop()
+
+    # The price output also depends on the price CSVs in the working directory
+    # (compiled once into a catalog, only stat'ed again on later reruns)
+    csv_hash = price_catalog.load_catalog(Path(os.getcwd())).digest()
+    area_key = cache.make_key("area", ifc_hash, csv_hash)
+    # Classification only depends on the areas, room types and keywords ...
+    classify_key = cache.make_key(
+        "classify", area_key,
+        cache.hash_json(config["room_types"]), cache.hash_json(config["space_keywords"]),
+    )
+    # ... so changing only rates or weights reruns only the cost allocation
+    cost_key = cache.make_key(
+        "cost", classify_key,
+        cache.hash_json(config["cost_rates"]), cache.hash_json(config["weights"]),
+        config["weights_source"], config["config_directory_used"],
+    )
+
+    # Pre-flight validation report, known once a worker has opened this file. The keyword
+    # check depends on the room types and keywords, so it is keyed like the classification
+    validation_key = cache.make_key(
+        "validation", ifc_hash, cache.hash_json(VALIDATION_THRESHOLDS),
+        cache.hash_json(config["room_types"]), cache.hash_json(config["space_keywords"]),
+    )
+    validation_report = result_cache.get(validation_key)
+    if validation_report is not None and not validation_report["ok"]:
+        preflight_check(validation_report)
+        st.stop()  # Stop if the model was rejected
+
+    area_outputs = result_cache.get(area_key)
+    classification = result_cache.get(classify_key) if area_outputs is not None else None
+    summary = result_cache.get(cost_key) if classification is not None else None
+    profiling_report = None  # None: everything came from the cache
+
+    if summary is None or validation_report is None:
+        # Hand the stages that are not cached to a background worker and poll it
+        job = st.session_state.get("job")
+        if job is None or job["cost_key"] != cost_key:
+            if job is not None:
+                job_queue.forget(job["id"])
+            job_id = job_queue.submit(
+                SESSION_DIR,
+                # The upload is kept from disk eviction until the worker is done with it
+                ifc_path=str(result_cache.store_model(ifc_hash, uploaded_ifc.getvalue(), pin=True)),
+                on_done=lambda ifc_hash=ifc_hash: result_cache.unpin(ifc_hash),
+                config_dir=str(config_dir_to_use),
+                weights_override_path=weights_file_to_use,
+                profile=profile_run,
+                area_outputs=area_outputs,
+                classification=classification,
+                validation=validation_report,
+                thresholds=VALIDATION_THRESHOLDS,
+            )
+            job = {"id": job_id, "cost_key": cost_key}
+            st.session_state["job"] = job
+
+        status = job_queue.status(job["id"])
+        if status["state"] in ("queued", "running"):
+            st.info("IFC file uploaded - running extraction and cost allocation in the background.")
+            show_job_progress(job_queue, job["id"])
+            st.stop()
+        if status["state"] != "done":
+            st.error(f"❌ Error during extraction or cost allocation: {status.get('error', 'the job was lost, please upload the file again')}")
+            if "traceback" in status:
+                with st.expander("Traceback"):
+                    st.code(status["traceback"])
+            if st.button("🔁 Retry"):
+                job_queue.forget(job["id"])
+                del st.session_state["job"]
+                st.rerun()
+            st.stop()
+
+        result = status["result"]
+        job_queue.forget(job["id"])
+        del st.session_state["job"]
+        validation_report = result["validation"]
+        result_cache.put(validation_key, validation_report)
+        if result["status"] != "ok":
+            preflight_check(validation_report)
+            st.stop()
+        area_outputs, classification, summary = result["area_outputs"], result["classification"], result["summary"]
+        result_cache.put(area_key, area_outputs)
+        result_cache.put(classify_key, classification)
+        result_cache.put(cost_key, summary)
+        profiling_report = result.get("profiling", profiling_report)
+
+    # === PRE-FLIGHT CHECK ===
+    preflight_check(validation_report)
+    area_data = area_outputs["A3_Tool"]
+
+    st.success("IFC file successfully uploaded. - background scripts completed.")
+
+    for name, data in area_outputs.items():
+        write_output_json(data, name, SESSION_DIR)
   
     st.success("Space Extraction completed.")
 
@@ -183,16 +467,25 @@ if uploaded_ifc is not None:
     else:
         st.write(f"• ❌ {weights_path.name} (weights file missing)")
 
-    
-    # Run cost estimation with appropriate config
+    # Write the cost results of this session
     
     try:
-        rtc.process_json(
-            "Output/A3_Tool",  # This input file path stays the same
-            "Output/cost",
-            config_dir=str(config_dir_to_use),
-            weights_override_path=weights_file_to_use
+        cost_data = summary
+        if profile_run and profiling_report is not None:
+            summary = {**summary, "profiling": profiling_report}
+        rtc.write_summary(summary, SESSION_DIR / "cost")
+        # Recorded once per model + config; reruns with the same result return the existing run
+        run_id = get_run_history().record_run(
+            cost_data, ifc_hash, config, model_name=uploaded_ifc.name, source="app", options=pipeline.run_options(),
         )
+        st.session_state["history_run_id"] = run_id
+        if write_columnar:
+            columnar.write_columnar(SESSION_DIR, area_data, summary, pipeline.classifier.classify_many(area_data["Area of spaces"]))
+        else:
+            # A columnar result of an earlier run would otherwise be shown instead of the new JSON
+            shutil.rmtree(SESSION_DIR / columnar.COLUMNAR_DIR, ignore_errors=True)
+        if profile_run:
+            show_profiling(profiling_report)
         
         success_message = "Cost Estimation: CUSTOM configuration completed!" if (custom_weights_exist or custom_rates_exist) else "Cost Estimation: DEFAULT configuration completed."
         st.success(success_message)
@@ -247,7 +540,7 @@ st.title("OpenBIM Tools 🧰")
 
 
 
-tab_areas,tab_cost,T3,T4 = st.tabs(["Area distribution (A3_Tool.json)","Cost overview (cost.json)","Tool3","Tool4" ])
+tab_areas,tab_cost,tab_history,T4 = st.tabs(["Area distribution (A3_Tool.json)","Cost overview (cost.json)","Run history (history.sqlite)","Tool4" ])
 
 
 
@@ -257,14 +550,22 @@ tab_areas,tab_cost,T3,T4 = st.tabs(["Area distribution (A3_Tool.json)","Cost ove
 with tab_cost:
     st.header("🏗️ Analyst_49 Cost overview")
 
-    cost_path = Path("Output/cost")
+    cost_path = SESSION_DIR / "cost"
+    df_room = None
 
-    if not cost_path.exists():
-        st.warning("`Output/cost.json` not found. Is the cost estimation step completed?")
-    else:
+    if cost_data is None and columnar.has_columnar(SESSION_DIR):
+        # Columnar output: only the per-room-type columns are read (memory-mapped)
+        stored = columnar.load_columnar(SESSION_DIR)
+        cost_data = stored.manifest["cost_scalars"]
+        df_room = pd.DataFrame(stored.table("per_room_type"), index=stored.room_types)
+    elif cost_data is None and cost_path.exists():
         with open(cost_path, "r", encoding="utf-8") as f:
             cost_data = json.load(f)
 
+    if cost_data is None:
+        st.warning("`Output/cost.json` not found. Is the cost estimation step completed?")
+    else:
+
         # Top-level KPIs
         col1, col2, col3 = st.columns(3)
         col1.metric("Total area (m²)", f"{cost_data.get('Total summed area', 0):,.2f}")
@@ -275,45 +576,41 @@ with tab_cost:
 
         # Per room type table + bar chart
         st.subheader("Per room type")
-        per_room = cost_data.get("per_room_type", {})
-        df_room = pd.DataFrame.from_dict(per_room, orient="index")
+        if df_room is None:
+            per_room = cost_data.get("per_room_type", {})
+            df_room = pd.DataFrame.from_dict(per_room, orient="index")
         df_room.index.name = "Room type"
 
         if not df_room.empty:
             df_room_sorted = df_room.sort_values("unit_price", ascending=False)
-            st.dataframe(
-                df_room_sorted.style.format({
-                    "area": "{:,.2f}",
-                    "allocated_cost": "{:,.0f}",
-                    "unit_price": "{:,.0f}",
-                })
+            large = use_large_mode(render_mode, len(df_room_sorted))
+            show_table(
+                df_room_sorted,
+                {"area": "{:,.2f}", "allocated_cost": "{:,.0f}", "unit_price": "{:,.0f}"},
+                key="room_type_page",
+                large=large,
             )
-            st.bar_chart(df_room_sorted["unit_price"])
-
-            # ---------------------------------------------------------
-            # ✅ INSERT ALTAR PIE CHART HERE (cost distribution)
-            # ---------------------------------------------------------
-            import altair as alt
-
-            st.subheader("Cost distribution (pie)")
             df_room_reset = df_room_sorted.reset_index().rename(columns={"index": "Room type"})
+            if large:
+                # Unit prices do not add up, so there is no "Other" bar here
+                chart_room = top_n_chart_data(df_room_reset, "Room type", "unit_price", other=False)
+                st.caption(f"Large result: charts show the top {TOP_N} of {len(df_room_reset):,} room types.")
+                st.bar_chart(chart_room.set_index("Room type")["unit_price"])
+            else:
+                st.bar_chart(df_room_sorted["unit_price"])
 
-            pie_cost = (
-                alt.Chart(df_room_reset)
-                .mark_arc()
-                .encode(
-                    theta=alt.Theta(field="allocated_cost", type="quantitative"),
-                    color=alt.Color(field="Room type", type="nominal"),
-                    tooltip=[
-                        alt.Tooltip("Room type:N"),
-                        alt.Tooltip("allocated_cost:Q", format=",.0f"),
-                        alt.Tooltip("unit_price:Q", format=",.0f"),
-                    ],
+            st.subheader("Cost distribution (pie)")
+            if large:
+                pie_cost = pie_chart(
+                    top_n_chart_data(df_room_reset, "Room type", "allocated_cost"),
+                    "Room type", "allocated_cost", ",.0f",
+                )
+            else:
+                pie_cost = pie_chart(
+                    df_room_reset, "Room type", "allocated_cost", ",.0f",
+                    [alt.Tooltip("unit_price:Q", format=",.0f")],
                 )
-            )
-
             st.altair_chart(pie_cost, use_container_width=True)
-            # ---------------------------------------------------------
 
         else:
             st.info("No room-type data found in cost.json.")
@@ -323,46 +620,44 @@ with tab_cost:
 with tab_areas:
     st.header("Area distribution from Analyst_48")
 
-    a3_path = Path("Output/A3_Tool")
-
-    if not a3_path.exists():
-        st.warning("`Output/A3_Tool not found. Run the area extraction first.")
-    else:
+    a3_path = SESSION_DIR / "A3_Tool"
+
+    a3_data = area_data
+    df_areas = None
+    if a3_data is None and columnar.has_columnar(SESSION_DIR):
+        # Columnar output: the area table is read memory-mapped, no JSON parsing
+        stored = columnar.load_columnar(SESSION_DIR)
+        a3_data = stored.manifest["area_scalars"]
+        areas_table = stored.table("areas")
+        df_areas = pd.DataFrame({"Space name": areas_table["name"], "Area (m²)": areas_table["area"]})
+    elif a3_data is None and a3_path.exists():
         with open(a3_path, "r", encoding="utf-8") as f:
             a3_data = json.load(f)
 
-        areas = a3_data.get("Area of spaces", {})
-
-        if areas:
-            df_areas = (
-                pd.DataFrame(list(areas.items()), columns=["Space name", "Area (m²)"])
-                .sort_values("Area (m²)", ascending=False)
-            )
-
-            st.dataframe(df_areas.style.format({"Area (m²)": "{:,.2f}"}))
-            st.bar_chart(df_areas.set_index("Space name")["Area (m²)"])
-
-            # ---------------------------------------------------------
-            # ✅ INSERT ALTAR PIE CHART HERE (area distribution)
-            # ---------------------------------------------------------
-            import altair as alt
+    if a3_data is None:
+        st.warning("`Output/A3_Tool not found. Run the area extraction first.")
+    else:
 
-            st.subheader("Area distribution (pie)")
-            pie_area = (
-                alt.Chart(df_areas)
-                .mark_arc()
-                .encode(
-                    theta=alt.Theta(field="Area (m²)", type="quantitative"),
-                    color=alt.Color(field="Space name", type="nominal"),
-                    tooltip=[
-                        alt.Tooltip("Space name:N"),
-                        alt.Tooltip("Area (m²):Q", format=",.2f"),
-                    ],
+        if df_areas is None:
+            areas = a3_data.get("Area of spaces", {})
+            df_areas = pd.DataFrame(list(areas.items()), columns=["Space name", "Area (m²)"])
+
+        if not df_areas.empty:
+            df_areas = df_areas.sort_values("Area (m²)", ascending=False)
+            large = use_large_mode(render_mode, len(df_areas))
+
+            show_table(df_areas, {"Area (m²)": "{:,.2f}"}, key="areas_page", large=large)
+            # In large-model mode only the top N space names (plus "Other") reach the browser
+            chart_areas = top_n_chart_data(df_areas, "Space name", "Area (m²)") if large else df_areas
+            if large:
+                st.caption(
+                    f"Large model: charts show the top {TOP_N} of {len(df_areas):,} space names, "
+                    f"the rest is summed as '{OTHER_LABEL}'."
                 )
-            )
+            st.bar_chart(chart_areas.set_index("Space name")["Area (m²)"])
 
-            st.altair_chart(pie_area, use_container_width=True)
-            # ---------------------------------------------------------
+            st.subheader("Area distribution (pie)")
+            st.altair_chart(pie_chart(chart_areas, "Space name", "Area (m²)", ",.2f"), use_container_width=True)
 
         else:
             st.info("No 'Area of spaces' found in A3_Tool.json.")
@@ -371,4 +666,107 @@ with tab_areas:
             
             
 
-        
\ No newline at end of file
+        
+
+# ================== TAB 3: history.sqlite ==================
+with tab_history:
+    st.header("🕓 Run history")
+
+    run_history = get_run_history()
+    models = run_history.models()
+
+    if not models:
+        st.info("No runs recorded yet. Upload an IFC file (or run batch.py / incremental.py) to record one.")
+    else:
+        # Runs, optionally of one model only
+        model_labels = {m["model_hash"]: f"{m['model_name']} ({m['runs']} runs, {m['model_hash'][:8]})" for m in models}
+        model_filter = st.selectbox(
+            "Model", [None, *model_labels], format_func=lambda h: "All models" if h is None else model_labels[h],
+            key="history_model",
+        )
+        runs = run_history.runs(model_hash=model_filter, limit=None)
+        df_runs = pd.DataFrame(runs).set_index("id")
+        df_runs["created_at"] = pd.to_datetime(df_runs["created_at"], unit="s")
+        run_labels = {
+            run_id: f"#{run_id} {row.model_name} · {row.weights_source} · {row.created_at:%Y-%m-%d %H:%M}"
+            for run_id, row in df_runs.iterrows()
+        }
+
+        st.subheader("Runs")
+        show_table(
+            df_runs[["created_at", "model_name", "weights_source", "source", "total_area", "total_cost", "unit_price"]],
+            {"total_area": "{:,.2f}", "total_cost": "{:,.0f}", "unit_price": "{:,.0f}"},
+            key="history_page",
+            large=use_large_mode(render_mode, len(df_runs)),
+        )
+
+        # Trend of the totals and of one room type over time
+        st.subheader("Trend")
+        room_types = list(run_history.run(int(df_runs.index[0]))["per_room_type"])
+        trend_room_type = st.selectbox("Room type", ["All room types", *room_types], key="history_trend_room_type")
+        if trend_room_type == "All room types":
+            df_trend = df_runs[["created_at", "model_name", "unit_price"]]
+        else:
+            df_trend = pd.DataFrame(run_history.room_type_trend(trend_room_type, model_hash=model_filter))
+            if not df_trend.empty:
+                df_trend["created_at"] = pd.to_datetime(df_trend["created_at"], unit="s")
+        if df_trend.empty:
+            st.info(f"No runs with room type '{trend_room_type}'.")
+        else:
+            st.altair_chart(
+                alt.Chart(df_trend)
+                .mark_line(point=True)
+                .encode(
+                    x=alt.X("created_at:T", title="Run"),
+                    y=alt.Y("unit_price:Q", title="Unit price (kr/m²)"),
+                    color=alt.Color("model_name:N", title="Model"),
+                    tooltip=[alt.Tooltip("model_name:N"), alt.Tooltip("created_at:T"), alt.Tooltip("unit_price:Q", format=",.0f")],
+                ),
+                use_container_width=True,
+            )
+
+        # Diff of two runs (same model with another config, or two models)
+        if len(df_runs) >= 2:
+            st.subheader("Compare two runs")
+            run_ids = list(run_labels)
+            current = st.session_state.get("history_run_id")
+            col_a, col_b = st.columns(2)
+            run_b = col_b.selectbox(
+                "After", run_ids, index=run_ids.index(current) if current in run_ids else 0,
+                format_func=run_labels.get, key="history_run_b",
+            )
+            run_a = col_a.selectbox(
+                "Before", run_ids, index=1 if run_ids[0] == run_b else 0,
+                format_func=run_labels.get, key="history_run_a",
+            )
+            diff = run_history.diff(run_a, run_b)
+
+            totals = diff["totals"]
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Total area (m²)", f"{totals['total_area']['after'] or 0:,.2f}", f"{totals['total_area']['delta']:+,.2f}")
+            col2.metric("Total cost (kr)", f"{totals['total_cost']['after'] or 0:,.0f}", f"{totals['total_cost']['delta']:+,.0f}")
+            col3.metric("Avg unit price (kr/m²)", f"{totals['unit_price']['after'] or 0:,.0f}", f"{totals['unit_price']['delta']:+,.0f}")
+            if not diff["same_model"]:
+                st.caption("Different models.")
+            elif diff["changed_config"]:
+                st.caption("Same model, changed: " + ", ".join(h.replace("_hash", "") for h in diff["changed_config"]))
+
+            df_diff = pd.DataFrame([
+                {
+                    "Room type": rt,
+                    "Area before": v["area"]["before"],
+                    "Area after": v["area"]["after"],
+                    "Cost before": v["allocated_cost"]["before"],
+                    "Cost after": v["allocated_cost"]["after"],
+                    "Cost change": v["allocated_cost"]["delta"],
+                }
+                for rt, v in diff["per_room_type"].items()
+            ])
+            if not df_diff.empty:
+                df_diff = df_diff.set_index("Room type").sort_values("Cost change", key=abs, ascending=False)
+                show_table(
+                    df_diff,
+                    {c: "{:,.2f}" if c.startswith("Area") else "{:,.0f}" for c in df_diff.columns},
+                    key="history_diff_page",
+                    large=use_large_mode(render_mode, len(df_diff)),
+                )
@@ -0,0 +1,239 @@
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from external.BIManalyst_g_48.A3 import A3_Tool        # submodule for area extraction
+from external.BIManalyst_g_49 import roomtype_cost as rtc  # submodule of cost estimation
+from rules import columnar, price_catalog
+from rules.geometry_cache import GeometryCache, project_key
+from rules.profiling import DISABLED, Profiler
+
+
+DEFAULT_CONFIG_DIR = Path(__file__).resolve().parent / "data"
+DEFAULT_GEOMETRY_CACHE = Path("Output/cache/geometry_areas.sqlite")
+
+
+class CostPipeline:
+    """
+    In-memory pipeline: IFC model -> areas -> classification -> cost allocation.
+
+    Results are passed between the stages as Python objects. Config files
+    are read through roomtype_cost's mtime-invalidated cache on every run,
+    so edits on disk are picked up, and the keyword classifier is only
+    rebuilt when room types or keywords actually changed. Writing the
+    A3_Tool/cost JSON files is an optional sink (write_outputs).
+
+    If a Profiler is given, every stage is timed (see rules/profiling.py).
+
+    With geometry_fallback, spaces, walls and columns without quantity sets
+    get their areas from the geometry (A3_Tool.fill_quantities_from_geometry,
+    tessellated on geometry_threads cores). Footprints are cached per
+    GlobalId in the SQLite store geometry_cache_path (rules/geometry_cache.py),
+    which batch worker processes share, or in memory (None).
+
+    With price_files (a price CSV or a folder of them), the cost rates are
+    derived from the compiled price catalog (rules/price_catalog.py) under
+    the cost group names of the weights, instead of read from cost_rates.json.
+    """
+
+    def __init__(
+        self,
+        config_dir: str | Path = DEFAULT_CONFIG_DIR,
+        weights_override_path: str | None = None,
+        profiler: Profiler | None = None,
+        geometry_fallback: bool = True,
+        geometry_cache_path: str | Path | None = DEFAULT_GEOMETRY_CACHE,
+        geometry_threads: int | None = None,
+        price_files: str | Path | None = None,
+    ) -> None:
+        self.config_dir = Path(config_dir)
+        self.weights_override_path = weights_override_path
+        self.profiler = profiler or DISABLED
+        self.geometry_fallback = geometry_fallback
+        self.geometry_cache_path = geometry_cache_path
+        self.geometry_threads = geometry_threads
+        self.price_files = price_files
+        self._classifier = None
+        self._classifier_source = None
+        self._geometry_cache = None
+
+    # ---------- config ----------
+
+    def load_config(self) -> Dict:
+        """Return the current config (room types, keywords, rates, weights, sources)."""
+        catalog = price_catalog.load_catalog(self.price_files) if self.price_files is not None else None
+        config = rtc.load_config(self.config_dir, self.weights_override_path, catalog)
+        source = (config["room_types"], config["space_keywords"])
+        if self._classifier is None or source != self._classifier_source:
+            self._classifier = rtc.SpaceClassifier(config["room_types"], config["space_keywords"])
+            self._classifier_source = source
+        return config
+
+    def run_options(self) -> Dict:
+        """Options besides the config files that change the results (price source as a catalog digest)."""
+        return {
+            "geometry_fallback": self.geometry_fallback,
+            "price_source": price_catalog.load_catalog(self.price_files).digest() if self.price_files is not None else None,
+        }
+
+    @property
+    def classifier(self) -> rtc.SpaceClassifier:
+        """Keyword classifier of the current config (loads the config if needed)."""
+        if self._classifier is None:
+            self.load_config()
+        return self._classifier
+
+    # ---------- stages ----------
+
+    def extract_quantities(self, model, pset_index=None) -> Dict:
+        """
+        A3_Tool quantity table, extracted one element category (stage) at a time.
+
+        An existing A3_Tool.PsetIndex of the model (e.g. from the pre-flight
+        validation) can be passed to skip building it again.
+        """
+        extractors = {
+            "spaces": A3_Tool.extract_space_quantities,
+            "walls": A3_Tool.extract_wall_quantities,
+            "curtain_walls": A3_Tool.extract_curtain_wall_quantities,
+            "columns": A3_Tool.extract_column_quantities,
+        }
+        if pset_index is None:
+            with self.profiler.stage("pset_index"):
+                pset_index = A3_Tool.build_pset_index(model)
+        quantities = {}
+        for key, extractor in extractors.items():
+            with self.profiler.stage(f"extract_{key}") as stage:
+                quantities[key] = extractor(model, pset_index)
+                stage["elements"] = len(quantities[key])
+        if self.geometry_fallback:
+            self.fill_from_geometry(model, quantities)
+        return quantities
+
+    def fill_from_geometry(self, model, quantities: Dict) -> int:
+        """Fill in missing quantities from the geometry. Returns the number of rows filled."""
+        store = None
+        if self.geometry_cache_path is None:
+            if self._geometry_cache is None:
+                self._geometry_cache = {}
+            cache = self._geometry_cache
+        else:
+            store = GeometryCache(self.geometry_cache_path)
+            project = project_key(model)
+            loaded = store.load(project)
+            cache = dict(loaded)
+        with self.profiler.stage("geometry_fallback") as stage:
+            filled = A3_Tool.fill_quantities_from_geometry(model, quantities, self.geometry_threads, cache)
+            stage["elements"] = filled
+            if store is not None:
+                # Only the footprints of this model's rows without quantities are kept for its project
+                referenced = {
+                    row["GlobalId"] for key, rows in quantities.items() for row in rows
+                    if A3_Tool.row_without_quantities(key, row)
+                }
+                store.update(project, {gid: cache[gid] for gid in referenced if gid in cache}, loaded)
+        return filled
+
+    def extract_areas(self, model, quantities=None) -> Dict:
+        """Area data of a model (same content as the A3_Tool JSON file)."""
+        if quantities is None:
+            quantities = self.extract_quantities(model)
+        with self.profiler.stage("summarize_areas"):
+            return A3_Tool.summarize_areas(model, quantities)
+
+    def classify(self, area_data: Dict, config: Dict | None = None) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """Classify the spaces of area_data. Returns (area_by_roomtype, unclassified_spaces)."""
+        if config is None:
+            config = self.load_config()
+        with self.profiler.stage("classification") as stage:
+            stage["elements"] = len(area_data.get("Area of spaces", {}))
+            return rtc.classify_all_spaces(
+                area_data.get("Area of spaces", {}),
+                config["room_types"],
+                config["space_keywords"],
+                classifier=self._classifier,
+            )
+
+    def allocate(self, area_data: Dict, classification=None, config: Dict | None = None) -> Dict:
+        """Cost summary of area_data (same content as the cost JSON file)."""
+        if config is None:
+            config = self.load_config()
+        if classification is None:
+            classification = self.classify(area_data, config)
+        with self.profiler.stage("allocation") as stage:
+            stage["elements"] = len(config["room_types"]) * len(config["cost_rates"])
+            return rtc.build_summary(area_data, config, classification)
+
+    def run_areas(self, area_data: Dict) -> Dict:
+        """
+        Classification and allocation for already extracted area data.
+
+        Returns dict with "areas", "classification", "summary" and
+        "space_room_types" (room type per "Area of spaces" entry, in order).
+        """
+        config = self.load_config()
+        classification = self.classify(area_data, config)
+        return {
+            "areas": area_data,
+            "classification": classification,
+            "summary": self.allocate(area_data, classification, config),
+            "space_room_types": self.classifier.classify_many(area_data.get("Area of spaces", {})),
+        }
+
+    def run(self, model, output_dir: str | Path | None = None, formats: Sequence[str] = ("json",)) -> Dict:
+        """
+        Run all stages on a model.
+
+        Returns the run_areas dict. If output_dir is given, the outputs are
+        written there in the given formats (see write_outputs).
+        When profiling is enabled, the result also has a "profiling" report.
+        """
+        with self.profiler:
+            result = self.run_areas(self.extract_areas(model))
+            if output_dir is not None:
+                write_outputs(result, output_dir, self.profiler, formats)
+        if self.profiler.enabled:
+            result["profiling"] = self.profiler.report()
+        return result
+
+
+OUTPUT_FORMATS = ("json", "columnar")
+
+
+def write_outputs(
+    result: Dict,
+    output_dir: str | Path,
+    profiler: Profiler = DISABLED,
+    formats: Sequence[str] = ("json",),
+) -> None:
+    """
+    File sink: write the outputs of a pipeline result.
+
+    formats:
+      "json"     -> the A3_Tool and cost JSON files
+      "columnar" -> .npy columns + manifest in output_dir/columnar (see rules/columnar.py)
+
+    With profiling enabled, the report (up to, but not including, writing
+    the cost output itself) is embedded in the cost output under "profiling".
+    """
+    unknown = set(formats) - set(OUTPUT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown output format(s): {', '.join(sorted(unknown))}")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if "json" in formats:
+        with profiler.stage("json_write_areas"):
+            with open(output_dir / "A3_Tool", "w", encoding="utf-8") as f:
+                json.dump(result["areas"], f, indent=4)
+    summary = result["summary"]
+    if profiler.enabled:
+        summary = {**summary, "profiling": profiler.report()}
+    if "json" in formats:
+        with profiler.stage("json_write_cost"):
+            rtc.write_summary(summary, output_dir / "cost")
+    if "columnar" in formats:
+        with profiler.stage("columnar_write"):
+            columnar.write_columnar(output_dir, result["areas"], summary, result.get("space_room_types"))
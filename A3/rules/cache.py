@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict
+
+
+# =======================================================
+# HASHING HELPERS
+# =======================================================
+
+def hash_bytes(data: bytes) -> str:
+    """Return the sha256 hex digest of raw bytes (e.g. an uploaded IFC file)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str | Path, chunk_size: int = 1024 * 1024) -> str:
+    """Return the sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_json(obj) -> str:
+    """Return the sha256 hex digest of a JSON-serialisable object (e.g. a loaded config)."""
+    text = json.dumps(obj, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_key(*parts: str) -> str:
+    """Combine several hashes/labels into one cache key."""
+    return hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+# =======================================================
+# RESULT CACHE
+# =======================================================
+
+# Own subdirectory: Output/cache also holds the geometry and price catalog stores
+DEFAULT_CACHE_DIR = Path("Output/cache/results")
+
+_HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+def _is_cache_file(path: Path) -> bool:
+    # <sha256 key>.json, <sha256 hash>.ifc or <key>.<thread id>.tmp
+    key = path.name.split(".", 1)[0]
+    return path.suffix in (".ifc", ".json", ".tmp") and len(key) == 64 and set(key) <= _HEX_DIGITS
+
+class ResultCache:
+    """
+    Content-hash keyed cache for the Streamlit app.
+
+    - Uploads are stored once on disk as <ifc hash>.ifc, for the background
+      workers to open. An upload pinned by a pending job is not evicted.
+    - JSON-serialisable results (areas, classification, cost summary) are
+      kept in an in-memory LRU and as <key>.json files on disk.
+    - The disk directory is bounded by max_disk_bytes; the least recently
+      used files are evicted first. Only files named after a hash key are
+      ever evicted or cleared, so other stores in the same directory are
+      left alone.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path = DEFAULT_CACHE_DIR,
+        max_results: int = 64,
+        max_disk_bytes: int = 2 * 1024 ** 3,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_results = max_results
+        self.max_disk_bytes = max_disk_bytes
+        self._results: "OrderedDict[str, object]" = OrderedDict()
+        self._pinned: Dict[str, int] = {}   # ifc hash -> number of pending jobs
+        self._lock = threading.RLock()
+
+    # ---------- models ----------
+
+    def store_model(self, ifc_hash: str, ifc_bytes: bytes, pin: bool = False) -> Path:
+        """
+        Store an upload on disk once (without parsing it) and return its path.
+
+        With pin, the file is not evicted until unpin(ifc_hash) is called,
+        e.g. once the job it is queued for has finished.
+        """
+        if pin:
+            with self._lock:
+                self._pinned[ifc_hash] = self._pinned.get(ifc_hash, 0) + 1
+        ifc_path = self.cache_dir / f"{ifc_hash}.ifc"
+        if ifc_path.exists():
+            os.utime(ifc_path)
+        else:
+            # Written under a unique name first, two sessions may upload the same file at once
+            tmp_path = ifc_path.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(ifc_bytes)
+            os.replace(tmp_path, ifc_path)
+            self._evict_disk()
+        return ifc_path
+
+    def unpin(self, ifc_hash: str) -> None:
+        """Release one pin of store_model(..., pin=True)."""
+        with self._lock:
+            count = self._pinned.get(ifc_hash, 0) - 1
+            if count > 0:
+                self._pinned[ifc_hash] = count
+            else:
+                self._pinned.pop(ifc_hash, None)
+
+    # ---------- results ----------
+
+    def get(self, key: str):
+        """Return a cached result or None, checking memory first and then disk."""
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+
+        path = self.cache_dir / f"{key}.json"
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        os.utime(path)
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, value) -> None:
+        """Store a JSON-serialisable result in memory and on disk."""
+        self._remember(key, value)
+        path = self.cache_dir / f"{key}.json"
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._evict_disk()
+
+    def clear(self) -> None:
+        """Drop everything from memory and disk, except pinned uploads."""
+        with self._lock:
+            self._results.clear()
+            pinned = {f"{ifc_hash}.ifc" for ifc_hash in self._pinned}
+        for path in self.cache_dir.iterdir():
+            if _is_cache_file(path) and path.name not in pinned:
+                path.unlink(missing_ok=True)
+
+    # ---------- internals ----------
+
+    def _remember(self, key: str, value) -> None:
+        with self._lock:
+            self._results[key] = value
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        with self._lock:
+            pinned = {f"{ifc_hash}.ifc" for ifc_hash in self._pinned}
+        stats: Dict[Path, os.stat_result] = {}
+        for p in self.cache_dir.iterdir():
+            if p.suffix in (".ifc", ".json") and _is_cache_file(p) and p.name not in pinned:
+                try:
+                    stats[p] = p.stat()
+                except FileNotFoundError:
+                    # Evicted meanwhile by another session
+                    continue
+        files = list(stats)
+        total = sum(s.st_size for s in stats.values())
+        # Oldest modification time first = least recently used
+        for path in sorted(files, key=lambda p: stats[p].st_mtime):
+            if total <= self.max_disk_bytes:
+                break
+            total -= stats[path].st_size
+            path.unlink(missing_ok=True)
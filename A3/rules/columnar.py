@@ -0,0 +1,228 @@
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+COLUMNAR_DIR = "columnar"
+MANIFEST_FILE = "manifest.json"
+FORMAT = "a3-columnar"
+VERSION = 1
+
+# Summary entries stored as arrays; everything else in the summary goes to the manifest
+_COST_TABLE_KEYS = ("per_room_type", "per_cost_group", "unclassified_spaces")
+
+
+# =======================================================
+# WRITING
+# =======================================================
+
+def _names(keys) -> np.ndarray:
+    # Same key text as json.dump would write (None -> "null")
+    return np.array(["null" if k is None else str(k) for k in keys], dtype=str)
+
+
+def _numbers(values) -> np.ndarray:
+    # int64 when every value is an int (e.g. rates from the config), so they come back as ints
+    values = list(values)
+    exact = all(isinstance(v, int) and not isinstance(v, bool) for v in values)
+    return np.array(values, dtype=np.int64 if exact and values else np.float64)
+
+
+def _save(directory: Path, table: str, columns: Dict[str, np.ndarray], token: str) -> Dict:
+    entry = {"columns": {}}
+    for name, array in columns.items():
+        filename = f"{table}.{name}.{token}.npy"
+        np.save(directory / filename, array, allow_pickle=False)
+        entry["columns"][name] = {"file": filename, "dtype": array.dtype.str, "shape": list(array.shape)}
+    entry["rows"] = len(next(iter(columns.values()))) if columns else 0
+    return entry
+
+
+def write_columnar(
+    output_dir: str | Path,
+    area_data: Dict,
+    summary: Dict,
+    space_room_types: Sequence[str] | None = None,
+) -> Path:
+    """
+    Write the area table, classification table and allocation matrix as
+    .npy columns plus a small JSON manifest in <output_dir>/columnar/.
+
+    Tables (one .npy file per column):
+      - areas:          name, area             (one row per space type, as "Area of spaces")
+      - classification: room_type              (code into manifest "room_types", -1 = unclassified;
+                                                rows aligned with areas, only if space_room_types is given)
+      - unclassified:   name, area
+      - per_room_type:  area, allocated_cost, unit_price (rows = manifest "room_types")
+      - cost_groups:    rate_per_m2, total_cost          (rows = manifest "cost_groups")
+      - allocation:     share, allocated_cost            (2-D, room type x cost group)
+
+    All scalar (and other small) entries of area_data and summary are kept
+    in the manifest, and number columns keep int64 when all their values
+    are ints (dtype recorded per column), so load_columnar(...).area_data()
+    /.summary() rebuild the JSON outputs exactly.
+
+    Every write uses new column file names (a per-write suffix) and the
+    manifest that references them replaces the old one last, via
+    os.replace, so a reader sees either the previous or the new result,
+    never a mix. Column files no longer referenced are removed afterwards.
+
+    Returns the directory written to.
+    """
+    directory = Path(output_dir) / COLUMNAR_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    token = uuid.uuid4().hex[:12]
+
+    areas_spaces = area_data.get("Area of spaces", {})
+    per_room_type = summary.get("per_room_type", {})
+    per_cost_group = summary.get("per_cost_group", {})
+    room_types = list(per_room_type)
+    cost_groups = list(per_cost_group)
+
+    tables = {
+        "areas": _save(directory, "areas", {
+            "name": _names(areas_spaces.keys()),
+            "area": _numbers(areas_spaces.values()),
+        }, token),
+        "unclassified": _save(directory, "unclassified", {
+            "name": _names(summary.get("unclassified_spaces", {}).keys()),
+            "area": _numbers(summary.get("unclassified_spaces", {}).values()),
+        }, token),
+        "per_room_type": _save(directory, "per_room_type", {
+            field: _numbers(per_room_type[rt][field] for rt in room_types)
+            for field in ("area", "allocated_cost", "unit_price")
+        }, token),
+        "cost_groups": _save(directory, "cost_groups", {
+            field: _numbers(per_cost_group[cg][field] for cg in cost_groups)
+            for field in ("rate_per_m2", "total_cost")
+        }, token),
+        "allocation": _save(directory, "allocation", {
+            field: _numbers(
+                per_cost_group[cg]["allocation"][rt][field] for rt in room_types for cg in cost_groups
+            ).reshape(len(room_types), len(cost_groups))
+            for field in ("share", "allocated_cost")
+        }, token),
+    }
+    if space_room_types is not None:
+        codes = {rt: i for i, rt in enumerate(room_types)}
+        tables["classification"] = _save(directory, "classification", {
+            "room_type": np.array([codes.get(rt, -1) for rt in space_room_types], dtype=np.int32),
+        }, token)
+
+    manifest = {
+        "format": FORMAT,
+        "version": VERSION,
+        "room_types": room_types,
+        "cost_groups": cost_groups,
+        "area_scalars": {k: v for k, v in area_data.items() if k != "Area of spaces"},
+        "cost_scalars": {k: v for k, v in summary.items() if k not in _COST_TABLE_KEYS},
+        "tables": tables,
+    }
+    tmp_path = directory / (MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, directory / MANIFEST_FILE)
+
+    # Columns of earlier writes (a reader holding the old manifest keeps its open memory maps)
+    current = {info["file"] for entry in tables.values() for info in entry["columns"].values()}
+    for path in directory.glob("*.npy"):
+        if path.name not in current:
+            path.unlink(missing_ok=True)
+    return directory
+
+
+# =======================================================
+# READING
+# =======================================================
+
+def has_columnar(path: str | Path) -> bool:
+    """True if path (an output dir or its columnar/ subdir) holds a columnar result."""
+    path = Path(path)
+    return (path / MANIFEST_FILE).exists() or (path / COLUMNAR_DIR / MANIFEST_FILE).exists()
+
+
+class ColumnarResult:
+    """
+    Read access to a columnar result.
+
+    Columns are opened with np.load(mmap_mode="r"), so only the pages that
+    are actually used are read from disk, and several processes reading
+    the same result share them through the OS page cache.
+    """
+
+    def __init__(self, path: str | Path, mmap: bool = True) -> None:
+        path = Path(path)
+        self.directory = path if (path / MANIFEST_FILE).exists() else path / COLUMNAR_DIR
+        with open(self.directory / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != FORMAT or self.manifest.get("version") != VERSION:
+            raise ValueError(f"Unsupported columnar result in {self.directory}")
+        self.mmap_mode = "r" if mmap else None
+        self.room_types: List[str] = self.manifest["room_types"]
+        self.cost_groups: List[str] = self.manifest["cost_groups"]
+
+    def tables(self) -> List[str]:
+        return list(self.manifest["tables"])
+
+    def column(self, table: str, name: str) -> np.ndarray:
+        info = self.manifest["tables"][table]["columns"][name]
+        return np.load(self.directory / info["file"], mmap_mode=self.mmap_mode, allow_pickle=False)
+
+    def table(self, table: str) -> Dict[str, np.ndarray]:
+        """All columns of a table, e.g. for pd.DataFrame(result.table("areas"))."""
+        return {name: self.column(table, name) for name in self.manifest["tables"][table]["columns"]}
+
+    # ---------- JSON compatible views ----------
+
+    def area_data(self) -> Dict:
+        """The A3_Tool dict (same content as the JSON file)."""
+        names, areas = self.column("areas", "name"), self.column("areas", "area")
+        result = {"Area of spaces": {str(n): a.item() for n, a in zip(names, areas)}}
+        result.update(self.manifest["area_scalars"])
+        # Keep the key order of the JSON file
+        order = ["Area of spaces"] + [k for k in self.manifest["area_scalars"]]
+        return {k: result[k] for k in order}
+
+    def summary(self) -> Dict:
+        """The cost summary dict (same content as the JSON file)."""
+        per_room_type = self.table("per_room_type")
+        cost_groups = self.table("cost_groups")
+        allocation = self.table("allocation")
+        unclassified = self.table("unclassified")
+        tables = {
+            "per_room_type": {
+                rt: {field: per_room_type[field][r].item() for field in ("area", "allocated_cost", "unit_price")}
+                for r, rt in enumerate(self.room_types)
+            },
+            "per_cost_group": {
+                cg: {
+                    "rate_per_m2": cost_groups["rate_per_m2"][g].item(),
+                    "total_cost": cost_groups["total_cost"][g].item(),
+                    "allocation": {
+                        rt: {
+                            "share": allocation["share"][r, g].item(),
+                            "allocated_cost": allocation["allocated_cost"][r, g].item(),
+                        }
+                        for r, rt in enumerate(self.room_types)
+                    },
+                }
+                for g, cg in enumerate(self.cost_groups)
+            },
+            "unclassified_spaces": {str(n): a.item() for n, a in zip(unclassified["name"], unclassified["area"])},
+        }
+        scalars = self.manifest["cost_scalars"]
+        # Keep the key order written by roomtype_cost.build_summary
+        order = ["Total summed area", "calculated_total_cost", "calculated_unit_price",
+                 "per_room_type", "per_cost_group", "unclassified_spaces"]
+        result = {k: (tables[k] if k in tables else scalars[k]) for k in order if k in tables or k in scalars}
+        result.update({k: v for k, v in scalars.items() if k not in result})
+        return result
+
+
+def load_columnar(path: str | Path, mmap: bool = True) -> ColumnarResult:
+    """Open a columnar result (output dir or its columnar/ subdir)."""
+    return ColumnarResult(path, mmap)
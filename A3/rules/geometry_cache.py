@@ -0,0 +1,76 @@
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Dict
+
+
+DEFAULT_DB = Path("Output/cache/geometry_areas.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS footprints (
+    project     TEXT NOT NULL,      -- GlobalId of the IfcProject, shared by the revisions of a model
+    global_id   TEXT NOT NULL,
+    signature   TEXT NOT NULL,      -- shape and placement hash (A3_Tool._geometry_signature)
+    area        REAL NOT NULL,
+    PRIMARY KEY (project, global_id)
+) WITHOUT ROWID;
+"""
+
+
+def project_key(model) -> str:
+    """GlobalId of the model's IfcProject ("" if it has none)."""
+    projects = model.by_type("IfcProject")
+    return projects[0].GlobalId if projects else ""
+
+
+class GeometryCache:
+    """
+    SQLite store of the footprints computed by A3_Tool.compute_footprints.
+
+    Entries are grouped per project. A run loads the entries of its project
+    as the dict compute_footprints reads and updates, and afterwards writes
+    back only what it added or changed and deletes what its model no longer
+    references, in one transaction. Concurrent batch workers therefore merge
+    their entries instead of overwriting each other's, no run rewrites the
+    whole store, and each project only keeps what its latest revision uses.
+    A connection is opened per call (WAL mode), as in rules/history.py.
+    """
+
+    def __init__(self, db_path: str | Path = DEFAULT_DB) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def load(self, project: str) -> Dict[str, Dict]:
+        """GlobalId -> {"signature", "area"} for every stored footprint of a project."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT global_id, signature, area FROM footprints WHERE project = ?", (project,)
+            ).fetchall()
+        return {global_id: {"signature": signature, "area": area} for global_id, signature, area in rows}
+
+    def update(self, project: str, entries: Dict[str, Dict], loaded: Dict[str, Dict]) -> int:
+        """
+        Make entries (GlobalId -> {"signature", "area"}, the footprints the
+        current model references) the project's cache. loaded is what load
+        returned for this run: entries that differ from it are written, and
+        the loaded entries missing from entries are deleted. Entries another
+        process stored in the meantime are kept.
+
+        Returns the number of rows written or deleted.
+        """
+        changed = [
+            (project, global_id, entry["signature"], entry["area"])
+            for global_id, entry in entries.items() if loaded.get(global_id) != entry
+        ]
+        stale = [(project, global_id) for global_id in loaded if global_id not in entries]
+        if changed or stale:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany("INSERT OR REPLACE INTO footprints VALUES (?, ?, ?, ?)", changed)
+                conn.executemany("DELETE FROM footprints WHERE project = ? AND global_id = ?", stale)
+        return len(changed) + len(stale)
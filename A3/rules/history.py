@@ -0,0 +1,402 @@
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rules.cache import hash_file, hash_json, make_key
+
+
+DEFAULT_DB = Path("Output/history.sqlite")
+_DEFAULT_CONFIG_DIR = Path(__file__).resolve().parent.parent / "data"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id              INTEGER PRIMARY KEY,
+    result_key      TEXT NOT NULL UNIQUE,   -- model, config and options hash: one row per distinct result
+    created_at      REAL NOT NULL,          -- unix time
+    model_hash      TEXT NOT NULL,
+    model_name      TEXT,
+    config_hash     TEXT NOT NULL,
+    classify_hash   TEXT NOT NULL,          -- room types + keywords
+    rates_hash      TEXT NOT NULL,
+    weights_hash    TEXT NOT NULL,
+    options_hash    TEXT NOT NULL,          -- extraction options and price source
+    options         TEXT,                   -- the options as JSON
+    weights_source  TEXT,
+    config_dir      TEXT,
+    source          TEXT,                   -- "app", "batch", "incremental", "cli"
+    label           TEXT,
+    total_area      REAL,
+    total_cost      REAL,
+    unit_price      REAL,
+    unclassified_area REAL
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model_hash, created_at);
+CREATE INDEX IF NOT EXISTS runs_model_name ON runs (model_name, created_at);
+CREATE INDEX IF NOT EXISTS runs_config ON runs (config_hash, created_at);
+CREATE INDEX IF NOT EXISTS runs_weights ON runs (weights_hash, created_at);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created_at);
+
+-- Every time a result was recorded (the result itself is stored once in runs)
+CREATE TABLE IF NOT EXISTS recordings (
+    run_id          INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    recorded_at     REAL NOT NULL,          -- unix time
+    source          TEXT,
+    label           TEXT
+);
+CREATE INDEX IF NOT EXISTS recordings_run ON recordings (run_id, recorded_at);
+
+CREATE TABLE IF NOT EXISTS room_type_results (
+    run_id          INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    room_type       TEXT NOT NULL,
+    area            REAL,
+    allocated_cost  REAL,
+    unit_price      REAL,
+    PRIMARY KEY (run_id, room_type)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS room_type_results_type ON room_type_results (room_type, run_id);
+
+CREATE TABLE IF NOT EXISTS cost_group_results (
+    run_id          INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    cost_group      TEXT NOT NULL,
+    rate_per_m2     REAL,
+    total_cost      REAL,
+    PRIMARY KEY (run_id, cost_group)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cost_group_results_group ON cost_group_results (cost_group, run_id);
+
+CREATE TABLE IF NOT EXISTS allocations (
+    run_id          INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    room_type       TEXT NOT NULL,
+    cost_group      TEXT NOT NULL,
+    share           REAL,
+    allocated_cost  REAL,
+    PRIMARY KEY (run_id, room_type, cost_group)
+) WITHOUT ROWID;
+"""
+
+_RUN_COLUMNS = (
+    "id", "created_at", "model_hash", "model_name", "config_hash", "classify_hash", "rates_hash",
+    "weights_hash", "options_hash", "options", "weights_source", "config_dir", "source", "label",
+    "total_area", "total_cost", "unit_price", "unclassified_area",
+)
+
+
+def config_hashes(config: Dict) -> Dict[str, str]:
+    """Hashes of the parts of a roomtype_cost config that change the result."""
+    hashes = {
+        "classify_hash": make_key(hash_json(config["room_types"]), hash_json(config["space_keywords"])),
+        "rates_hash": hash_json(config["cost_rates"]),
+        "weights_hash": hash_json(config["weights"]),
+    }
+    hashes["config_hash"] = make_key(hashes["classify_hash"], hashes["rates_hash"], hashes["weights_hash"])
+    return hashes
+
+
+class RunHistory:
+    """
+    SQLite store of cost results, one row per distinct (model, config, options).
+
+    Every run keeps its totals, the per-room-type and per-cost-group
+    results and the allocation matrix, so trends, diffs and cross-model
+    comparisons are plain indexed queries. A run's created_at is when the
+    result was first recorded; each later recording of the same result
+    only adds a row (time, source, label) to the recordings table. A connection is opened per
+    call (WAL mode), so the store can be shared by Streamlit threads and
+    batch worker processes.
+    """
+
+    def __init__(self, db_path: str | Path = DEFAULT_DB) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    # ---------- writing ----------
+
+    def record_run(
+        self,
+        summary: Dict,
+        model_hash: str,
+        config: Dict,
+        model_name: str | None = None,
+        source: str = "cli",
+        label: str | None = None,
+        created_at: float | None = None,
+        options: Dict | None = None,
+    ) -> int:
+        """
+        Store one cost summary (roomtype_cost.build_summary) and return its run id.
+
+        options are the settings besides the config that change the result
+        (CostPipeline.run_options: geometry fallback, price source). The
+        same model with the same config and options gives the same result,
+        so it is stored once; recording it again only adds a recording (see
+        run()["recordings"]) and returns the existing run id.
+        """
+        hashes = config_hashes(config)
+        options = options or {}
+        options_hash = hash_json(options)
+        result_key = make_key(model_hash, hashes["config_hash"], options_hash)
+        per_room_type = summary.get("per_room_type", {})
+        per_cost_group = summary.get("per_cost_group", {})
+
+        recorded_at = created_at or time.time()
+        with closing(self._connect()) as conn, conn:
+            # OR IGNORE: another process may record the same result concurrently
+            cursor = conn.execute(
+                """INSERT OR IGNORE INTO runs (result_key, created_at, model_hash, model_name, config_hash, classify_hash,
+                                     rates_hash, weights_hash, options_hash, options, weights_source, config_dir,
+                                     source, label, total_area, total_cost, unit_price, unclassified_area)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    result_key, recorded_at, model_hash, model_name, hashes["config_hash"],
+                    hashes["classify_hash"], hashes["rates_hash"], hashes["weights_hash"],
+                    options_hash, json.dumps(options, sort_keys=True),
+                    summary.get("weights_source", config.get("weights_source")),
+                    summary.get("config_directory_used", config.get("config_directory_used")),
+                    source, label,
+                    summary.get("Total summed area"), summary.get("calculated_total_cost"),
+                    summary.get("calculated_unit_price"), sum(summary.get("unclassified_spaces", {}).values()),
+                ),
+            )
+            if cursor.rowcount == 0:
+                run_id = conn.execute("SELECT id FROM runs WHERE result_key = ?", (result_key,)).fetchone()["id"]
+                conn.execute("INSERT INTO recordings VALUES (?, ?, ?, ?)", (run_id, recorded_at, source, label))
+                return run_id
+            run_id = cursor.lastrowid
+            conn.execute("INSERT INTO recordings VALUES (?, ?, ?, ?)", (run_id, recorded_at, source, label))
+            conn.executemany(
+                "INSERT INTO room_type_results VALUES (?, ?, ?, ?, ?)",
+                [(run_id, rt, v["area"], v["allocated_cost"], v["unit_price"]) for rt, v in per_room_type.items()],
+            )
+            conn.executemany(
+                "INSERT INTO cost_group_results VALUES (?, ?, ?, ?)",
+                [(run_id, cg, v["rate_per_m2"], v["total_cost"]) for cg, v in per_cost_group.items()],
+            )
+            conn.executemany(
+                "INSERT INTO allocations VALUES (?, ?, ?, ?, ?)",
+                [
+                    (run_id, rt, cg, a["share"], a["allocated_cost"])
+                    for cg, v in per_cost_group.items()
+                    for rt, a in v.get("allocation", {}).items()
+                ],
+            )
+        return run_id
+
+    def delete_run(self, run_id: int) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+    # ---------- queries ----------
+
+    def runs(
+        self,
+        model_hash: str | None = None,
+        model_name: str | None = None,
+        config_hash: str | None = None,
+        weights_hash: str | None = None,
+        limit: int | None = 100,
+    ) -> List[Dict]:
+        """Runs (newest first), optionally only those of one model and/or config."""
+        where, params = [], []
+        for column, value in (("model_hash", model_hash), ("model_name", model_name),
+                              ("config_hash", config_hash), ("weights_hash", weights_hash)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        sql = f"SELECT {', '.join(_RUN_COLUMNS)} FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def models(self) -> List[Dict]:
+        """Recorded models (one row per model hash) with their number of runs, latest first."""
+        sql = """SELECT model_hash, MAX(model_name) AS model_name, COUNT(*) AS runs, MAX(created_at) AS last_run
+                 FROM runs GROUP BY model_hash ORDER BY last_run DESC"""
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql)]
+
+    def run(self, run_id: int) -> Dict | None:
+        """
+        One run with its per_room_type and per_cost_group results (summary
+        layout) and its recordings (oldest first).
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(f"SELECT {', '.join(_RUN_COLUMNS)} FROM runs WHERE id = ?", (run_id,)).fetchone()
+            if row is None:
+                return None
+            run = dict(row)
+            run["per_room_type"] = {
+                r["room_type"]: {"area": r["area"], "allocated_cost": r["allocated_cost"], "unit_price": r["unit_price"]}
+                for r in conn.execute("SELECT * FROM room_type_results WHERE run_id = ? ORDER BY room_type", (run_id,))
+            }
+            run["per_cost_group"] = {
+                r["cost_group"]: {"rate_per_m2": r["rate_per_m2"], "total_cost": r["total_cost"]}
+                for r in conn.execute("SELECT * FROM cost_group_results WHERE run_id = ? ORDER BY cost_group", (run_id,))
+            }
+            run["recordings"] = [
+                dict(r) for r in conn.execute(
+                    "SELECT recorded_at, source, label FROM recordings WHERE run_id = ? ORDER BY recorded_at", (run_id,)
+                )
+            ]
+        return run
+
+    def room_type_trend(self, room_type: str, model_name: str | None = None, model_hash: str | None = None) -> List[Dict]:
+        """Area, allocated cost and unit price of one room type over time (oldest first)."""
+        sql = """SELECT runs.id AS run_id, runs.created_at, runs.model_name, runs.weights_source,
+                        r.area, r.allocated_cost, r.unit_price
+                 FROM room_type_results AS r JOIN runs ON runs.id = r.run_id
+                 WHERE r.room_type = ?"""
+        params: List = [room_type]
+        if model_name is not None:
+            sql += " AND runs.model_name = ?"
+            params.append(model_name)
+        if model_hash is not None:
+            sql += " AND runs.model_hash = ?"
+            params.append(model_hash)
+        sql += " ORDER BY runs.created_at"
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def compare(self, run_ids: Sequence[int], field: str = "unit_price") -> Dict[str, Dict[int, float]]:
+        """Room type -> {run id: field} for several runs (e.g. several models with one config)."""
+        if field not in ("area", "allocated_cost", "unit_price"):
+            raise ValueError(f"Unknown room type field: {field}")
+        placeholders = ", ".join("?" * len(run_ids))
+        result: Dict[str, Dict[int, float]] = {}
+        with closing(self._connect()) as conn:
+            for row in conn.execute(
+                f"SELECT run_id, room_type, {field} FROM room_type_results WHERE run_id IN ({placeholders})",
+                list(run_ids),
+            ):
+                result.setdefault(row["room_type"], {})[row["run_id"]] = row[field]
+        return result
+
+    def diff(self, run_a: int, run_b: int) -> Dict:
+        """
+        Changes from run_a to run_b: totals, and per room type and per cost
+        group (missing entries count as 0).
+        """
+        a, b = self.run(run_a), self.run(run_b)
+        if a is None or b is None:
+            raise KeyError(f"Unknown run id: {run_a if a is None else run_b}")
+
+        def delta(old: Dict, new: Dict, fields: Sequence[str]) -> Dict:
+            rows = {}
+            for key in list(old) + [k for k in new if k not in old]:
+                before, after = old.get(key, {}), new.get(key, {})
+                rows[key] = {
+                    field: {"before": before.get(field, 0.0), "after": after.get(field, 0.0),
+                            "delta": after.get(field, 0.0) - before.get(field, 0.0)}
+                    for field in fields
+                }
+            return rows
+
+        return {
+            "runs": {"before": {k: a[k] for k in _RUN_COLUMNS}, "after": {k: b[k] for k in _RUN_COLUMNS}},
+            "same_model": a["model_hash"] == b["model_hash"],
+            "changed_config": [k for k in ("classify_hash", "rates_hash", "weights_hash", "options_hash") if a[k] != b[k]],
+            "totals": {
+                field: {"before": a[field], "after": b[field], "delta": (b[field] or 0.0) - (a[field] or 0.0)}
+                for field in ("total_area", "total_cost", "unit_price", "unclassified_area")
+            },
+            "per_room_type": delta(a["per_room_type"], b["per_room_type"], ("area", "allocated_cost", "unit_price")),
+            "per_cost_group": delta(a["per_cost_group"], b["per_cost_group"], ("rate_per_m2", "total_cost")),
+        }
+
+
+# =======================================================
+# CLI ENTRY POINT
+# =======================================================
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Query the cost run history.")
+    parser.add_argument("--db", default=str(DEFAULT_DB), help="History database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("models", help="List the recorded models.")
+
+    runs = commands.add_parser("runs", help="List runs, newest first.")
+    runs.add_argument("--model", default=None, help="Only runs of this model name (IFC file name).")
+    runs.add_argument("--limit", type=int, default=20)
+
+    show = commands.add_parser("show", help="Show one run.")
+    show.add_argument("run_id", type=int)
+
+    diff = commands.add_parser("diff", help="Compare two runs.")
+    diff.add_argument("run_a", type=int)
+    diff.add_argument("run_b", type=int)
+
+    trend = commands.add_parser("trend", help="One room type over time.")
+    trend.add_argument("room_type")
+    trend.add_argument("--model", default=None, help="Only runs of this model name.")
+
+    compare = commands.add_parser("compare", help="Room types of several runs side by side.")
+    compare.add_argument("run_ids", type=int, nargs="+")
+    compare.add_argument("--field", default="unit_price", choices=["area", "allocated_cost", "unit_price"])
+
+    record = commands.add_parser("record", help="Record an existing cost JSON.")
+    record.add_argument("cost_json", help="Output of roomtype_cost.process_json.")
+    record.add_argument("--ifc", required=True, help="The IFC model the cost JSON was computed from.")
+    record.add_argument("--config-dir", default=None, help="Config directory used (default: as stored in the cost JSON).")
+    record.add_argument("--weights", default=None, help="Custom weights file used.")
+    record.add_argument("--price-rates", default=None, metavar="CSV_OR_DIR", help="Price CSVs the cost rates were derived from.")
+    record.add_argument("--no-geometry", action="store_true", help="The run did not compute missing areas from the geometry.")
+    record.add_argument("--label", default=None)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    history = RunHistory(args.db)
+
+    if args.command == "models":
+        result = history.models()
+    elif args.command == "runs":
+        result = history.runs(model_name=args.model, limit=args.limit)
+    elif args.command == "show":
+        result = history.run(args.run_id)
+    elif args.command == "diff":
+        result = history.diff(args.run_a, args.run_b)
+    elif args.command == "trend":
+        result = history.room_type_trend(args.room_type, model_name=args.model)
+    elif args.command == "compare":
+        result = history.compare(args.run_ids, args.field)
+    else:
+        # Only "record" needs the pipeline (config and run options); the rules package does not depend on it
+        from pipeline import CostPipeline
+
+        with open(args.cost_json, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+        pipeline = CostPipeline(
+            args.config_dir or summary.get("config_directory_used", _DEFAULT_CONFIG_DIR), args.weights,
+            geometry_fallback=not args.no_geometry, price_files=args.price_rates,
+        )
+        ifc_path = Path(args.ifc)
+        run_id = history.record_run(summary, hash_file(ifc_path), pipeline.load_config(), model_name=ifc_path.name,
+                                    source="cli", label=args.label, options=pipeline.run_options())
+        result = {"run_id": run_id}
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
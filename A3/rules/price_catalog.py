@@ -0,0 +1,317 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+DEFAULT_CACHE_DIR = Path("Output/cache")
+FORMAT = "a3-price-catalog"
+VERSION = 1
+
+# Columns of the price CSVs (Molio export: "Nr.;Tekst;Kategori;Enhed;Mængde;Pris")
+CODE, TEXT, CATEGORY, UNIT, QUANTITY, PRICE = "Nr.", "Tekst", "Kategori", "Enhed", "Mængde", "Pris"
+
+# (resolved paths) -> (file signatures, catalog)
+_CATALOGS: Dict[Tuple[str, ...], Tuple[List, "PriceCatalog"]] = {}
+_LOCK = threading.Lock()
+
+
+# =======================================================
+# PARSING
+# =======================================================
+
+def parse_danish_number(text: str | None) -> float:
+    """
+    "1.222,96" -> 1222.96 ("." thousands separator, "," decimal comma).
+
+    Empty or malformed values give 0.0, as A3_Tool.aggregate_price_values does.
+    """
+    text = (text or "").strip().replace(".", "").replace(",", ".")
+    try:
+        return float(text) if text else 0.0
+    except ValueError:
+        return 0.0
+
+
+def base_code(code: str) -> str:
+    """Nr. without its variant suffix: "05.36.95,02" -> "05.36.95"."""
+    return code.split(",", 1)[0].strip()
+
+
+def _read_rows(paths: Sequence[Path]) -> Dict[str, list]:
+    columns: Dict[str, list] = {"code": [], "text": [], "category": [], "unit": [], "quantity": [], "price": []}
+    for path in paths:
+        # utf-8-sig: the Molio export starts with a BOM
+        with open(path, mode="r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f, delimiter=";"):
+                columns["code"].append((row.get(CODE) or "").strip())
+                columns["text"].append((row.get(TEXT) or "").strip())
+                columns["category"].append((row.get(CATEGORY) or "").strip())
+                columns["unit"].append((row.get(UNIT) or "").strip())
+                columns["quantity"].append(parse_danish_number(row.get(QUANTITY)))
+                columns["price"].append(parse_danish_number(row.get(PRICE)))
+    return columns
+
+
+def _signature(paths: Sequence[Path]) -> List[List]:
+    # [path, mtime_ns, size] per file, compared to decide whether the compiled store is stale
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append([str(path), stat.st_mtime_ns, stat.st_size])
+    return signature
+
+
+# =======================================================
+# CATALOG
+# =======================================================
+
+class PriceCatalog:
+    """
+    Price items of one or more price CSVs, stored column-wise.
+
+    Items are indexed by Nr. (both the full code "05.36.95,02" and the
+    base code "05.36.95") and by Kategori, so lookups never scan the rows.
+    Prices are per unit (m2 for the Molio building part prices).
+    """
+
+    def __init__(self, columns: Dict[str, list], sources: List[List] | None = None) -> None:
+        self.codes: List[str] = list(columns["code"])
+        self.texts: List[str] = list(columns["text"])
+        self.categories: List[str] = list(columns["category"])
+        self.units: List[str] = list(columns["unit"])
+        self.quantities = np.asarray(columns["quantity"], dtype=np.float64)
+        self.prices = np.asarray(columns["price"], dtype=np.float64)
+        self.sources = sources or []
+
+        self.by_code: Dict[str, List[int]] = {}
+        self.by_category: Dict[str, List[int]] = {}
+        for i, code in enumerate(self.codes):
+            self.by_code.setdefault(code, []).append(i)
+            base = base_code(code)
+            if base != code:
+                self.by_code.setdefault(base, []).append(i)
+            self.by_category.setdefault(self.categories[i], []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    # ---------- lookups ----------
+
+    def item(self, i: int) -> Dict:
+        return {
+            "code": self.codes[i],
+            "text": self.texts[i],
+            "category": self.categories[i],
+            "unit": self.units[i],
+            "quantity": float(self.quantities[i]),
+            "price": float(self.prices[i]),
+        }
+
+    def items(self, code: str | None = None, category: str | None = None) -> List[Dict]:
+        """Items with the given Nr. (full or base code) and/or Kategori."""
+        if code is None and category is None:
+            rows: Iterable[int] = range(len(self))
+        elif category is None:
+            rows = self.by_code.get(code, [])
+        elif code is None:
+            rows = self.by_category.get(category, [])
+        else:
+            rows = sorted(set(self.by_code.get(code, [])) & set(self.by_category.get(category, [])))
+        return [self.item(i) for i in rows]
+
+    def price(self, code: str, default: float | None = None) -> float | None:
+        """Summed price of the items with this Nr. (full or base code)."""
+        rows = self.by_code.get(code)
+        if not rows:
+            return default
+        return float(self.prices[rows].sum())
+
+    def category_total(self, category: str) -> float:
+        rows = self.by_category.get(category, [])
+        return float(self.prices[rows].sum()) if rows else 0.0
+
+    def price_per_sqm(self) -> float:
+        """Sum of all prices (same value as A3_Tool.aggregate_price_values)."""
+        return round(float(self.prices.sum()), 4)
+
+    # ---------- derived rates ----------
+
+    def cost_group_name(self, code: str) -> str:
+        """Default cost group name of a base code: "05.36.90 Ventilation"."""
+        text = self.texts[self.by_code[code][0]]
+        return f"{code} {text.split(',', 1)[0].strip()}"
+
+    def cost_rates(self, cost_groups: Sequence[str] | None = None) -> Dict[str, float]:
+        """
+        Rates per m2 in the cost_rates.json format, one per base code.
+
+        cost_groups:
+          existing cost group names ("05.19.01 Vandinst", e.g. the keys of a
+          weights matrix). Each name is matched to the catalog by the Nr.
+          it starts with, so the names used by the weights are kept; names
+          without a catalog item are left out. Without cost_groups every
+          base code gets a name from cost_group_name.
+        """
+        if cost_groups is None:
+            codes = list(dict.fromkeys(base_code(code) for code in self.codes if code))
+            return {self.cost_group_name(code): self.price(code) for code in codes}
+        rates = {}
+        for name in cost_groups:
+            price = self.price(name.split(" ", 1)[0])
+            if price is not None:
+                rates[name] = price
+        return rates
+
+    def digest(self) -> str:
+        """Content hash of the catalog (changes only when an item changes)."""
+        text = json.dumps(self.to_dict()["columns"], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    # ---------- compiled store ----------
+
+    def to_dict(self) -> Dict:
+        return {
+            "format": FORMAT,
+            "version": VERSION,
+            "sources": self.sources,
+            "columns": {
+                "code": self.codes,
+                "text": self.texts,
+                "category": self.categories,
+                "unit": self.units,
+                "quantity": self.quantities.tolist(),
+                "price": self.prices.tolist(),
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PriceCatalog":
+        if data.get("format") != FORMAT or data.get("version") != VERSION:
+            raise ValueError("Unsupported price catalog store")
+        return cls(data["columns"], data["sources"])
+
+    @classmethod
+    def from_csv_files(cls, paths: Sequence[str | Path]) -> "PriceCatalog":
+        paths = [Path(p).resolve() for p in paths]
+        return cls(_read_rows(paths), _signature(paths))
+
+
+# =======================================================
+# LOADING (CACHED)
+# =======================================================
+
+def find_price_files(path: str | Path) -> List[Path]:
+    """The price CSVs of a folder (sorted), or the file itself."""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(p for p in path.glob("*.csv") if p.is_file())
+    return [path]
+
+
+def _store_path(cache_dir: Path, paths: Sequence[Path]) -> Path:
+    name = hashlib.sha256("|".join(str(p) for p in paths).encode("utf-8")).hexdigest()[:16]
+    return cache_dir / f"price_catalog_{name}.json"
+
+
+def load_catalog(
+    path: str | Path | Sequence[str | Path],
+    cache_dir: str | Path | None = DEFAULT_CACHE_DIR,
+) -> PriceCatalog:
+    """
+    Price catalog of a folder of price CSVs (or of the given CSV files).
+
+    The CSVs are parsed once: the compiled catalog is kept in memory and
+    as a JSON store in cache_dir (None: memory only), and both are reused
+    until a CSV is added, removed or changes mtime/size. Only the files
+    are stat'ed on a cache hit.
+    """
+    if isinstance(path, (str, Path)):
+        paths = [p.resolve() for p in find_price_files(path)]
+    else:
+        paths = [Path(p).resolve() for p in path]
+    key = tuple(str(p) for p in paths)
+    signature = _signature(paths)
+
+    with _LOCK:
+        cached = _CATALOGS.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    catalog = None
+    store = _store_path(Path(cache_dir), paths) if cache_dir is not None else None
+    if store is not None and store.exists():
+        try:
+            with open(store, "r", encoding="utf-8") as f:
+                catalog = PriceCatalog.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            catalog = None
+        if catalog is not None and catalog.sources != signature:
+            catalog = None
+
+    if catalog is None:
+        catalog = PriceCatalog.from_csv_files(paths)
+        if store is not None:
+            store.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = store.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(catalog.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp_path, store)
+
+    with _LOCK:
+        _CATALOGS[key] = (signature, catalog)
+    return catalog
+
+
+# =======================================================
+# CLI ENTRY POINT
+# =======================================================
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compile price CSVs into a cached catalog and derive cost rates per m2."
+    )
+    parser.add_argument("path", help="Price CSV file or folder with price CSVs.")
+    parser.add_argument(
+        "--names-from",
+        default=None,
+        help="cost_rates.json or weights JSON whose cost group names should be kept.",
+    )
+    parser.add_argument("--output", default=None, help="Write the rates here (cost_rates.json format).")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="Compiled catalog store.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    catalog = load_catalog(args.path, args.cache_dir)
+
+    cost_groups = None
+    if args.names_from:
+        with open(args.names_from, "r", encoding="utf-8") as f:
+            names = json.load(f)
+        # Weights matrix (room type -> cost group -> weight) or flat cost_rates.json
+        if all(isinstance(v, dict) for v in names.values()):
+            cost_groups = list(dict.fromkeys(cg for row in names.values() for cg in row))
+        else:
+            cost_groups = list(names)
+
+    rates = catalog.cost_rates(cost_groups)
+    text = json.dumps(rates, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Wrote {len(rates)} cost rates to {args.output}")
+    else:
+        print(text)
+    print(f"{len(catalog)} items, {len(catalog.by_category)} categories, {catalog.price_per_sqm():,.2f} per m2 in total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict
+
+import ifcopenshell.util.element
+
+from external.BIManalyst_g_48.A3 import A3_Tool  # PsetIndex, the pipeline's property set lookup
+
+
+class Profiler:
+    """
+    Lightweight stage instrumentation for the extraction/cost pipeline.
+
+    Use as (activation may be nested, only the outermost one patches):
+
+        profiler = Profiler(enabled=True)
+        with profiler:                       # counts property set lookups while active
+            with profiler.stage("extract_spaces") as stage:
+                rows = A3_Tool.extract_space_quantities(model)
+                stage["elements"] = len(rows)
+        profiler.report()
+
+    Per stage it records wall time, element count (if set), the number
+    of property set lookups, the number of property definitions resolved
+    and peak Python heap memory (tracemalloc, only when track_memory is
+    True). Stages should not be nested.
+
+    - get_psets_calls: calls of A3_Tool.PsetIndex.get_psets (the
+      pipeline's lookup) and of ifcopenshell.util.element.get_psets; a
+      PsetIndex falling back to get_psets counts once.
+    - pset_resolutions: calls of get_property_definition, i.e. property
+      definitions actually read from the model. A PsetIndex resolves each
+      shared definition once, so this stays far below get_psets_calls.
+
+    When disabled, stage() yields a throwaway dict and nothing is patched
+    or traced, so the overhead is a context manager call per stage.
+
+    The functions are counted by temporarily replacing the module and
+    class attributes, which is process-wide: concurrent runs in other
+    threads are counted too.
+    """
+
+    def __init__(self, enabled: bool = False, track_memory: bool = True) -> None:
+        self.enabled = enabled
+        self.track_memory = track_memory
+        self.stages: Dict[str, Dict] = {}
+        self.get_psets_calls = 0
+        self.pset_resolutions = 0
+        self._originals = None
+        self._lookup_depth = 0
+        self._started_tracemalloc = False
+        self._depth = 0
+
+    def reset(self) -> None:
+        """Forget recorded stages, e.g. before profiling the next model."""
+        self.stages = {}
+        self.get_psets_calls = 0
+        self.pset_resolutions = 0
+
+    # ---------- activation ----------
+
+    def __enter__(self) -> "Profiler":
+        # Re-entering (e.g. the app and the pipeline both activating) is a no-op
+        self._depth += 1
+        if not self.enabled or self._depth > 1:
+            return self
+        util = ifcopenshell.util.element
+        self._originals = (util.get_psets, A3_Tool.PsetIndex.get_psets, util.get_property_definition)
+        util.get_psets = self._counting_lookup(util.get_psets)
+        A3_Tool.PsetIndex.get_psets = self._counting_lookup(A3_Tool.PsetIndex.get_psets)
+        util.get_property_definition = self._counting_resolution(util.get_property_definition)
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._depth -= 1
+        if self._depth > 0:
+            return
+        if self._originals is not None:
+            util = ifcopenshell.util.element
+            util.get_psets, A3_Tool.PsetIndex.get_psets, util.get_property_definition = self._originals
+            self._originals = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _counting_lookup(self, function):
+        # Nested lookups (PsetIndex -> get_psets, get_psets -> get_psets) count once
+        def counting(*args, **kwargs):
+            if self._lookup_depth == 0:
+                self.get_psets_calls += 1
+            self._lookup_depth += 1
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._lookup_depth -= 1
+        return counting
+
+    def _counting_resolution(self, function):
+        def counting(*args, **kwargs):
+            self.pset_resolutions += 1
+            return function(*args, **kwargs)
+        return counting
+
+    # ---------- stages ----------
+
+    @contextmanager
+    def stage(self, name: str):
+        """Measure one stage. The yielded dict can be given an 'elements' count."""
+        info: Dict = {}
+        if not self.enabled:
+            yield info
+            return
+
+        tracing = tracemalloc.is_tracing() and self.track_memory
+        if tracing:
+            tracemalloc.reset_peak()
+        calls_before = self.get_psets_calls
+        resolutions_before = self.pset_resolutions
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            info["wall_time_s"] = time.perf_counter() - start
+            info["get_psets_calls"] = self.get_psets_calls - calls_before
+            info["pset_resolutions"] = self.pset_resolutions - resolutions_before
+            if tracing:
+                info["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+            self.stages[name] = info
+
+    def report(self) -> Dict:
+        """Return the recorded stages as a JSON-serialisable dict."""
+        return {
+            "enabled": self.enabled,
+            "total_wall_time_s": sum(s["wall_time_s"] for s in self.stages.values()),
+            "total_get_psets_calls": self.get_psets_calls,
+            "total_pset_resolutions": self.pset_resolutions,
+            "stages": dict(self.stages),
+        }
+
+
+# Shared disabled instance for callers that do not profile
+DISABLED = Profiler(enabled=False)
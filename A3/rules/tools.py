@@ -1,4 +1,5 @@
 import os, json
+from collections import Counter
 import ifcopenshell
 import sys
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -9,7 +10,7 @@ for path in [project_root, os.path.join(project_root, "external")]:
         sys.path.append(path)   
 
 # Analyst group imports here
-from external.BIManalyst_g_48.rules import SpaceRequirement
+from external.BIManalyst_g_48.A3 import A3_Tool
 
 
 def _ensure_dir(path: str):
@@ -19,17 +20,13 @@ def _ensure_dir(path: str):
 
 
 
-def get_project_overview(model, output_path="data/project_overview.json"):
-    proj  = (model.by_type("IfcProject") or [None])[0]
-    site  = (model.by_type("IfcSite") or [None])[0]
-    bldg  = (model.by_type("IfcBuilding") or [None])[0]
-
+def _overview(model, proj, site, bldg):
     # header
-    hdr = model.wrapped_data.header
+    hdr = model.header
     file_name = hdr.file_name
     file_desc = hdr.file_description
 
-    data = {
+    return {
         "file": {
             "schema": model.schema,
             "name": getattr(file_name, "name", None),
@@ -43,9 +40,20 @@ def get_project_overview(model, output_path="data/project_overview.json"):
         "building":{"name": getattr(bldg, "Name", None), "global_id": getattr(bldg, "GlobalId", None)},
     }
 
+
+def _write_json(data, output_path):
     _ensure_dir(output_path)
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def get_project_overview(model, output_path="data/project_overview.json"):
+    proj  = (model.by_type("IfcProject") or [None])[0]
+    site  = (model.by_type("IfcSite") or [None])[0]
+    bldg  = (model.by_type("IfcBuilding") or [None])[0]
+
+    data = _overview(model, proj, site, bldg)
+    _write_json(data, output_path)
     return data
 
 
@@ -60,16 +68,13 @@ def get_element_counts(model, output_path="data/element_counts.json"):
         del counts["IfcWallStandardCase"]
 
     data = {"counts": counts, "total_elements": sum(counts.values())}
-    _ensure_dir(output_path)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    _write_json(data, output_path)
     return data
 
 
 
 
-def get_ftf_heights(model, output_path="data/ftf_heights.json"):
-    storeys = model.by_type("IfcBuildingStorey")
+def _ftf_heights(storeys):
     rows = []
     total = 0.0
 
@@ -86,9 +91,163 @@ def get_ftf_heights(model, output_path="data/ftf_heights.json"):
         heights.append({"From": a["Name"], "To": b["Name"], "Height": round(ftf, 3)})
         total += abs(ftf)
 
-    data = {"Storeys": rows, "FloorToFloorHeights": heights, "TotalBuildingHeight_m": round(total, 3)}
+    return {"Storeys": rows, "FloorToFloorHeights": heights, "TotalBuildingHeight_m": round(total, 3)}
 
-    _ensure_dir(output_path)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+
+def get_ftf_heights(model, output_path="data/ftf_heights.json"):
+    data = _ftf_heights(model.by_type("IfcBuildingStorey"))
+    _write_json(data, output_path)
+    return data
+
+
+
+
+# -------------------------------------------------------
+# MODEL CENSUS (one pass over all entities)
+# -------------------------------------------------------
+
+def _subclasses(schema, root):
+    # Names of root and all its subtypes in the schema
+    names = set()
+    todo = [schema.declaration_by_name(root)]
+    while todo:
+        decl = todo.pop()
+        names.add(decl.name())
+        todo.extend(decl.subtypes())
+    return names
+
+
+def _rollup(schema, counts):
+    # Add the count of every class to all its supertypes
+    rolled = Counter()
+    for cls, n in counts.items():
+        decl = schema.declaration_by_name(cls)
+        while decl is not None:
+            rolled[decl.name()] += n
+            decl = decl.supertype()
+    return rolled
+
+
+def _new_bucket():
+    return {"element_counts": Counter(), "elements": 0, "spaces": 0, "space_area": 0.0,
+            "walls": 0, "wall_footprint": 0.0}
+
+
+def _finish_bucket(bucket):
+    bucket["element_counts"] = dict(bucket["element_counts"].most_common())
+    bucket["space_area"] = round(bucket["space_area"], 2)
+    bucket["wall_footprint"] = round(bucket["wall_footprint"], 2)
+    return bucket
+
+
+def model_census(model, output_path="data/model_census.json", rollup=False, quantities=None, pset_index=None):
+    """
+    Walk all entities of the model once and report:
+
+      - overview: file header, project, site and building
+      - counts:   number of instances of every IFC class (with rollup=True
+                  each class also includes its subtypes, e.g. IfcWall
+                  includes IfcWallStandardCase)
+      - storeys:  per IfcBuildingStorey (sorted by elevation) the number of
+                  elements per class, the number and NetFloorArea of spaces
+                  and the number and floor footprint of interior/exterior
+                  walls; elements not in any storey go to "unassigned"
+      - heights:  floor-to-floor heights (as get_ftf_heights)
+
+    Elements are placed through IfcRelContainedInSpatialStructure and
+    IfcRelAggregates (e.g. spaces aggregated into a storey, or panels of a
+    curtain wall contained in a storey). Space areas and wall footprints
+    use A3_Tool's rows, so per storey they add up to A3_Tool's totals. Pass
+    the A3_Tool quantity table as quantities (e.g. with areas filled from
+    the geometry) to reuse it; otherwise the rows are built here.
+
+    Everything is written to one JSON file at output_path.
+    """
+    schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(model.schema)
+    element_classes = _subclasses(schema, "IfcElement")
+    wall_classes = _subclasses(schema, "IfcWall")
+
+    counts = Counter()
+    parent = {}          # element id -> containing/aggregating entity
+    elements = []        # IfcElement and IfcSpace instances
+    storeys = []
+    firsts = {}          # first IfcProject/IfcSite/IfcBuilding
+
+    for entity in model:
+        cls = entity.is_a()
+        counts[cls] += 1
+        if cls in element_classes or cls == "IfcSpace":
+            elements.append(entity)
+        elif cls == "IfcRelContainedInSpatialStructure":
+            for obj in entity.RelatedElements:
+                parent[obj.id()] = entity.RelatingStructure
+        elif cls == "IfcRelAggregates":
+            for obj in entity.RelatedObjects:
+                # Containment wins over aggregation when an element has both
+                parent.setdefault(obj.id(), entity.RelatingObject)
+        elif cls == "IfcBuildingStorey":
+            storeys.append(entity)
+        elif cls in ("IfcProject", "IfcSite", "IfcBuilding"):
+            firsts.setdefault(cls, entity)
+
+    # Resolve the storey of every element by walking up the parent chain (memoized)
+    storey_of = {s.id(): s.id() for s in storeys}
+
+    def resolve(entity):
+        chain = []
+        while entity is not None and entity.id() not in storey_of:
+            chain.append(entity.id())
+            entity = parent.get(entity.id())
+        found = storey_of[entity.id()] if entity is not None else None
+        for i in chain:
+            storey_of[i] = found
+        return found
+
+    # Space areas and wall footprints from A3_Tool's rows, keyed by GlobalId
+    if quantities is None:
+        if pset_index is None:
+            pset_index = A3_Tool.build_pset_index(model)
+        space_rows = [A3_Tool.space_quantity_row(e, pset_index) for e in elements if e.is_a() == "IfcSpace"]
+        wall_rows = [A3_Tool.wall_quantity_row(e, pset_index) for e in elements if e.is_a() in wall_classes]
+    else:
+        space_rows, wall_rows = quantities["spaces"], quantities["walls"]
+    space_area = {r["GlobalId"]: r["NetFloorArea"] or 0.0 for r in space_rows}
+    wall_area = {r["GlobalId"]: A3_Tool.wall_footprint(r) for r in wall_rows if r is not None}
+
+    buckets = {s.id(): _new_bucket() for s in storeys}
+    unassigned = _new_bucket()
+    for element in elements:
+        storey = resolve(element)
+        bucket = buckets[storey] if storey is not None else unassigned
+        cls = element.is_a()
+        bucket["element_counts"][cls] += 1
+        bucket["elements"] += 1
+        if cls == "IfcSpace":
+            bucket["spaces"] += 1
+            bucket["space_area"] += space_area.get(element.GlobalId, 0.0)
+        elif element.GlobalId in wall_area:
+            bucket["walls"] += 1
+            bucket["wall_footprint"] += wall_area[element.GlobalId]
+
+    heights = _ftf_heights(storeys)
+    by_global_id = {s.GlobalId: s.id() for s in storeys}
+    storey_rows = [
+        {**row, **_finish_bucket(buckets[by_global_id[row["GlobalId"]]])}
+        for row in heights["Storeys"]
+    ]
+
+    class_counts = _rollup(schema, counts) if rollup else counts
+    data = {
+        "overview": _overview(model, firsts.get("IfcProject"), firsts.get("IfcSite"), firsts.get("IfcBuilding")),
+        "counts": {
+            "by_class": dict(class_counts.most_common()),
+            "rolled_up": rollup,
+            "total_entities": sum(counts.values()),
+            "total_elements": sum(n for cls, n in counts.items() if cls in element_classes),
+        },
+        "storeys": storey_rows,
+        "unassigned": _finish_bucket(unassigned),
+        "heights": heights,
+    }
+    _write_json(data, output_path)
     return data
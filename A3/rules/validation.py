@@ -0,0 +1,235 @@
+import argparse
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import ifcopenshell
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from external.BIManalyst_g_48.A3 import A3_Tool        # PsetIndex (one sweep over the property relationships)
+from external.BIManalyst_g_49 import roomtype_cost as rtc  # SpaceClassifier for the keyword check
+
+
+# What the downstream tools read, per A3_Tool quantity category:
+# (IFC class, name keywords an element needs to be used at all, set name, properties, qtos_only)
+REQUIREMENTS: Dict[str, Tuple[str, Tuple[str, ...], str, Tuple[str, ...], bool]] = {
+    "spaces": ("IfcSpace", (), "Qto_SpaceBaseQuantities", ("NetFloorArea",), True),
+    "walls": ("IfcWall", ("Interior", "Exterior"), "Qto_WallBaseQuantities", ("Length", "NetSideArea", "NetVolume"), True),
+    "curtain_walls": ("IfcCurtainWall", ("Curtain",), "Qto_CurtainWallQuantities", ("Length",), True),
+    "columns": ("IfcColumn", (), "Dimensions", ("Depth", "Width"), False),
+}
+
+# Only an empty model is rejected by default; everything else is reported
+DEFAULT_THRESHOLDS = {
+    "min_spaces": 1,              # fewer IfcSpaces -> reject
+    "min_coverage": {},           # category -> minimum share of used elements with the complete set
+    "max_empty_long_name": None,  # maximum share of spaces without LongName
+    "max_unclassified": None,     # maximum share of spaces whose LongName matches no keyword
+}
+
+EXAMPLES = 5  # GlobalIds kept per problem
+
+
+# =======================================================
+# CHECKS
+# =======================================================
+
+def _is_used(element, keywords: Tuple[str, ...]) -> bool:
+    # Same test as A3_Tool._name_contains on ObjectType and Name
+    if not keywords:
+        return True
+    text = " ".join(filter(None, (element.ObjectType, element.Name))).lower()
+    return any(kw.lower() in text for kw in keywords)
+
+
+def _allowed_missing(total: int, min_coverage: float | None) -> int | None:
+    """Largest number of incomplete elements that still meets min_coverage (None: no limit)."""
+    if min_coverage is None:
+        return None
+    return int(total - min_coverage * total + 1e-9)
+
+
+def _allowed_share(total: int, max_share: float | None) -> int | None:
+    if max_share is None:
+        return None
+    return int(max_share * total + 1e-9)
+
+
+def _check_category(elements, key: str, pset_index, min_coverage: float | None, abort_early: bool) -> Dict:
+    ifc_class, keywords, set_name, properties, qtos_only = REQUIREMENTS[key]
+    used = [e for e in elements if _is_used(e, keywords)]
+    allowed_missing = _allowed_missing(len(used), min_coverage)
+
+    missing_set: List[str] = []
+    missing_properties = Counter()
+    incomplete = 0
+    checked = 0
+    for element in used:
+        checked += 1
+        psets = pset_index.get_psets(element, qtos_only=qtos_only)
+        values = psets.get(set_name)
+        if values is None:
+            missing_set.append(element.GlobalId)
+            incomplete += 1
+        else:
+            absent = [p for p in properties if values.get(p) is None]
+            missing_properties.update(absent)
+            incomplete += bool(absent)
+        if abort_early and allowed_missing is not None and incomplete > allowed_missing:
+            break
+
+    return {
+        "ifc_class": ifc_class,
+        "required": {"set": set_name, "properties": list(properties)},
+        "elements": len(elements),
+        "used": len(used),
+        "checked": checked,
+        "complete": checked - incomplete,
+        "missing_set": len(missing_set),
+        "missing_properties": dict(missing_properties),
+        "coverage": round((checked - incomplete) / checked, 4) if checked else 1.0,
+        "examples": missing_set[:EXAMPLES],
+        "passed": allowed_missing is None or incomplete <= allowed_missing,
+    }
+
+
+def _check_names(spaces, classifier, allowed_empty: int | None, allowed_unclassified: int | None, abort_early: bool) -> Dict:
+    empty: List[str] = []
+    unclassified = Counter()
+    n_unclassified = 0
+    checked = 0
+    for space in spaces:
+        checked += 1
+        name = space.LongName
+        if not name or not name.strip():
+            empty.append(space.GlobalId)
+        elif classifier is not None and classifier.classify(name) == "UNCLASSIFIED":
+            unclassified[name] += 1
+            n_unclassified += 1
+        if abort_early and (
+            (allowed_empty is not None and len(empty) > allowed_empty)
+            or (allowed_unclassified is not None and n_unclassified > allowed_unclassified)
+        ):
+            break
+
+    return {
+        "checked": checked,
+        "empty_long_name": len(empty),
+        "empty_long_name_examples": empty[:EXAMPLES],
+        "unclassified": n_unclassified if classifier is not None else None,
+        "unclassified_names": dict(unclassified.most_common(10)),
+    }
+
+
+# =======================================================
+# VALIDATION
+# =======================================================
+
+def validate_model(
+    model,
+    classifier=None,
+    thresholds: Dict | None = None,
+    abort_early: bool = True,
+    pset_index=None,
+) -> Dict:
+    """
+    Pre-flight check of everything the area and cost tools read.
+
+    Per quantity category (spaces, walls, curtain walls, columns) the
+    share of used elements that carry the complete quantity/property set
+    is counted, plus spaces without LongName and (given a
+    roomtype_cost.SpaceClassifier) LongNames that match no keyword.
+    Nothing is printed per element.
+
+    thresholds (see DEFAULT_THRESHOLDS) decide whether the model is
+    rejected. With abort_early, checking stops at the first threshold
+    that can no longer be met, so bad models are rejected without
+    scanning them completely (counts are then partial, see "checked").
+
+    Returns dict with "ok", "aborted", "failures" (messages), "spaces"
+    (count), "names" and "coverage" (per category).
+    """
+    limits = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    min_coverage = limits.get("min_coverage") or {}
+    failures: List[str] = []
+    report = {"ok": True, "aborted": False, "failures": failures, "spaces": 0, "names": None, "coverage": {}}
+
+    def done(aborted: bool = False) -> Dict:
+        report["ok"] = not failures
+        report["aborted"] = aborted
+        return report
+
+    spaces = model.by_type("IfcSpace")
+    report["spaces"] = len(spaces)
+    if len(spaces) < (limits.get("min_spaces") or 0):
+        failures.append(f"{len(spaces)} IfcSpaces found, at least {limits['min_spaces']} required")
+        if abort_early:
+            return done(aborted=True)
+
+    # Spaces first: names are cheap and decide most rejections
+    allowed_empty = _allowed_share(len(spaces), limits.get("max_empty_long_name"))
+    allowed_unclassified = _allowed_share(len(spaces), limits.get("max_unclassified"))
+    names = _check_names(spaces, classifier, allowed_empty, allowed_unclassified, abort_early)
+    report["names"] = names
+    if allowed_empty is not None and names["empty_long_name"] > allowed_empty:
+        failures.append(f"More than {limits['max_empty_long_name']:.0%} of the spaces have no LongName")
+    if allowed_unclassified is not None and names["unclassified"] is not None and names["unclassified"] > allowed_unclassified:
+        failures.append(f"More than {limits['max_unclassified']:.0%} of the space names match no keyword")
+    if failures and abort_early:
+        return done(aborted=True)
+
+    if pset_index is None:
+        pset_index = A3_Tool.build_pset_index(model)
+    for key, (ifc_class, *_) in REQUIREMENTS.items():
+        required = min_coverage.get(key)
+        elements = spaces if ifc_class == "IfcSpace" else model.by_type(ifc_class)
+        category = _check_category(elements, key, pset_index, required, abort_early)
+        report["coverage"][key] = category
+        if not category["passed"]:
+            failures.append(
+                f"{key}: less than {required:.0%} of the {category['used']} elements have a complete {category['required']['set']}"
+            )
+            if abort_early:
+                return done(aborted=True)
+
+    return done()
+
+
+# =======================================================
+# CLI ENTRY POINT
+# =======================================================
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pre-flight check of an IFC model for the area and cost tools.")
+    parser.add_argument("ifc", help="IFC file to check.")
+    parser.add_argument("--config-dir", default=None,
+                        help="Directory with room_types.json and space_keywords.json (enables the keyword check).")
+    parser.add_argument("--min-coverage", nargs="+", default=[], metavar="CATEGORY=SHARE",
+                        help="Reject below this share of complete elements, e.g. spaces=0.9 walls=0.5.")
+    parser.add_argument("--max-empty-long-name", type=float, default=None, help="Reject above this share of spaces without LongName.")
+    parser.add_argument("--max-unclassified", type=float, default=None, help="Reject above this share of unclassifiable space names.")
+    parser.add_argument("--full", action="store_true", help="Scan everything even after a threshold failed.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    classifier = None
+    if args.config_dir:
+        classifier = rtc.SpaceClassifier.from_config_dir(args.config_dir)
+
+    thresholds = {
+        "min_coverage": {k: float(v) for k, v in (item.split("=", 1) for item in args.min_coverage)},
+        "max_empty_long_name": args.max_empty_long_name,
+        "max_unclassified": args.max_unclassified,
+    }
+    report = validate_model(ifcopenshell.open(args.ifc), classifier, thresholds, abort_early=not args.full)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()